@@ -0,0 +1,93 @@
+import os
+import json
+import time
+import argparse
+import tempfile
+from corpus_io import open_corpus, DEFAULT_LEVELS
+
+# Бенчмарк сжатия корпуса: скорость записи и чтения и степень сжатия
+# для несжатого JSONL, gzip и zstd (и, по желанию, xz).
+#
+#   python bench_compression.py --input corpus.jsonl --bandwidth 50
+#
+# Скорость считается по несжатым данным (МБ/с текста JSONL). Чтение — построчный
+# разбор JSON, как у читателей корпуса. Колонка «с сетью» — оценка времени чтения
+# с хранилища с пропускной способностью --bandwidth МБ/с: время разбора плюс
+# время передачи сжатого файла. Копии корпуса (--copies) завышают степень сжатия
+# zstd и xz: повторы попадают в их окно, поэтому для оценки сжатия берите --copies 1.
+
+MB = 1024 * 1024
+
+EXTENSIONS = {'plain': '', 'gzip': '.gz', 'zstd': '.zst', 'xz': '.xz'}
+
+def _load_lines(input_file, copies):
+    with open_corpus(input_file) as f:
+        lines = [line if line.endswith('\n') else line + '\n' for line in f if line.strip()]
+    return lines * copies
+
+def bench_format(lines, fmt, level=None, threads=0, repeat=3, directory=None):
+    """
+    Замер одного формата.
+
+    Returns:
+        dict: format, level, size_mb, ratio, write_mb_s, read_mb_s, read_docs_s и read_sec
+            (лучшие значения из repeat запусков).
+    """
+    raw_bytes = sum(len(line.encode('utf-8')) for line in lines)
+    path = os.path.join(directory, f"bench.jsonl{EXTENSIONS[fmt]}")
+    write_times = []
+    read_times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        with open_corpus(path, 'w', level=level, threads=threads) as f:
+            f.writelines(lines)
+        write_times.append(time.perf_counter() - start_time)
+
+        start_time = time.perf_counter()
+        documents = 0
+        with open_corpus(path) as f:
+            for line in f:
+                json.loads(line)
+                documents += 1
+        read_times.append(time.perf_counter() - start_time)
+    size = os.path.getsize(path)
+    os.remove(path)
+    write_sec, read_sec = min(write_times), min(read_times)
+    return {
+        'format': fmt,
+        'level': level if fmt == 'plain' or level is not None else DEFAULT_LEVELS[fmt],
+        'size_mb': size / MB,
+        'ratio': raw_bytes / size if size else 0.0,
+        'write_mb_s': raw_bytes / MB / write_sec,
+        'read_mb_s': raw_bytes / MB / read_sec,
+        'read_docs_s': documents / read_sec,
+        'read_sec': read_sec
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение скорости чтения и записи сжатого корпуса")
+    parser.add_argument('--input', default='corpus.jsonl')
+    parser.add_argument('--copies', type=int, default=1, help="Сколько раз повторить корпус (для устойчивых замеров)")
+    parser.add_argument('--formats', nargs='*', default=['plain', 'gzip', 'zstd'], choices=list(EXTENSIONS))
+    parser.add_argument('--level', type=int, default=None, help="Уровень сжатия (по умолчанию — свой для каждого формата)")
+    parser.add_argument('--threads', type=int, default=0, help="Потоки сжатия zstd")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--bandwidth', type=float, default=100.0, help="Пропускная способность хранилища, МБ/с")
+    args = parser.parse_args()
+
+    lines = _load_lines(args.input, args.copies)
+    raw_mb = sum(len(line.encode('utf-8')) for line in lines) / MB
+    print(f"Корпус: {len(lines)} статей, {raw_mb:.1f} МБ")
+    print(f"{'формат':<8} {'уровень':>7} {'МБ':>8} {'сжатие':>7} {'запись МБ/с':>12} {'чтение МБ/с':>12} "
+          f"{'статей/с':>10} {f'с сетью {args.bandwidth:g} МБ/с, с':>22}")
+    with tempfile.TemporaryDirectory() as directory:
+        for fmt in args.formats:
+            level = None if fmt == 'plain' else args.level
+            row = bench_format(lines, fmt, level, args.threads, args.repeat, directory)
+            network_sec = row['read_sec'] + row['size_mb'] / args.bandwidth
+            print(f"{fmt:<8} {str(row['level'] if row['level'] is not None else '-'):>7} {row['size_mb']:>8.1f} "
+                  f"{row['ratio']:>7.2f} {row['write_mb_s']:>12.1f} {row['read_mb_s']:>12.1f} "
+                  f"{row['read_docs_s']:>10.0f} {network_sec:>22.2f}")
+
+if __name__ == '__main__':
+    main()
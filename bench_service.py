@@ -0,0 +1,128 @@
+import json
+import time
+import asyncio
+import argparse
+from collections import Counter
+from corpus_io import open_corpus
+from sampling import percentile
+
+# Нагрузочный тест локального сервиса nlp_service.py.
+#
+#   python nlp_service.py --preload razdel &
+#   python bench_service.py --endpoint tokenize --method razdel --concurrency 32 --requests 2000
+#
+# Каждый из --concurrency клиентов держит своё keep-alive соединение и отправляет запросы
+# подряд, пока не будет отправлено --requests запросов (или не истечёт --duration секунд).
+# Задержки считаются на стороне клиента; ответы 503 (перегрузка) учитываются отдельно.
+# В конце выводятся метрики сервера: задержки p50/p95/p99 и средний размер пачек.
+
+def load_texts(input_file, limit, max_chars):
+    texts = []
+    with open_corpus(input_file) as f:
+        for line in f:
+            try:
+                article = json.loads(line)
+            except ValueError:
+                continue
+            text = article.get('preprocessed_text', article.get('cleaned_text', article.get('text', '')))
+            if text:
+                texts.append(text[:max_chars])
+                if len(texts) >= limit:
+                    break
+    return texts
+
+def build_payload(endpoint, texts, args):
+    if endpoint == 'tokenize':
+        return {'texts': texts, 'method': args.method}
+    if endpoint == 'normalize':
+        return {'tokens': [text.split() for text in texts], 'method': args.method}
+    if endpoint == 'clean':
+        return {'texts': texts}
+    if endpoint == 'similarity':
+        return {'originals': texts, 'processed': [text.lower() for text in texts], 'backend': args.backend}
+    if endpoint == 'subword':
+        return {'texts': texts, 'model': args.model}
+    raise ValueError(f"Неизвестный endpoint: {endpoint}")
+
+async def request(reader, writer, host, method, path, payload=None):
+    """Один запрос по открытому keep-alive соединению: (статус, ответ)."""
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8') if payload is not None else b''
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length)) if length else None
+
+async def run_load(args, payloads):
+    latencies = []
+    statuses = Counter()
+    sent = 0
+    deadline = time.perf_counter() + args.duration if args.duration else None
+
+    async def client(index):
+        nonlocal sent
+        reader, writer = await asyncio.open_connection(args.host, args.port)
+        try:
+            while sent < args.requests and (deadline is None or time.perf_counter() < deadline):
+                payload = payloads[sent % len(payloads)]
+                sent += 1
+                start_time = time.perf_counter()
+                status, _ = await request(reader, writer, args.host, 'POST', f"/{args.endpoint}", payload)
+                latencies.append((time.perf_counter() - start_time) * 1000)
+                statuses[status] += 1
+        finally:
+            writer.close()
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(args.concurrency)))
+    elapsed = time.perf_counter() - start_time
+
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    _, server_metrics = await request(reader, writer, args.host, 'GET', '/metrics')
+    writer.close()
+    return latencies, statuses, elapsed, server_metrics
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест nlp_service.py на localhost")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--endpoint', default='tokenize', choices=['tokenize', 'normalize', 'clean', 'similarity', 'subword'])
+    parser.add_argument('--method', default='razdel', help="Метод для /tokenize и /normalize")
+    parser.add_argument('--backend', default='hashed-ngram', help="Бэкенд для /similarity")
+    parser.add_argument('--model', default='russian-bpe-16k', help="Модель для /subword")
+    parser.add_argument('--input', default='corpus.jsonl')
+    parser.add_argument('--texts-per-request', type=int, default=1)
+    parser.add_argument('--max-chars', type=int, default=2000, help="Обрезка текстов (символов)")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--duration', type=float, default=None, help="Ограничение по времени, сек")
+    args = parser.parse_args()
+
+    texts = load_texts(args.input, 1000, args.max_chars)
+    if not texts:
+        parser.error(f"В {args.input} нет текстов")
+    step = args.texts_per_request
+    payloads = [build_payload(args.endpoint, (texts * step)[i:i + step], args) for i in range(len(texts))]
+
+    latencies, statuses, elapsed, server_metrics = asyncio.run(run_load(args, payloads))
+    print(f"Запросов: {len(latencies)} за {elapsed:.2f} сек ({len(latencies) / elapsed:.1f} запросов/с, "
+          f"{args.concurrency} клиентов, {step} текстов в запросе)")
+    print("Статусы: " + ', '.join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+    print(f"Задержка клиента, мс: p50 {percentile(latencies, 0.5):.1f}  p95 {percentile(latencies, 0.95):.1f}  "
+          f"p99 {percentile(latencies, 0.99):.1f}  max {max(latencies, default=0):.1f}")
+    endpoint = server_metrics['endpoints'].get(f"/{args.endpoint}", {})
+    if endpoint:
+        print(f"Сервер, мс: p50 {endpoint['p50_ms']:.1f}  p95 {endpoint['p95_ms']:.1f}  p99 {endpoint['p99_ms']:.1f}")
+    for key, batcher in server_metrics['batchers'].items():
+        print(f"Пачки {key}: {batcher['batches']}, в среднем {batcher['avg_batch']:.1f} строк")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tempfile
+
+# Профиль времени импорта и бенчмарк холодного старта.
+#
+#   python bench_startup.py profile text_processing_app  — самые долгие импорты модуля (-X importtime)
+#   python bench_startup.py check                        — время до первой отрисовки страницы и до первой
+#                                                          очищенной статьи; код возврата 1 при превышении бюджета
+#
+# Каждый замер — отдельный процесс интерпретатора, то есть настоящий холодный старт.
+# Процессы запускаются вне каталога проекта, а каталог добавляется в конец sys.path:
+# так импорт не зависит от посторонних файлов в текущем каталоге.
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_RENDER_BUDGET = 3.0
+DEFAULT_CLEAN_BUDGET = 1.5
+
+def _run_python(code, args=()):
+    """Запуск кода в новом интерпретаторе; возвращает (секунды, stdout, stderr)."""
+    prelude = f"import sys; sys.path.append({REPO_DIR!r})\n"
+    with tempfile.TemporaryDirectory() as cwd:
+        start_time = time.perf_counter()
+        result = subprocess.run([sys.executable, *args, '-c', prelude + code], cwd=cwd,
+                                capture_output=True, text=True)
+        elapsed = time.perf_counter() - start_time
+    if result.returncode != 0:
+        raise RuntimeError(f"Ошибка в дочернем процессе:\n{result.stderr[-2000:]}")
+    return elapsed, result.stdout, result.stderr
+
+def import_profile(module, top=20):
+    """
+    Профиль импорта модуля по выводу python -X importtime.
+
+    Returns:
+        tuple: (общее время импорта в мс, список (модуль, собственное время в мс, накопленное время в мс),
+            отсортированный по накопленному времени, не длиннее top)
+    """
+    _, _, stderr = _run_python(f"import {module}", args=('-X', 'importtime'))
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    total = next((cumulative for name, _, cumulative in rows if name == module), 0.0)
+    rows.sort(key=lambda row: row[2], reverse=True)
+    return total, rows[:top]
+
+def time_to_first_render(app='text_processing_app.py'):
+    """Время от запуска интерпретатора до завершения первого прохода скрипта Streamlit (без браузера)."""
+    code = (
+        "from streamlit.testing.v1 import AppTest\n"
+        f"at = AppTest.from_file({os.path.join(REPO_DIR, app)!r}, default_timeout=120)\n"
+        "at.run()\n"
+        "assert not at.exception, [e.value for e in at.exception]\n"
+    )
+    return _run_python(code)[0]
+
+def _first_article(input_file):
+    with open(input_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                text = json.loads(line).get('text', '')
+            except ValueError:
+                continue
+            if text:
+                return text
+    raise ValueError(f"В {input_file} нет статей с текстом")
+
+def time_to_first_clean(input_file='corpus.jsonl'):
+    """Время от запуска интерпретатора до первой очищенной статьи (импорт text_cleaner + clean_text)."""
+    text = _first_article(os.path.join(REPO_DIR, input_file))
+    code = (
+        "import text_cleaner\n"
+        f"assert text_cleaner.clean_text({text!r}) is not None\n"
+    )
+    return _run_python(code)[0]
+
+def _best_of(fn, repeat):
+    # Минимум по нескольким запускам отсекает шум планировщика и холодного дискового кеша
+    return min(fn() for _ in range(repeat))
+
+def main():
+    parser = argparse.ArgumentParser(description="Профиль импорта и бенчмарк холодного старта")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    profile = subparsers.add_parser('profile', help="Самые долгие импорты модуля")
+    profile.add_argument('module', nargs='?', default='text_processing_app')
+    profile.add_argument('--top', type=int, default=20)
+
+    check = subparsers.add_parser('check', help="Проверка бюджета времени холодного старта")
+    check.add_argument('--render-budget', type=float, default=DEFAULT_RENDER_BUDGET,
+                       help="Бюджет до первой отрисовки страницы, с")
+    check.add_argument('--clean-budget', type=float, default=DEFAULT_CLEAN_BUDGET,
+                       help="Бюджет до первой очищенной статьи, с")
+    check.add_argument('--input', default='corpus.jsonl')
+    check.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == 'profile':
+        total, rows = import_profile(args.module, args.top)
+        print(f"Импорт {args.module}: {total:.1f} мс")
+        print(f"{'модуль':<50} {'собств., мс':>12} {'накопл., мс':>12}")
+        for name, self_ms, cumulative_ms in rows:
+            print(f"{name:<50} {self_ms:>12.1f} {cumulative_ms:>12.1f}")
+        return
+
+    checks = [
+        ("Первая отрисовка text_processing_app", lambda: time_to_first_render(), args.render_budget),
+        ("Первая очищенная статья text_cleaner", lambda: time_to_first_clean(args.input), args.clean_budget)
+    ]
+    failed = False
+    for name, fn, budget in checks:
+        elapsed = _best_of(fn, args.repeat)
+        ok = elapsed <= budget
+        failed |= not ok
+        print(f"{'OK ' if ok else 'FAIL'} {name}: {elapsed:.2f} с (бюджет {budget:.2f} с)")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
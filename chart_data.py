@@ -0,0 +1,82 @@
+import math
+import numpy as np
+
+# Агрегированные данные для графиков дашборда.
+#
+# Графики строятся по частотам, заранее посчитанным на сервере (np.bincount),
+# а не по значению на каждое вхождение токена: в браузер уходит не больше
+# MAX_BINS столбцов, поэтому объём данных и время отрисовки не зависят
+# от размера корпуса.
+
+MAX_BINS = 50
+TOP_TOKENS = 15
+
+def length_counts(tokens_list):
+    """Частоты длин токенов: counts[n] — количество токенов длины n."""
+    lengths = np.fromiter((len(token) for tokens in tokens_list for token in tokens), dtype=np.int64)
+    return np.bincount(lengths) if len(lengths) else np.zeros(0, dtype=np.int64)
+
+def merge_counts(counts_list):
+    """Сумма нескольких массивов частот длин разной длины."""
+    size = max((len(counts) for counts in counts_list), default=0)
+    total = np.zeros(size, dtype=np.int64)
+    for counts in counts_list:
+        total[:len(counts)] += np.asarray(counts, dtype=np.int64)
+    return total
+
+def mean_length(counts):
+    """Средняя длина токена по частотам длин."""
+    counts = np.asarray(counts, dtype=np.int64)
+    total = counts.sum()
+    return float(np.dot(np.arange(len(counts)), counts) / total) if total else 0.0
+
+def length_edges(counts, max_bins=MAX_BINS, tail=0.999):
+    """
+    Границы интервалов гистограммы длин.
+
+    Редкие очень длинные токены (URL, склейки) не растягивают ось: всё, что длиннее
+    квантиля tail, попадает в последний интервал. Если различных длин больше
+    max_bins, соседние длины объединяются в интервалы одинаковой ширины.
+
+    Args:
+        counts (array): Частоты длин (для сравнения методов — сумма по методам).
+        max_bins (int): Максимальное количество интервалов.
+        tail (float): Доля токенов, которая показывается без объединения в хвост.
+
+    Returns:
+        np.ndarray: Левые границы интервалов и правая граница последнего.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    total = counts.sum()
+    if not total:
+        return np.array([0, 1])
+    low = int(np.flatnonzero(counts)[0])
+    high = max(int(np.searchsorted(np.cumsum(counts), tail * total)) + 1, low + 1)
+    width = max(1, math.ceil((high - low) / max_bins))
+    return np.arange(low, high + width, width)
+
+def length_histogram(counts, edges=None, max_bins=MAX_BINS):
+    """
+    Гистограмма длин токенов по частотам длин.
+
+    Args:
+        counts (array): Частоты длин: counts[n] — количество токенов длины n.
+        edges (array): Границы интервалов (по умолчанию — length_edges(counts)).
+        max_bins (int): Максимальное количество интервалов при расчёте границ.
+
+    Returns:
+        dict: labels — подписи интервалов ('5', '10–14' или '≥40' для хвоста),
+            counts — количество токенов в интервалах.
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    if edges is None:
+        edges = length_edges(counts, max_bins)
+    bins = len(edges) - 1
+    index = np.clip(np.searchsorted(edges, np.arange(len(counts)), side='right') - 1, 0, bins - 1)
+    histogram = np.bincount(index, weights=counts, minlength=bins).astype(np.int64)
+
+    labels = [str(start) if end - start == 1 else f"{start}–{end - 1}"
+              for start, end in zip(edges[:-1].tolist(), edges[1:].tolist())]
+    if counts[edges[-1]:].any():
+        labels[-1] = f"≥{edges[-2]}"
+    return {'labels': labels, 'counts': histogram.tolist()}
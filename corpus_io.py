@@ -0,0 +1,119 @@
+import io
+import os
+import gzip
+import lzma
+
+# Прозрачное чтение и запись сжатых корпусов JSONL (gzip, zstd, xz).
+#
+# При чтении сжатие определяется по первым байтам файла (сигнатуре формата),
+# поэтому, например, загруженный через дашборд corpus.jsonl.gz читается и под
+# именем uploads/<хеш>.jsonl; для пустых и несуществующих файлов — по расширению.
+# При записи сжатие выбирается по расширению: .gz, .zst (.zstd) или .xz.
+# Распаковка всегда потоковая: файл читается построчно, целиком в память не загружается.
+#
+# Уровень сжатия и количество потоков (только zstd) задаются при открытии файла
+# или по умолчанию для всех записей — через set_write_options.
+
+COMPRESSIONS = ('gzip', 'zstd', 'xz')
+
+_MAGIC = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+    (b'\xfd7zXZ\x00', 'xz')
+]
+_EXTENSIONS = {'.gz': 'gzip', '.gzip': 'gzip', '.zst': 'zstd', '.zstd': 'zstd', '.xz': 'xz'}
+
+DEFAULT_LEVELS = {'gzip': 6, 'zstd': 3, 'xz': 6}
+
+_write_options = {'level': None, 'threads': 0}
+
+def set_write_options(level=None, threads=None):
+    """
+    Параметры сжатия по умолчанию для всех записываемых корпусов.
+
+    Args:
+        level (int): Уровень сжатия (None — DEFAULT_LEVELS для выбранного формата).
+        threads (int): Потоки сжатия zstd (0 — в вызывающем потоке, -1 — по числу ядер).
+    """
+    _write_options['level'] = level
+    if threads is not None:
+        _write_options['threads'] = threads
+
+def compression_from_path(path):
+    """Сжатие по расширению файла (None — без сжатия)."""
+    return _EXTENSIONS.get(os.path.splitext(str(path))[1].lower())
+
+def detect_compression(path):
+    """Сжатие по сигнатуре в начале файла, а для пустых и несуществующих файлов — по расширению."""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(6)
+    except FileNotFoundError:
+        head = b''
+    if not head:
+        return compression_from_path(path)
+    for magic, compression in _MAGIC:
+        if head.startswith(magic):
+            return compression
+    return None
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Для файлов .zst нужен пакет zstandard (pip install zstandard)") from None
+    return zstandard
+
+def open_corpus(path, mode='r', compression='auto', level=None, threads=None, encoding='utf-8'):
+    """
+    Открытие корпуса (или другого текстового файла) с прозрачным сжатием.
+
+    Args:
+        path (str): Путь к файлу.
+        mode (str): 'r', 'w' или 'a' (всегда текстовый режим).
+        compression (str): 'auto' (по сигнатуре при чтении, по расширению при записи),
+            None или одно из COMPRESSIONS.
+        level (int): Уровень сжатия при записи (по умолчанию — set_write_options или DEFAULT_LEVELS).
+        threads (int): Потоки сжатия zstd (по умолчанию — set_write_options).
+        encoding (str): Кодировка текста.
+
+    Returns:
+        Текстовый файловый объект.
+    """
+    mode = mode.replace('t', '')
+    if mode not in ('r', 'w', 'a'):
+        raise ValueError(f"Неподдерживаемый режим: {mode}")
+    reading = mode == 'r'
+    if compression == 'auto':
+        compression = detect_compression(path) if reading else compression_from_path(path)
+    if compression is None:
+        return open(path, mode, encoding=encoding)
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Неизвестное сжатие: {compression}")
+
+    if level is None:
+        level = _write_options['level']
+    if level is None:
+        level = DEFAULT_LEVELS[compression]
+    if threads is None:
+        threads = _write_options['threads']
+
+    if compression == 'gzip':
+        return gzip.open(path, mode + 't', compresslevel=level, encoding=encoding)
+    if compression == 'xz':
+        if reading:
+            return lzma.open(path, 'rt', encoding=encoding)
+        return lzma.open(path, mode + 't', preset=level, encoding=encoding)
+
+    zstandard = _zstandard()
+    raw = open(path, 'rb' if reading else mode + 'b')
+    try:
+        if reading:
+            # Дозапись создаёт новый кадр zstd, поэтому читаются все кадры подряд
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+        else:
+            stream = zstandard.ZstdCompressor(level=level, threads=threads).stream_writer(raw, closefd=True)
+    except BaseException:
+        raw.close()
+        raise
+    return io.TextIOWrapper(stream, encoding=encoding)
@@ -0,0 +1,293 @@
+import os
+import json
+import pyarrow as pa
+import pyarrow.parquet as pq
+from corpus_io import open_corpus, set_write_options
+
+# Колоночное хранилище корпуса (Parquet).
+#
+# Корпус — это каталог, в котором каждая группа колонок лежит в отдельном файле:
+#   base.parquet              — исходные поля статьи (title, date, category, url, text)
+#   cleaned_text.parquet      — результат text_cleaner
+#   preprocessed_text.parquet — результат предобработки
+# Все файлы выровнены по строкам. Этап конвейера читает только нужные ему колонки
+# и дописывает свою колонку отдельным файлом, не переписывая остальные.
+
+BASE_COLUMNS = ['title', 'date', 'category', 'url', 'text']
+DERIVED_COLUMNS = ['cleaned_text', 'preprocessed_text']
+BASE_FILE = 'base'
+
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_COMPRESSION = 'zstd'
+
+def _column_path(store_dir, name):
+    return os.path.join(store_dir, f"{name}.parquet")
+
+def is_store(path):
+    """Является ли путь каталогом колоночного корпуса."""
+    return os.path.isdir(path) and os.path.exists(_column_path(path, BASE_FILE))
+
+def list_columns(store_dir):
+    """Список всех колонок корпуса (исходных и производных)."""
+    columns = list(pq.read_schema(_column_path(store_dir, BASE_FILE)).names)
+    for file_name in sorted(os.listdir(store_dir)):
+        name, ext = os.path.splitext(file_name)
+        if ext == '.parquet' and name != BASE_FILE:
+            columns.append(name)
+    return columns
+
+def num_rows(store_dir):
+    """Количество статей в корпусе (по метаданным, без чтения данных)."""
+    return pq.ParquetFile(_column_path(store_dir, BASE_FILE)).metadata.num_rows
+
+def _file_for_column(store_dir, column):
+    if column in BASE_COLUMNS:
+        return _column_path(store_dir, BASE_FILE)
+    path = _column_path(store_dir, column)
+    if not os.path.exists(path):
+        raise KeyError(f"Колонка {column} отсутствует в корпусе {store_dir}")
+    return path
+
+class ColumnWriter:
+    """
+    Потоковая запись одной или нескольких колонок в отдельный Parquet-файл.
+
+    Args:
+        path (str): Путь к файлу.
+        columns (list): Названия колонок (все строковые).
+        compression (str): Кодек сжатия Parquet.
+    """
+
+    def __init__(self, path, columns, compression=DEFAULT_COMPRESSION):
+        self.path = path
+        self.schema = pa.schema([(name, pa.string()) for name in columns])
+        self._tmp_path = path + '.tmp'
+        self._writer = pq.ParquetWriter(self._tmp_path, self.schema, compression=compression)
+        self.rows = 0
+
+    def write(self, columns):
+        """Запись пачки: словарь {колонка: список значений}."""
+        batch = pa.record_batch([pa.array(columns[name], type=pa.string()) for name in self.schema.names],
+                                schema=self.schema)
+        self._writer.write_batch(batch)
+        self.rows += batch.num_rows
+
+    def close(self):
+        """Завершение записи; файл появляется под итоговым именем только целиком."""
+        self._writer.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._writer.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def iter_batches(store_dir, columns, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Чтение выбранных колонок пачками.
+
+    Колонки из разных файлов выравниваются по строкам, поэтому каждая пачка
+    содержит одни и те же статьи во всех колонках.
+
+    Args:
+        store_dir (str): Каталог корпуса.
+        columns (list): Названия колонок.
+        batch_size (int): Размер пачки.
+
+    Yields:
+        dict: {колонка: список значений} длиной не более batch_size.
+    """
+    by_file = {}
+    for column in columns:
+        by_file.setdefault(_file_for_column(store_dir, column), []).append(column)
+
+    readers = [(pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=names), names)
+               for path, names in by_file.items()]
+    buffers = [{name: [] for name in names} for _, names in readers]
+
+    while True:
+        # Дочитываем каждый файл до batch_size строк (границы групп строк у файлов различаются)
+        exhausted = False
+        for (reader, names), buffer in zip(readers, buffers):
+            while len(buffer[names[0]]) < batch_size:
+                batch = next(reader, None)
+                if batch is None:
+                    exhausted = True
+                    break
+                for name in names:
+                    buffer[name].extend(batch.column(name).to_pylist())
+
+        size = min(len(buffer[names[0]]) for (_, names), buffer in zip(readers, buffers))
+        if size == 0:
+            return
+        result = {}
+        for (_, names), buffer in zip(readers, buffers):
+            for name in names:
+                result[name] = buffer[name][:size]
+                del buffer[name][:size]
+        yield {column: result[column] for column in columns}
+        if exhausted and size < batch_size:
+            return
+
+def iter_texts(store_dir, batch_size=DEFAULT_BATCH_SIZE, with_offsets=False):
+    """
+    Тексты корпуса в порядке предпочтения: preprocessed_text, cleaned_text, text.
+
+    Args:
+        with_offsets (bool): Возвращать пары (номер строки, текст).
+
+    Yields:
+        str | tuple: Непустой текст статьи (или пара с номером строки).
+    """
+    available = set(list_columns(store_dir))
+    column = next(name for name in ('preprocessed_text', 'cleaned_text', 'text') if name in available)
+    offset = 0
+    for batch in iter_batches(store_dir, [column], batch_size):
+        for text in batch[column]:
+            if text:
+                yield (offset, text) if with_offsets else text
+            offset += 1
+
+def append_column(store_dir, name, batches, compression=DEFAULT_COMPRESSION):
+    """
+    Добавление (или замена) производной колонки корпуса.
+
+    Args:
+        store_dir (str): Каталог корпуса.
+        name (str): Название колонки.
+        batches (iterable): Пачки значений (списки строк или None), по порядку статей.
+        compression (str): Кодек сжатия Parquet.
+
+    Returns:
+        int: Количество записанных строк.
+    """
+    if name in BASE_COLUMNS or name == BASE_FILE:
+        raise ValueError(f"Колонка {name} входит в исходные поля корпуса")
+    expected = num_rows(store_dir)
+    with ColumnWriter(_column_path(store_dir, name), [name], compression) as writer:
+        for values in batches:
+            writer.write({name: values})
+        if writer.rows != expected:
+            raise ValueError(f"Колонка {name}: записано {writer.rows} строк, ожидалось {expected}")
+    return writer.rows
+
+def jsonl_to_store(input_file, store_dir, batch_size=DEFAULT_BATCH_SIZE, compression=DEFAULT_COMPRESSION):
+    """
+    Конвертация JSONL-корпуса в колоночный формат.
+
+    Исходные поля записываются в base.parquet, а производные текстовые поля
+    (cleaned_text, preprocessed_text), если они есть, — в отдельные файлы.
+
+    Args:
+        input_file (str): Путь к JSONL-файлу.
+        store_dir (str): Каталог корпуса (создаётся при необходимости).
+        batch_size (int): Размер пачки при записи.
+        compression (str): Кодек сжатия Parquet.
+
+    Returns:
+        int: Количество записанных статей.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+
+    # Производные колонки определяются по первой статье, где они встречаются
+    derived = []
+    with open_corpus(input_file) as f:
+        for line in f:
+            try:
+                article = json.loads(line)
+            except ValueError:
+                continue
+            derived = [name for name in DERIVED_COLUMNS if name in article]
+            break
+
+    writers = [ColumnWriter(_column_path(store_dir, BASE_FILE), BASE_COLUMNS, compression)]
+    writers += [ColumnWriter(_column_path(store_dir, name), [name], compression) for name in derived]
+    columns = BASE_COLUMNS + derived
+
+    def flush(batch):
+        for writer in writers:
+            writer.write({name: batch[name] for name in writer.schema.names})
+        for values in batch.values():
+            values.clear()
+
+    try:
+        batch = {name: [] for name in columns}
+        with open_corpus(input_file) as f:
+            for line in f:
+                try:
+                    article = json.loads(line)
+                except ValueError:
+                    continue
+                for name in columns:
+                    value = article.get(name)
+                    batch[name].append(None if value is None else str(value))
+                if len(batch['text']) >= batch_size:
+                    flush(batch)
+        if batch['text']:
+            flush(batch)
+    except BaseException:
+        for writer in writers:
+            writer.abort()
+        raise
+    for writer in writers:
+        writer.close()
+    return writers[0].rows
+
+def store_to_jsonl(store_dir, output_file, columns=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Обратная конвертация колоночного корпуса в JSONL.
+
+    Args:
+        store_dir (str): Каталог корпуса.
+        output_file (str): Путь к JSONL-файлу.
+        columns (list): Колонки для выгрузки (по умолчанию все).
+        batch_size (int): Размер пачки при чтении.
+
+    Returns:
+        int: Количество записанных статей.
+    """
+    columns = columns or list_columns(store_dir)
+    count = 0
+    with open_corpus(output_file, 'w') as f:
+        for batch in iter_batches(store_dir, columns, batch_size):
+            for values in zip(*(batch[name] for name in columns)):
+                article = {name: value for name, value in zip(columns, values) if value is not None}
+                json.dump(article, f, ensure_ascii=False)
+                f.write('\n')
+                count += 1
+    return count
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Конвертация корпуса между JSONL и колоночным форматом")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    to_store = subparsers.add_parser('to-store', help="JSONL -> каталог Parquet")
+    to_store.add_argument('input')
+    to_store.add_argument('store_dir')
+    to_store.add_argument('--compression', default=DEFAULT_COMPRESSION)
+    to_jsonl = subparsers.add_parser('to-jsonl', help="каталог Parquet -> JSONL")
+    to_jsonl.add_argument('store_dir')
+    to_jsonl.add_argument('output')
+    to_jsonl.add_argument('--columns', nargs='*')
+    to_jsonl.add_argument('--compress-level', type=int, default=None, help="Уровень сжатия выхода (.gz, .zst, .xz)")
+    to_jsonl.add_argument('--compress-threads', type=int, default=0, help="Потоки сжатия zstd")
+    args = parser.parse_args()
+
+    if args.command == 'to-store':
+        count = jsonl_to_store(args.input, args.store_dir, compression=args.compression)
+    else:
+        set_write_options(args.compress_level, args.compress_threads)
+        count = store_to_jsonl(args.store_dir, args.output, columns=args.columns)
+    print(f"Записано статей: {count}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+import re
+import json
+import time
+import zlib
+import argparse
+from multiprocessing import Pool, cpu_count
+import numpy as np
+from corpus_io import open_corpus, set_write_options
+
+# Поиск почти-дубликатов статей (MinHash + LSH) перед text_cleaner.process_corpus.
+# Информационные агентства перепечатывают одни и те же новости с небольшими правками,
+# поэтому такие копии имеет смысл убрать до очистки, токенизации и обучения моделей.
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_WORD_RE = re.compile(r'\w+')
+
+def shingles(text, k=5):
+    """
+    Множество словесных k-грамм (шинглов) текста.
+
+    Args:
+        text (str): Исходный текст.
+        k (int): Длина шингла в словах.
+
+    Returns:
+        set: Множество шинглов.
+    """
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < k:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+def make_permutations(num_perm=128, seed=1):
+    """Параметры (a, b) универсальных хеш-функций h(x) = (a * x + b) mod p."""
+    rng = np.random.RandomState(seed)
+    a = rng.randint(1, _MAX_HASH, size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, _MAX_HASH, size=num_perm, dtype=np.uint64)
+    return a, b
+
+def minhash_signature(text, permutations, k=5):
+    """
+    MinHash-сигнатура текста.
+
+    Args:
+        text (str): Исходный текст.
+        permutations (tuple): Параметры хеш-функций из make_permutations.
+        k (int): Длина шингла в словах.
+
+    Returns:
+        np.ndarray: Сигнатура (uint32, длина num_perm) или None для пустого текста.
+    """
+    items = shingles(text, k)
+    if not items:
+        return None
+    a, b = permutations
+    hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for s in items), dtype=np.uint64, count=len(items))
+    # a, b и хеши меньше 2^32, поэтому произведение помещается в uint64 без переполнения
+    values = (hashes[:, None] * a + b) % _MERSENNE_PRIME & _MAX_HASH
+    return values.min(axis=0).astype(np.uint32)
+
+def lsh_params(threshold, num_perm):
+    """
+    Подбор числа полос (bands) и строк в полосе (rows) для LSH.
+
+    Порог срабатывания LSH примерно равен (1 / bands) ** (1 / rows);
+    выбирается разбиение num_perm, у которого он ближе всего к threshold.
+    """
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or error < best[0]:
+            best = (error, bands, rows)
+    return best[1], best[2]
+
+class _UnionFind:
+    """Система непересекающихся множеств; корнем кластера остаётся статья с меньшим номером."""
+
+    def __init__(self):
+        self.parent = {}
+
+    def find(self, x):
+        parent = self.parent
+        root = x
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while x != root:
+            parent[x], x = root, parent.get(x, x)
+        return root
+
+    def union(self, x, y):
+        rx, ry = self.find(x), self.find(y)
+        if rx != ry:
+            self.parent[max(rx, ry)] = min(rx, ry)
+
+_worker_state = {}
+
+def _init_worker(num_perm, seed, k):
+    _worker_state['permutations'] = make_permutations(num_perm, seed)
+    _worker_state['k'] = k
+
+def _signature_worker(line):
+    try:
+        article = json.loads(line)
+    except ValueError:
+        return None
+    text = article.get('text', '') if isinstance(article, dict) else ''
+    if not text:
+        return None
+    return minhash_signature(text, _worker_state['permutations'], _worker_state['k'])
+
+def find_duplicates(input_file='corpus.jsonl', threshold=0.8, num_perm=128, k=5, workers=None, seed=1, chunksize=64,
+                    max_bucket=100):
+    """
+    Кластеризация почти-дубликатов в JSONL-корпусе.
+
+    Корпус читается потоково, сигнатуры считаются в пуле процессов; в памяти
+    хранятся только сигнатуры (num_perm * 4 байта на статью) и LSH-корзины.
+    Кандидаты из общих корзин проверяются по оценке сходства Жаккара.
+
+    Args:
+        input_file (str): Путь к входному файлу corpus.jsonl.
+        threshold (float): Порог сходства Жаккара для почти-дубликатов.
+        num_perm (int): Количество хеш-функций MinHash.
+        k (int): Длина шингла в словах.
+        workers (int): Количество процессов (по умолчанию — число ядер).
+        seed (int): Зерно генератора хеш-функций.
+        chunksize (int): Размер пачки строк, передаваемой процессу.
+        max_bucket (int): Максимальное число представителей кластеров в одной LSH-корзине
+            (корзины общих шаблонных фрагментов иначе дают квадратичное число сравнений).
+
+    Returns:
+        dict: Номер строки -> номер строки-представителя кластера (только для статей из кластеров размера > 1).
+    """
+    bands, rows = lsh_params(threshold, num_perm)
+    buckets = [{} for _ in range(bands)]
+    signatures = {}
+    uf = _UnionFind()
+
+    with open_corpus(input_file) as f, \
+            Pool(workers or cpu_count(), initializer=_init_worker, initargs=(num_perm, seed, k)) as pool:
+        for index, signature in enumerate(pool.imap(_signature_worker, f, chunksize=chunksize)):
+            if signature is None:
+                continue
+            signatures[index] = signature
+            for band in range(bands):
+                key = signature[band * rows:(band + 1) * rows].tobytes()
+                # В корзине хранятся только представители кластеров: статья, попавшая в кластер
+                # одного из них, в корзину не добавляется, и сравнений на статью не больше max_bucket
+                bucket = buckets[band].setdefault(key, [])
+                joined = False
+                for other in bucket:
+                    if uf.find(other) == uf.find(index):
+                        joined = True
+                        continue
+                    # Оценка сходства Жаккара по доле совпавших позиций сигнатуры
+                    if np.count_nonzero(signatures[other] == signature) / num_perm >= threshold:
+                        uf.union(other, index)
+                        joined = True
+                if not joined and len(bucket) < max_bucket:
+                    bucket.append(index)
+
+    clusters = {}
+    for index in signatures:
+        root = uf.find(index)
+        if root != index:
+            clusters[index] = root
+            clusters[root] = root
+    return clusters
+
+def deduplicate_corpus(input_file='corpus.jsonl', output_file='dedup_corpus.jsonl', mode='drop', threshold=0.8,
+                       num_perm=128, k=5, workers=None):
+    """
+    Удаление или разметка почти-дубликатов в корпусе.
+
+    Args:
+        input_file (str): Путь к входному файлу corpus.jsonl.
+        output_file (str): Путь к выходному файлу.
+        mode (str): 'drop' — оставить только первую статью кластера,
+            'tag' — сохранить все статьи и добавить поле duplicate_cluster
+            (номер строки первой статьи кластера).
+        threshold (float): Порог сходства Жаккара.
+        num_perm (int): Количество хеш-функций MinHash.
+        k (int): Длина шингла в словах.
+        workers (int): Количество процессов.
+
+    Returns:
+        tuple: (количество статей, количество дубликатов, количество кластеров)
+    """
+    if mode not in ('drop', 'tag'):
+        raise ValueError(f"Неизвестный режим: {mode}")
+
+    clusters = find_duplicates(input_file, threshold=threshold, num_perm=num_perm, k=k, workers=workers)
+
+    total_count = 0
+    duplicate_count = 0
+    with open_corpus(input_file) as f_in, open_corpus(output_file, 'w') as f_out:
+        for index, line in enumerate(f_in):
+            if not line.strip():
+                continue
+            total_count += 1
+            root = clusters.get(index)
+            is_duplicate = root is not None and root != index
+            if is_duplicate:
+                duplicate_count += 1
+            if mode == 'drop':
+                if not is_duplicate:
+                    f_out.write(line if line.endswith('\n') else line + '\n')
+                continue
+            try:
+                article = json.loads(line)
+            except ValueError:
+                article = None
+            if not isinstance(article, dict):
+                # Как и при подсчёте сигнатур: нечитаемая строка не участвует в поиске и остаётся как есть
+                f_out.write(line if line.endswith('\n') else line + '\n')
+                continue
+            article['duplicate_cluster'] = root
+            json.dump(article, f_out, ensure_ascii=False)
+            f_out.write('\n')
+
+    cluster_count = len(set(clusters.values()))
+    return total_count, duplicate_count, cluster_count
+
+def main():
+    parser = argparse.ArgumentParser(description="Поиск почти-дубликатов статей (MinHash + LSH)")
+    parser.add_argument('--input', default='corpus.jsonl')
+    parser.add_argument('--output', default='dedup_corpus.jsonl')
+    parser.add_argument('--mode', choices=['drop', 'tag'], default='drop')
+    parser.add_argument('--threshold', type=float, default=0.8)
+    parser.add_argument('--num-perm', type=int, default=128)
+    parser.add_argument('--shingle', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--compress-level', type=int, default=None, help="Уровень сжатия выхода (.gz, .zst, .xz)")
+    parser.add_argument('--compress-threads', type=int, default=0, help="Потоки сжатия zstd")
+    args = parser.parse_args()
+    set_write_options(args.compress_level, args.compress_threads)
+
+    print("Поиск почти-дубликатов...")
+    start_time = time.time()
+    total_count, duplicate_count, cluster_count = deduplicate_corpus(
+        args.input, args.output, mode=args.mode, threshold=args.threshold,
+        num_perm=args.num_perm, k=args.shingle, workers=args.workers
+    )
+    print(f"Обработка завершена за {time.time() - start_time:.2f} секунд")
+    print(f"Статей: {total_count}")
+    print(f"Дубликатов: {duplicate_count}")
+    print(f"Кластеров: {cluster_count}")
+
+if __name__ == '__main__':
+    main()
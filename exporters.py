@@ -0,0 +1,146 @@
+import io
+import importlib.util
+import os
+import csv
+import gzip
+import json
+import time
+import tempfile
+from itertools import islice
+
+# Потоковый экспорт результатов анализа (полный частотный словарь, статистика документов).
+#
+# Строки пишутся во временный файл пачками, сразу в сжатом виде, поэтому полный
+# словарь никогда не собирается в памяти в виде строки CSV/JSON.
+# Готовые файлы приложение отдаёт статической раздачей Streamlit (тоже потоково),
+# а устаревшие удаляет remove_stale.
+
+EXPORT_FORMATS = {
+    'csv.gz': 'application/gzip',
+    'jsonl.gz': 'application/gzip',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+FREQUENCY_COLUMNS = ['rank', 'token', 'frequency', 'percentage']
+DOCUMENT_COLUMNS = ['doc_id', 'tokens', 'unique_tokens', 'avg_token_length']
+
+CHUNK_ROWS = 50000
+
+def available_formats():
+    """Форматы экспорта, доступные в текущем окружении (Parquet требует pyarrow)."""
+    formats = ['csv.gz', 'jsonl.gz']
+    # Проверяем наличие pyarrow без импорта: список нужен при каждой отрисовке боковой панели
+    if importlib.util.find_spec('pyarrow') is not None:
+        formats.append('parquet')
+    return formats
+
+def _chunks(rows, size):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+def write_rows(rows, columns, fmt, path=None, chunk_rows=CHUNK_ROWS, compresslevel=6, directory=None):
+    """
+    Потоковая запись строк в файл выбранного формата.
+
+    Args:
+        rows (iterable): Кортежи значений в порядке columns.
+        columns (list): Названия колонок.
+        fmt (str): Формат: 'csv.gz', 'jsonl.gz' или 'parquet'.
+        path (str): Путь к файлу (по умолчанию — новый временный файл).
+        chunk_rows (int): Количество строк в пачке.
+        compresslevel (int): Уровень сжатия gzip.
+        directory (str): Каталог временного файла (если path не задан; по умолчанию — системный).
+
+    Returns:
+        str: Путь к записанному файлу.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат экспорта: {fmt}")
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix='.' + fmt, dir=directory)
+        os.close(fd)
+
+    if fmt == 'csv.gz':
+        # Пачка форматируется в буфере и сжимается одной записью: мелкие записи в gzip очень медленные
+        with gzip.open(path, 'wb', compresslevel=compresslevel) as f:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            for chunk in _chunks(rows, chunk_rows):
+                writer.writerows(chunk)
+                f.write(buffer.getvalue().encode('utf-8'))
+                buffer.seek(0)
+                buffer.truncate()
+            f.write(buffer.getvalue().encode('utf-8'))
+    elif fmt == 'jsonl.gz':
+        encode = json.JSONEncoder(ensure_ascii=False).encode
+        with gzip.open(path, 'wb', compresslevel=compresslevel) as f:
+            for chunk in _chunks(rows, chunk_rows):
+                f.write(''.join(encode(dict(zip(columns, row))) + '\n' for row in chunk).encode('utf-8'))
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in _chunks(rows, chunk_rows):
+                table = pa.Table.from_pydict({name: [row[i] for row in chunk] for i, name in enumerate(columns)})
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema, compression='zstd')
+                writer.write_table(table)
+            if writer is None:
+                pq.write_table(pa.Table.from_pydict({name: [] for name in columns}), path)
+        finally:
+            if writer is not None:
+                writer.close()
+    return path
+
+def frequency_rows(token_counts):
+    """Строки полного частотного словаря: (ранг, токен, частота, доля в %)."""
+    total = sum(token_counts.values())
+    for rank, (token, count) in enumerate(token_counts.most_common(), 1):
+        yield rank, token, count, count / total * 100 if total else 0.0
+
+def document_rows(tokens_list):
+    """Строки статистики документов: (номер, токенов, уникальных токенов, средняя длина токена)."""
+    for doc_id, tokens in enumerate(tokens_list):
+        avg_length = sum(len(token) for token in tokens) / len(tokens) if tokens else 0.0
+        yield doc_id, len(tokens), len(set(tokens)), avg_length
+
+def export_frequencies(token_counts, fmt, path=None, directory=None):
+    """Экспорт полного частотного словаря (Counter) в файл."""
+    return write_rows(frequency_rows(token_counts), FREQUENCY_COLUMNS, fmt, path, directory=directory)
+
+def export_documents(tokens_list, fmt, path=None, directory=None):
+    """Экспорт статистики по документам в файл."""
+    return write_rows(document_rows(tokens_list), DOCUMENT_COLUMNS, fmt, path, directory=directory)
+
+def remove_stale(directory, max_age_sec):
+    """
+    Удаление файлов экспорта старше max_age_sec (например, оставшихся от закрытых сессий).
+
+    Args:
+        directory (str): Каталог файлов экспорта.
+        max_age_sec (float): Максимальный возраст файла по времени изменения.
+
+    Returns:
+        int: Количество удалённых файлов.
+    """
+    deadline = time.time() - max_age_sec
+    removed = 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') or not entry.is_file():
+                continue
+            try:
+                if entry.stat().st_mtime < deadline:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                # Файл уже удалила другая сессия
+                continue
+    return removed
@@ -0,0 +1,290 @@
+import bisect
+import time
+import numpy as np
+
+# Позиционный инвертированный индекс токенов для поиска «ключевое слово в контексте» (KWIC).
+#
+# Словарь отсортирован, идентификатор токена — его номер в словаре, поэтому поиск
+# по префиксу — это двоичный поиск диапазона идентификаторов, а списки вхождений
+# токенов диапазона лежат в файле подряд. Списки хранятся двумя потоками:
+# для каждого документа с токеном — разность номеров документов и количество вхождений,
+# для каждого вхождения — разность позиций внутри документа. Все числа упакованы
+# в varint (LEB128), так что частые небольшие разности занимают один байт,
+# а распаковка диапазона целиком выполняется векторно.
+#
+# Для фрагментов контекста хранится прямой индекс — идентификаторы токенов каждого
+# документа, поэтому поиск и показ контекста не требуют повторной токенизации.
+
+def varint_encode(values):
+    """Упаковка неотрицательных целых в LEB128 (векторно): np.ndarray uint8."""
+    values = np.asarray(values, dtype=np.uint64)
+    if not len(values):
+        return np.zeros(0, dtype=np.uint8), np.zeros(0, dtype=np.int64)
+    sizes = np.ones(len(values), dtype=np.int64)
+    for shift in range(7, 64, 7):
+        sizes += values >= (np.uint64(1) << np.uint64(shift))
+    ends = np.cumsum(sizes)
+    starts = ends - sizes
+    result = np.zeros(int(ends[-1]), dtype=np.uint8)
+    for k in range(int(sizes.max())):
+        mask = sizes > k
+        chunk = (values[mask] >> np.uint64(7 * k)) & np.uint64(0x7f)
+        # Старший бит — признак продолжения числа
+        chunk |= np.where(sizes[mask] > k + 1, np.uint64(0x80), np.uint64(0))
+        result[starts[mask] + k] = chunk.astype(np.uint8)
+    return result, sizes
+
+def varint_decode(data):
+    """Распаковка LEB128 (векторно): np.ndarray int64."""
+    data = np.asarray(data, dtype=np.uint8)
+    if not len(data):
+        return np.zeros(0, dtype=np.int64)
+    last = (data & 0x80) == 0
+    value_index = np.concatenate(([0], np.cumsum(last)[:-1]))
+    starts = np.flatnonzero(np.concatenate(([True], last[:-1])))
+    shifts = (np.arange(len(data)) - starts[value_index]) * 7
+    parts = (data & 0x7f).astype(np.int64) << shifts
+    return np.bincount(value_index, weights=parts, minlength=int(last.sum())).astype(np.int64)
+
+class InvertedIndex:
+    """
+    Позиционный инвертированный индекс корпуса.
+
+    Создаётся методом build по спискам токенов документов; сохраняется в .npz (save/load).
+
+    Attributes:
+        vocab (list): Отсортированный словарь.
+        doc_freq (np.ndarray): Количество документов с токеном.
+        term_freq (np.ndarray): Количество вхождений токена.
+        doc_refs (np.ndarray): Внешний номер каждого документа (например, номер статьи в корпусе).
+    """
+
+    def __init__(self, vocab, doc_tokens, doc_offsets, doc_postings, doc_posting_offsets,
+                 position_postings, position_posting_offsets, doc_freq, term_freq, doc_refs):
+        self.vocab = vocab
+        self.doc_tokens = doc_tokens
+        self.doc_offsets = doc_offsets
+        self.doc_postings = doc_postings
+        self.doc_posting_offsets = doc_posting_offsets
+        self.position_postings = position_postings
+        self.position_posting_offsets = position_posting_offsets
+        self.doc_freq = doc_freq
+        self.term_freq = term_freq
+        self.doc_refs = doc_refs
+
+    @classmethod
+    def build(cls, tokens_list, doc_refs=None):
+        """
+        Построение индекса.
+
+        Args:
+            tokens_list (list): Списки токенов документов.
+            doc_refs (list): Внешние номера документов (по умолчанию 0..n-1).
+        """
+        index = {}
+        ids = []
+        doc_lengths = np.empty(len(tokens_list), dtype=np.int64)
+        for i, tokens in enumerate(tokens_list):
+            doc_lengths[i] = len(tokens)
+            ids.extend(index.setdefault(token, len(index)) for token in tokens)
+        # Перенумерация в порядке сортированного словаря
+        tokens = list(index)
+        order = sorted(range(len(tokens)), key=tokens.__getitem__)
+        vocab = [tokens[i] for i in order]
+        rank = np.empty(len(vocab), dtype=np.int64)
+        rank[order] = np.arange(len(vocab))
+        ids = rank[np.asarray(ids, dtype=np.int64)] if ids else np.zeros(0, dtype=np.int64)
+
+        doc_offsets = np.concatenate(([0], np.cumsum(doc_lengths)))
+        docs = np.repeat(np.arange(len(tokens_list)), doc_lengths)
+        positions = np.arange(len(ids)) - doc_offsets[docs]
+
+        # Вхождения по токенам; внутри токена — по документам и позициям (сортировка устойчивая)
+        order = np.argsort(ids, kind='stable')
+        tokens_sorted, docs_sorted, positions_sorted = ids[order], docs[order], positions[order]
+        n = len(order)
+        new_group = np.ones(n, dtype=bool)
+        new_group[1:] = (tokens_sorted[1:] != tokens_sorted[:-1]) | (docs_sorted[1:] != docs_sorted[:-1])
+        group_starts = np.flatnonzero(new_group)
+        group_tokens = tokens_sorted[group_starts]
+        group_docs = docs_sorted[group_starts]
+        group_counts = np.diff(np.append(group_starts, n))
+
+        doc_deltas = group_docs.copy()
+        same_token = np.zeros(len(group_starts), dtype=bool)
+        same_token[1:] = group_tokens[1:] == group_tokens[:-1]
+        doc_deltas[same_token] = (group_docs[1:] - group_docs[:-1])[same_token[1:]]
+        position_deltas = positions_sorted.copy()
+        position_deltas[~new_group] = (positions_sorted[1:] - positions_sorted[:-1])[~new_group[1:]]
+
+        # Поток документов: пары (разность номеров документов, количество вхождений)
+        doc_postings, doc_sizes = varint_encode(np.column_stack((doc_deltas, group_counts)).ravel())
+        doc_bytes = np.bincount(np.repeat(group_tokens, 2), weights=doc_sizes, minlength=len(vocab))
+        position_postings, position_sizes = varint_encode(position_deltas)
+        position_bytes = np.bincount(tokens_sorted, weights=position_sizes, minlength=len(vocab))
+        return cls(
+            vocab=vocab,
+            doc_tokens=ids.astype(np.uint32),
+            doc_offsets=doc_offsets,
+            doc_postings=doc_postings,
+            doc_posting_offsets=np.concatenate(([0], np.cumsum(doc_bytes).astype(np.int64))),
+            position_postings=position_postings,
+            position_posting_offsets=np.concatenate(([0], np.cumsum(position_bytes).astype(np.int64))),
+            doc_freq=np.bincount(group_tokens, minlength=len(vocab)),
+            term_freq=np.bincount(tokens_sorted, minlength=len(vocab)),
+            doc_refs=np.asarray(doc_refs if doc_refs is not None else np.arange(len(tokens_list)), dtype=np.int64)
+        )
+
+    @property
+    def num_docs(self):
+        return len(self.doc_offsets) - 1
+
+    def size_bytes(self):
+        """Размер индекса в памяти (массивы numpy, без строк словаря)."""
+        return sum(array.nbytes for array in (
+            self.doc_tokens, self.doc_offsets, self.doc_postings, self.doc_posting_offsets, self.position_postings,
+            self.position_posting_offsets, self.doc_freq, self.term_freq, self.doc_refs))
+
+    def token_range(self, query, prefix=False):
+        """Диапазон идентификаторов [начало, конец) токенов, равных query или начинающихся с него."""
+        start = bisect.bisect_left(self.vocab, query)
+        if not prefix:
+            return start, start + 1 if start < len(self.vocab) and self.vocab[start] == query else start
+        return start, bisect.bisect_left(self.vocab, query + '\U0010ffff', lo=start)
+
+    def occurrences(self, first, last=None):
+        """
+        Вхождения токенов с идентификаторами [first, last) (по умолчанию — одного токена first).
+
+        Returns:
+            tuple: (номера документов, позиции) — по одному элементу на вхождение,
+                по токенам, внутри токена — по документам и позициям.
+        """
+        if last is None:
+            last = first + 1
+        pairs = varint_decode(self.doc_postings[self.doc_posting_offsets[first]:self.doc_posting_offsets[last]])
+        doc_deltas, counts = pairs[0::2], pairs[1::2]
+        # Разности документов отсчитываются заново с начала каждого токена
+        doc_freq = self.doc_freq[first:last]
+        token_starts = np.cumsum(doc_freq) - doc_freq
+        docs = np.cumsum(doc_deltas)
+        if len(docs):
+            docs -= np.repeat(docs[token_starts] - doc_deltas[token_starts], doc_freq)
+        # Разности позиций — с начала каждого документа
+        position_deltas = varint_decode(self.position_postings[
+            self.position_posting_offsets[first]:self.position_posting_offsets[last]])
+        group_starts = np.cumsum(counts) - counts
+        positions = np.cumsum(position_deltas)
+        if len(positions):
+            positions -= np.repeat(positions[group_starts] - position_deltas[group_starts], counts)
+        return np.repeat(docs, counts), positions
+
+    def context(self, doc, position, window=5):
+        """Фрагмент контекста: (левые токены, токен, правые токены)."""
+        start, end = self.doc_offsets[doc], self.doc_offsets[doc + 1]
+        ids = self.doc_tokens[max(start, start + position - window):min(end, start + position + window + 1)]
+        words = [self.vocab[token_id] for token_id in ids.tolist()]
+        center = min(position, window)
+        return ' '.join(words[:center]), words[center], ' '.join(words[center + 1:])
+
+    def search(self, query, prefix=False, limit=20, window=5, max_tokens=50):
+        """
+        Поиск токена (или префикса) с фрагментами контекста.
+
+        Args:
+            query (str): Токен или префикс.
+            prefix (bool): Искать все токены, начинающиеся с query.
+            limit (int): Максимальное количество фрагментов (первые вхождения в порядке документов).
+            window (int): Количество токенов контекста с каждой стороны.
+            max_tokens (int): Максимальное количество найденных токенов в ответе (самые частые).
+
+        Returns:
+            dict: tokens (найденные токены с частотами), documents (количество документов),
+                occurrences (количество вхождений), snippets (doc, left, token, right) и time_ms.
+        """
+        start_time = time.perf_counter()
+        first, last = self.token_range(query, prefix)
+        token_ids = np.arange(first, last)
+        found = token_ids[np.argsort(-self.term_freq[token_ids], kind='stable')]
+
+        docs, positions = self.occurrences(first, last)
+        first_hits = np.lexsort((positions, docs))[:limit]
+
+        snippets = []
+        for i in first_hits.tolist():
+            left, token, right = self.context(docs[i], positions[i], window)
+            snippets.append({'doc': int(self.doc_refs[docs[i]]), 'left': left, 'token': token, 'right': right})
+        return {
+            'tokens': [(self.vocab[token_id], int(self.term_freq[token_id]), int(self.doc_freq[token_id]))
+                       for token_id in found[:max_tokens].tolist()],
+            'documents': len(np.unique(docs)),
+            'occurrences': len(docs),
+            'snippets': snippets,
+            'time_ms': (time.perf_counter() - start_time) * 1000
+        }
+
+    def save(self, path):
+        """Сохранение в .npz (словарь — строки UTF-8, разделённые нулевым байтом)."""
+        vocab = np.frombuffer('\0'.join(self.vocab).encode('utf-8'), dtype=np.uint8)
+        np.savez(path, vocab=vocab, doc_tokens=self.doc_tokens, doc_offsets=self.doc_offsets,
+                 doc_postings=self.doc_postings, doc_posting_offsets=self.doc_posting_offsets,
+                 position_postings=self.position_postings, position_posting_offsets=self.position_posting_offsets,
+                 doc_freq=self.doc_freq, term_freq=self.term_freq, doc_refs=self.doc_refs)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        text = arrays.pop('vocab').tobytes().decode('utf-8')
+        return cls(vocab=text.split('\0') if text else [], **arrays)
+
+def read_tokens(input_file, field='tokens'):
+    """Списки токенов и номера статей из JSONL со списками токенов (например, выход pipeline.py --tokens)."""
+    import json
+    from corpus_io import open_corpus
+
+    tokens_list = []
+    doc_refs = []
+    with open_corpus(input_file) as f:
+        for i, line in enumerate(f):
+            if line.strip():
+                tokens = json.loads(line).get(field) or []
+                if tokens:
+                    tokens_list.append(tokens)
+                    doc_refs.append(i)
+    return tokens_list, doc_refs
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Инвертированный индекс токенов и поиск с контекстом")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help="Построить индекс по статьям с токенами")
+    build.add_argument('input', help="JSONL со списками токенов (pipeline.py --tokens)")
+    build.add_argument('--output', default='token_index.npz')
+    build.add_argument('--field', default='tokens')
+
+    search = subparsers.add_parser('search', help="Найти токен (или префикс со звёздочкой: москв*)")
+    search.add_argument('index')
+    search.add_argument('query')
+    search.add_argument('--limit', type=int, default=20)
+    search.add_argument('--window', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        start_time = time.perf_counter()
+        index = InvertedIndex.build(*read_tokens(args.input, args.field))
+        index.save(args.output)
+        print(f"Индекс: {index.num_docs} документов, {len(index.vocab)} токенов, "
+              f"{index.size_bytes() / 1024 / 1024:.1f} МБ за {time.perf_counter() - start_time:.1f} сек -> {args.output}")
+    else:
+        index = InvertedIndex.load(args.index)
+        result = index.search(args.query.rstrip('*'), prefix=args.query.endswith('*'),
+                              limit=args.limit, window=args.window)
+        print(f"Документов: {result['documents']}, вхождений: {result['occurrences']} ({result['time_ms']:.1f} мс)")
+        for snippet in result['snippets']:
+            print(f"#{snippet['doc']:>6}  {snippet['left']:>50} [{snippet['token']}] {snippet['right']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+import os
+import time
+import uuid
+import threading
+from collections import deque
+from sampling import percentile
+
+# Общий для всех сессий дашборда планировщик задач обработки.
+#
+# Задачи выполняются ограниченным пулом потоков (max_workers), поэтому одновременные
+# запуски нескольких аналитиков не перегружают процессор. У каждого пользователя своя
+# очередь; освободившийся поток берёт задачу следующего по кругу пользователя, так что
+# серия запусков одного пользователя не задерживает остальных. Одинаковые задачи
+# (одинаковый ключ: хеш файла, метод и параметры), ожидающие в очереди или уже
+# выполняющиеся, объединяются в одно вычисление. При переполнении очереди задача
+# отклоняется (SchedulerBusy): дашборд сообщает о нагрузке, а не копит работу.
+#
+# Результаты задач (токены, индексы, агрегаты) занимают много памяти, поэтому
+# планировщик освобождает результат, как только его забрали все пользователи задачи
+# (collect), а задачи, результат которых так и не забрали, удаляет через keep_finished_sec.
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed', 'cancelled')
+
+class SchedulerBusy(RuntimeError):
+    """Очередь заполнена: задача не принята."""
+
+class Job:
+    """
+    Задача планировщика.
+
+    Функция задачи получает один аргумент — report(fraction, message) для
+    сообщения о ходе выполнения — и возвращает результат.
+
+    Attributes:
+        id (str): Идентификатор задачи.
+        key (str): Ключ объединения одинаковых задач.
+        users (set): Пользователи, ожидающие результат (ещё не забравшие его).
+        status (str): Одно из JOB_STATUSES.
+        progress (float): Доля выполненной работы (0..1).
+        message (str): Последнее сообщение о ходе выполнения.
+    """
+
+    def __init__(self, key, fn, user):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.fn = fn
+        self.users = {user}
+        self.status = 'queued'
+        self.progress = 0.0
+        self.message = ''
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.released = False
+        self._done = threading.Event()
+
+    def report(self, fraction, message=''):
+        self.progress = min(max(fraction, 0.0), 1.0)
+        self.message = message
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Ожидание завершения; True, если задача завершилась."""
+        return self._done.wait(timeout)
+
+    def get(self):
+        """Результат завершённой задачи (исключение задачи пробрасывается)."""
+        if self.error is not None:
+            raise self.error
+        if self.status == 'cancelled':
+            raise RuntimeError("Задача отменена")
+        if self.released:
+            raise RuntimeError("Результат задачи уже получен и освобождён")
+        return self.result
+
+    @property
+    def wait_sec(self):
+        """Время ожидания в очереди."""
+        return (self.started_at or self.finished_at or time.time()) - self.submitted_at
+
+    @property
+    def run_sec(self):
+        """Время выполнения."""
+        return (self.finished_at or time.time()) - self.started_at if self.started_at else 0.0
+
+class JobScheduler:
+    """
+    Планировщик с ограниченным пулом потоков, очередями пользователей и объединением задач.
+
+    Args:
+        max_workers (int): Количество одновременно выполняемых задач (по умолчанию — число ядер).
+        max_queued (int): Максимальное количество ожидающих задач всех пользователей.
+        max_queued_per_user (int): Максимальное количество ожидающих задач одного пользователя.
+        history (int): Количество последних задач в статистике задержек.
+        keep_finished_sec (float): Сколько секунд завершённая задача доступна по идентификатору.
+    """
+
+    def __init__(self, max_workers=None, max_queued=32, max_queued_per_user=2, history=200,
+                 keep_finished_sec=600):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self.keep_finished_sec = keep_finished_sec
+        self._condition = threading.Condition()
+        self._queues = {}
+        self._turns = deque()
+        self._active = {}
+        self._jobs = {}
+        self._running = 0
+        self._wait_times = deque(maxlen=history)
+        self._run_times = deque(maxlen=history)
+        self.counters = {name: 0 for name in ('submitted', 'coalesced', 'rejected', 'cancelled', 'done', 'failed')}
+        self._workers = [threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                         for i in range(self.max_workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, key, fn, user, replace=True):
+        """
+        Постановка задачи в очередь пользователя.
+
+        Args:
+            key (str): Ключ задачи: задачи с одинаковым ключом, ожидающие или выполняющиеся,
+                объединяются (возвращается уже существующая задача).
+            fn (callable): Функция задачи: fn(report) -> результат.
+            user (str): Пользователь (например, идентификатор сессии).
+            replace (bool): Отменить ожидающие задачи этого пользователя, которые больше никому не нужны.
+
+        Returns:
+            Job: Новая или объединённая задача.
+
+        Raises:
+            SchedulerBusy: Очередь пользователя или общая очередь заполнена.
+        """
+        with self._condition:
+            self._purge_finished()
+            job = self._active.get(key)
+            if job is not None:
+                job.users.add(user)
+                self.counters['coalesced'] += 1
+                return job
+            if replace:
+                for queued in list(self._queues.get(user, ())):
+                    self._cancel(queued, user)
+            queued_total = sum(len(queue) for queue in self._queues.values())
+            if len(self._queues.get(user, ())) >= self.max_queued_per_user or queued_total >= self.max_queued:
+                self.counters['rejected'] += 1
+                raise SchedulerBusy(f"Очередь заполнена: ожидают {queued_total} задач, "
+                                    f"выполняются {self._running} из {self.max_workers}")
+            job = Job(key, fn, user)
+            if user not in self._queues:
+                self._queues[user] = deque()
+                self._turns.append(user)
+            self._queues[user].append(job)
+            self._active[key] = job
+            self._jobs[job.id] = job
+            self.counters['submitted'] += 1
+            self._condition.notify()
+            return job
+
+    def get(self, job_id):
+        """Задача по идентификатору (None, если неизвестна или уже удалена)."""
+        with self._condition:
+            return self._jobs.get(job_id)
+
+    def collect(self, job, user):
+        """
+        Результат завершённой задачи для пользователя (исключение задачи пробрасывается).
+        Когда результат забрали все пользователи задачи, планировщик его освобождает.
+        """
+        with self._condition:
+            try:
+                return job.get()
+            finally:
+                job.users.discard(user)
+                self._release_if_collected(job)
+
+    def _release_if_collected(self, job):
+        if job.users or not job.done:
+            return
+        job.result = None
+        job.released = True
+        self._jobs.pop(job.id, None)
+
+    def cancel(self, job, user):
+        """
+        Отказ пользователя от задачи. Ожидающая задача отменяется, когда от неё
+        отказались все пользователи; выполняющаяся задача доводится до конца.
+        """
+        with self._condition:
+            self._cancel(job, user)
+
+    def _cancel(self, job, user):
+        job.users.discard(user)
+        if job.status != 'queued':
+            self._release_if_collected(job)
+            return
+        if job.users:
+            return
+        for owner, queue in self._queues.items():
+            if job in queue:
+                queue.remove(job)
+                if not queue:
+                    del self._queues[owner]
+                    self._turns.remove(owner)
+                break
+        self._active.pop(job.key, None)
+        job.status = 'cancelled'
+        job.finished_at = time.time()
+        self.counters['cancelled'] += 1
+        job._done.set()
+
+    def queue_position(self, job):
+        """Количество задач, которые начнут выполняться раньше данной (0 — следующая)."""
+        with self._condition:
+            if job.status != 'queued':
+                return 0
+            queues = {user: list(queue) for user, queue in self._queues.items()}
+            turns = list(self._turns)
+            position = 0
+            # Проигрываем круговой обход очередей до нужной задачи
+            while turns:
+                user = turns.pop(0)
+                candidate = queues[user].pop(0)
+                if candidate is job:
+                    return position
+                position += 1
+                if queues[user]:
+                    turns.append(user)
+            return position
+
+    def _next_job(self):
+        user = self._turns.popleft()
+        queue = self._queues[user]
+        job = queue.popleft()
+        if queue:
+            self._turns.append(user)
+        else:
+            del self._queues[user]
+        return job
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._turns:
+                    self._condition.wait()
+                job = self._next_job()
+                job.status = 'running'
+                job.started_at = time.time()
+                self._running += 1
+            try:
+                result, error = job.fn(job.report), None
+            except Exception as e:
+                result, error = None, e
+            with self._condition:
+                self._running -= 1
+                if self._active.get(job.key) is job:
+                    del self._active[job.key]
+                job.result, job.error = result, error
+                job.status = 'failed' if error is not None else 'done'
+                job.finished_at = time.time()
+                if error is None:
+                    job.progress = 1.0
+                self.counters[job.status] += 1
+                self._wait_times.append(job.started_at - job.submitted_at)
+                self._run_times.append(job.finished_at - job.started_at)
+                job._done.set()
+                # Результат, от которого отказались все пользователи, сразу освобождается
+                self._release_if_collected(job)
+                # Задачи чистятся и здесь: без новых запусков их результаты иначе оставались бы в памяти
+                self._purge_finished()
+
+    def _purge_finished(self):
+        deadline = time.time() - self.keep_finished_sec
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < deadline]:
+            job = self._jobs.pop(job_id)
+            job.result = None
+            job.released = True
+
+    def stats(self):
+        """
+        Текущее состояние очередей и задержки последних задач.
+
+        Returns:
+            dict: workers, running, queued, users_waiting, wait_p50/wait_p95 и run_p50/run_p95
+                (секунды) и счётчики submitted, coalesced, rejected, cancelled, done, failed.
+        """
+        with self._condition:
+            wait_times = list(self._wait_times)
+            run_times = list(self._run_times)
+            return {
+                'workers': self.max_workers,
+                'running': self._running,
+                'queued': sum(len(queue) for queue in self._queues.values()),
+                'users_waiting': len(self._queues),
+                'wait_p50': percentile(wait_times, 0.5),
+                'wait_p95': percentile(wait_times, 0.95),
+                'run_p50': percentile(run_times, 0.5),
+                'run_p95': percentile(run_times, 0.95),
+                **self.counters
+            }
@@ -0,0 +1,360 @@
+import os
+import re
+import sys
+import json
+import mmap
+import struct
+import zlib
+from array import array
+
+# Предкомпилированная таблица лемм pymorphy2.
+#
+# pymorphy2 один раз прогоняется по словарю корпусов, результат записывается
+# в компактный файл, который открывается через mmap. Лемматизация сначала ищет
+# токен в таблице и обращается к pymorphy2 только при промахе, поэтому процессы-
+# обработчики не создают MorphAnalyzer (пока нет промахов), а страницы таблицы
+# разделяются между процессами через кеш ОС.
+#
+# Формат файла (порядок байт платформы, он записан в заголовке):
+#   заголовок      — магия b'LEMT', версия формата, порядок байт, число токенов, лемм и слотов
+#   slots          uint32[слотов]      — хеш-индекс с открытой адресацией: номер токена + 1 (0 — пусто)
+#   token_offsets  uint32[токенов + 1] — смещения токенов в token_data
+#   token_lemmas   uint32[токенов]     — номер леммы токена
+#   lemma_offsets  uint32[лемм + 1]    — смещения лемм в lemma_data
+#   token_data, lemma_data             — строки UTF-8 подряд (токены отсортированы, леммы без повторов)
+# Слот токена — crc32 его байтов по модулю числа слотов (степень двойки, заполнение
+# не больше половины); при коллизии проверяется следующий слот.
+#
+# Промахи можно дописывать в журнал рядом с таблицей (<таблица>.misses, строки JSON);
+# compact переносит их в таблицу.
+
+DEFAULT_TABLE_PATH = 'lemma_table.bin'
+FORMAT_VERSION = 1
+
+_MAGIC = b'LEMT'
+_HEADER = struct.Struct('=4sHHIII12x')
+_BYTEORDER = {'little': 1, 'big': 2}
+_WORD_RE = re.compile(r'\w+')
+
+def journal_path(path):
+    return f"{path}.misses"
+
+def _pack(strings):
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = array('I', [0])
+    position = 0
+    for value in encoded:
+        position += len(value)
+        offsets.append(position)
+    return encoded, offsets
+
+def write_table(lemmas, path=DEFAULT_TABLE_PATH):
+    """
+    Запись таблицы лемм (атомарно: через временный файл).
+
+    Args:
+        lemmas (dict): Токен -> лемма.
+        path (str): Путь к файлу таблицы.
+
+    Returns:
+        int: Количество токенов в таблице.
+    """
+    tokens = sorted(lemmas)
+    lemma_ids = {}
+    token_lemmas = array('I', (lemma_ids.setdefault(lemmas[token], len(lemma_ids)) for token in tokens))
+    token_data, token_offsets = _pack(tokens)
+    lemma_data, lemma_offsets = _pack(lemma_ids)
+
+    num_slots = 1 << max(1, (2 * len(tokens)).bit_length())
+    mask = num_slots - 1
+    slots = array('I', bytes(4 * num_slots))
+    for index, key in enumerate(token_data):
+        slot = zlib.crc32(key) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = index + 1
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, FORMAT_VERSION, _BYTEORDER[sys.byteorder], len(tokens), len(lemma_ids), num_slots))
+        for section in (slots, token_offsets, token_lemmas, lemma_offsets):
+            section.tofile(f)
+        f.write(b''.join(token_data))
+        f.write(b''.join(lemma_data))
+    os.replace(tmp_path, path)
+    return len(tokens)
+
+class LemmaTable:
+    """
+    Таблица лемм, открытая через mmap (только чтение).
+
+    Args:
+        path (str): Путь к файлу таблицы.
+    """
+
+    def __init__(self, path=DEFAULT_TABLE_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, byteorder, num_tokens, num_lemmas, num_slots = _HEADER.unpack_from(self._mmap)
+        if magic != _MAGIC or version != FORMAT_VERSION:
+            self._mmap.close()
+            raise ValueError(f"{path}: не таблица лемм версии {FORMAT_VERSION}")
+        if byteorder != _BYTEORDER[sys.byteorder]:
+            self._mmap.close()
+            raise ValueError(f"{path}: таблица собрана на платформе с другим порядком байт, пересоберите её")
+
+        self._view = memoryview(self._mmap)
+        position = _HEADER.size
+        sections = []
+        for count in (num_slots, num_tokens + 1, num_tokens, num_lemmas + 1):
+            sections.append(self._view[position:position + 4 * count].cast('I'))
+            position += 4 * count
+        self._slots, self._token_offsets, self._token_lemmas, self._lemma_offsets = sections
+        self._token_data = self._view[position:position + self._token_offsets[-1]]
+        position += self._token_offsets[-1]
+        self._lemma_data = self._view[position:position + self._lemma_offsets[-1]]
+        self._mask = num_slots - 1
+        self.size = num_tokens
+        self._version = None
+
+    def __len__(self):
+        return self.size
+
+    def _token(self, index):
+        return str(self._token_data[self._token_offsets[index]:self._token_offsets[index + 1]], 'utf-8')
+
+    def _lemma(self, index):
+        return str(self._lemma_data[self._lemma_offsets[index]:self._lemma_offsets[index + 1]], 'utf-8')
+
+    def get(self, token, default=None):
+        """Лемма токена или default, если токена нет в таблице."""
+        key = token.encode('utf-8')
+        slots, offsets, data, mask = self._slots, self._token_offsets, self._token_data, self._mask
+        slot = zlib.crc32(key) & mask
+        while True:
+            index = slots[slot]
+            if not index:
+                return default
+            start, end = offsets[index - 1], offsets[index]
+            if end - start == len(key) and data[start:end] == key:
+                return self._lemma(self._token_lemmas[index - 1])
+            slot = (slot + 1) & mask
+
+    @property
+    def version(self):
+        """Контрольная сумма содержимого таблицы (меняется при пересборке и compact)."""
+        if self._version is None:
+            self._version = f"{self.size}:{zlib.crc32(self._view):08x}"
+        return self._version
+
+    def items(self):
+        """Пары (токен, лемма) в порядке сортировки токенов."""
+        for index in range(self.size):
+            yield self._token(index), self._lemma(self._token_lemmas[index])
+
+    def close(self):
+        # mmap нельзя закрыть, пока на него ссылаются memoryview
+        for view in (self._slots, self._token_offsets, self._token_lemmas, self._lemma_offsets,
+                     self._token_data, self._lemma_data, self._view):
+            view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def read_journal(path):
+    """Промахи, дописанные в журнал таблицы: токен -> лемма (пустой словарь, если журнала нет)."""
+    lemmas = {}
+    try:
+        with open(journal_path(path), 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    token, lemma = json.loads(line)
+                except ValueError:
+                    # Недописанная строка (процесс прервали во время записи)
+                    continue
+                lemmas[token] = lemma
+    except FileNotFoundError:
+        pass
+    return lemmas
+
+class Lemmatizer:
+    """
+    Лемматизация через таблицу лемм с обращением к pymorphy2 при промахах.
+
+    Args:
+        table (LemmaTable): Таблица лемм (None — только pymorphy2).
+        analyzer_factory (callable): Функция, создающая MorphAnalyzer (или возвращающая None,
+            если pymorphy2 недоступен). Вызывается один раз — при первом промахе.
+        learn (bool): Дописывать промахи в журнал таблицы, чтобы compact добавил их в таблицу.
+    """
+
+    def __init__(self, table=None, analyzer_factory=None, learn=False):
+        self.table = table
+        self.learn = learn and table is not None
+        self.hits = 0
+        self.misses = 0
+        self._analyzer_factory = analyzer_factory
+        self._analyzer = None
+        self._analyzer_loaded = False
+        # Уже найденные леммы: промахи из журнала (в том числе других процессов)
+        # и результаты поиска в таблице, чтобы повторный поиск был обычным обращением к словарю
+        self._known = read_journal(table.path) if table is not None else {}
+        self._journal_size = len(self._known)
+        self._journal = None
+
+    @property
+    def analyzer(self):
+        if not self._analyzer_loaded:
+            self._analyzer = self._analyzer_factory() if self._analyzer_factory else None
+            self._analyzer_loaded = True
+        return self._analyzer
+
+    def preload(self):
+        """Загрузка pymorphy2 сразу, не дожидаясь первого промаха."""
+        self.analyzer
+        return self
+
+    @property
+    def available(self):
+        """Можно ли лемматизировать (есть таблица или pymorphy2)."""
+        return self.table is not None or self.analyzer is not None
+
+    @property
+    def version(self):
+        """
+        Версия источника лемм для ключей кеша токенов: таблица и прочитанный при открытии журнал
+        (без таблицы — только pymorphy2).
+        """
+        if self.table is None:
+            return 'pymorphy2'
+        return f"{self.table.version}+{self._journal_size}"
+
+    def normal_form(self, token):
+        """Лемма токена (без таблицы и pymorphy2 токен возвращается без изменений)."""
+        lemma = self._known.get(token)
+        if lemma is None and self.table is not None:
+            lemma = self.table.get(token)
+            if lemma is not None:
+                self._known[token] = lemma
+        if lemma is not None:
+            self.hits += 1
+            return lemma
+        analyzer = self.analyzer
+        if analyzer is None:
+            return token
+        self.misses += 1
+        lemma = self._known[token] = analyzer.parse(token)[0].normal_form
+        if self.learn:
+            if self._journal is None:
+                # Построчная буферизация: каждая запись — один write в режиме дозаписи,
+                # поэтому строки разных процессов не перемешиваются
+                self._journal = open(journal_path(self.table.path), 'a', encoding='utf-8', buffering=1)
+            self._journal.write(json.dumps([token, lemma], ensure_ascii=False) + '\n')
+        return lemma
+
+    def lemmatize(self, tokens):
+        return [self.normal_form(token) for token in tokens]
+
+def open_lemmatizer(path=DEFAULT_TABLE_PATH, analyzer_factory=None, learn=False):
+    """Лемматизатор с таблицей path, если она существует, иначе только с pymorphy2."""
+    if learn and path and not os.path.exists(path):
+        # Промахи копятся в журнале пустой таблицы до следующего compact
+        write_table({}, path)
+    table = None
+    if path and os.path.exists(path):
+        try:
+            table = LemmaTable(path)
+        except ValueError as e:
+            print(f"Таблица лемм не загружена: {e}")
+    return Lemmatizer(table, analyzer_factory, learn)
+
+def iter_vocabulary(input_files):
+    """Токены (\\w+) текстов корпусов: JSONL или каталоги колоночного корпуса."""
+    for input_file in input_files:
+        if os.path.isdir(input_file):
+            import corpus_store
+
+            texts = corpus_store.iter_texts(input_file)
+        else:
+            texts = _iter_jsonl_texts(input_file)
+        for text in texts:
+            yield from _WORD_RE.findall(text)
+
+def _iter_jsonl_texts(input_file):
+    from corpus_io import open_corpus
+
+    with open_corpus(input_file) as f:
+        for line in f:
+            try:
+                article = json.loads(line.strip())
+            except ValueError:
+                continue
+            text = article.get('preprocessed_text', article.get('cleaned_text', article.get('text', '')))
+            if text:
+                yield text
+
+def _default_analyzer():
+    from pymorphy2 import MorphAnalyzer
+    return MorphAnalyzer()
+
+def build_table(tokens, path=DEFAULT_TABLE_PATH, analyzer=None, min_count=1):
+    """
+    Сборка таблицы лемм по словарю.
+
+    Args:
+        tokens (iterable): Токены корпусов (с повторами).
+        path (str): Путь к файлу таблицы.
+        analyzer: MorphAnalyzer (по умолчанию создаётся новый).
+        min_count (int): Минимальная частота токена для попадания в таблицу.
+
+    Returns:
+        int: Количество токенов в таблице.
+    """
+    from collections import Counter
+
+    analyzer = analyzer or _default_analyzer()
+    counts = Counter(tokens)
+    lemmas = {token: analyzer.parse(token)[0].normal_form
+              for token, count in counts.items() if count >= min_count}
+    return write_table(lemmas, path)
+
+def compact(path=DEFAULT_TABLE_PATH):
+    """Перенос промахов из журнала в таблицу; возвращает количество добавленных токенов."""
+    with LemmaTable(path) as table:
+        lemmas = dict(table.items())
+    added = {token: lemma for token, lemma in read_journal(path).items() if token not in lemmas}
+    lemmas.update(added)
+    write_table(lemmas, path)
+    if os.path.exists(journal_path(path)):
+        os.remove(journal_path(path))
+    return len(added)
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Сборка таблицы лемм pymorphy2")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help="Собрать таблицу по словарю корпусов")
+    build.add_argument('inputs', nargs='+', help="JSONL-файлы или каталоги колоночного корпуса")
+    build.add_argument('--output', default=DEFAULT_TABLE_PATH)
+    build.add_argument('--min-count', type=int, default=1)
+
+    compact_parser = subparsers.add_parser('compact', help="Добавить в таблицу промахи из журнала")
+    compact_parser.add_argument('table', nargs='?', default=DEFAULT_TABLE_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        size = build_table(iter_vocabulary(args.inputs), args.output, min_count=args.min_count)
+        print(f"Таблица лемм: {size} токенов, {os.path.getsize(args.output) / 1024 / 1024:.1f} МБ -> {args.output}")
+    else:
+        added = compact(args.table)
+        print(f"Добавлено токенов из журнала: {added}")
+
+if __name__ == '__main__':
+    main()
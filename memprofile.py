@@ -0,0 +1,215 @@
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+# Профилирование памяти методов токенизации (по запросу).
+#
+# Для каждого этапа (токенизация, OOV, сходство, ...) фиксируются:
+#   - пик памяти Python-объектов (tracemalloc) относительно начала этапа;
+#   - пик RSS процесса (фоновый поток опрашивает RSS с заданным интервалом);
+#   - память, оставшаяся занятой после этапа;
+#   - места с наибольшими выделениями памяти за этап.
+# tracemalloc замедляет выполнение в несколько раз, поэтому время, измеренное
+# при включённом профилировании, не сравнимо с обычными замерами.
+# tracemalloc и RSS общие для процесса: если в нём одновременно работают другие
+# задачи (потоки), их выделения попадают в замер. Такие этапы помечаются
+# (concurrent_jobs), а итог метода — как приблизительный (mem_approximate).
+
+MB = 1024 * 1024
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def rss_bytes():
+    """Текущий RSS процесса в байтах (psutil, /proc или пиковый RSS из resource)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        import resource
+        # ru_maxrss — пиковое значение (в КБ на Linux, в байтах на macOS)
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if os.uname().sysname == 'Darwin' else maxrss * 1024
+
+class RSSSampler:
+    """
+    Фоновый опрос RSS: пиковое значение за время работы.
+
+    Args:
+        interval (float): Интервал опроса в секундах.
+        probe (callable): Дополнительная величина, опрашиваемая вместе с RSS
+            (её максимум — в probe_peak).
+    """
+
+    def __init__(self, interval=0.05, probe=None):
+        self.interval = interval
+        self.probe = probe
+        self.peak = 0
+        self.probe_peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _poll(self):
+        self.peak = max(self.peak, rss_bytes())
+        if self.probe is not None:
+            self.probe_peak = max(self.probe_peak, self.probe())
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._poll()
+
+    def start(self):
+        self.peak = rss_bytes()
+        self.probe_peak = self.probe() if self.probe is not None else 0
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._poll()
+        return self.peak
+
+@contextmanager
+def measure_rss():
+    """Изменение RSS за время блока (например, при загрузке модели): результат в словаре {'rss_bytes': ...}."""
+    result = {}
+    before = rss_bytes()
+    try:
+        yield result
+    finally:
+        result['rss_bytes'] = max(rss_bytes() - before, 0)
+
+# Выделения самого профилировщика (снимки, поток опроса RSS) не попадают в отчёт
+_OWN_FRAMES = [tracemalloc.Filter(False, path) for path in (tracemalloc.__file__, threading.__file__, __file__)]
+
+def _site_name(path, lineno):
+    # Последние два компонента пути: у "__init__.py" без каталога не понять, что это за модуль
+    return f"{os.path.join(os.path.basename(os.path.dirname(path)), os.path.basename(path))}:{lineno}"
+
+class MemoryProfiler:
+    """
+    Профилировщик памяти по этапам.
+
+    Args:
+        enabled (bool): Включено ли профилирование (при False этапы ничего не измеряют).
+        top (int): Количество мест выделения памяти в отчёте этапа.
+        sample_interval (float): Интервал опроса RSS в секундах.
+        frames (int): Глубина стека, сохраняемая tracemalloc для каждого выделения.
+        concurrency (callable): Функция без аргументов — сколько других задач сейчас
+            выполняется в этом процессе (None — профилируемая задача в процессе одна).
+    """
+
+    def __init__(self, enabled=True, top=5, sample_interval=0.05, frames=1, concurrency=None):
+        self.enabled = enabled
+        self.top = top
+        self.sample_interval = sample_interval
+        self.frames = frames
+        self.concurrency = concurrency
+        self.records = []
+        self._started_tracing = False
+
+    def start(self):
+        if self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        return self
+
+    def stop(self):
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    @contextmanager
+    def stage(self, method, stage):
+        """
+        Измерение одного этапа метода.
+
+        Yields:
+            dict: Запись этапа; после выхода из блока содержит peak_bytes, retained_bytes,
+                rss_peak_bytes, rss_start_bytes, top_sites и concurrent_jobs (наибольшее
+                число других задач процесса за время этапа).
+        """
+        record = {'method': method, 'stage': stage}
+        if not self.enabled:
+            yield record
+            return
+        self.start()
+        snapshot_before = tracemalloc.take_snapshot()
+        current_before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        sampler = RSSSampler(self.sample_interval, self.concurrency).start()
+        rss_start = sampler.peak
+        try:
+            yield record
+        finally:
+            current_after, peak = tracemalloc.get_traced_memory()
+            rss_peak = sampler.stop()
+            snapshot_after = tracemalloc.take_snapshot().filter_traces(_OWN_FRAMES)
+            stats = [stat for stat in snapshot_after.compare_to(snapshot_before.filter_traces(_OWN_FRAMES), 'lineno')
+                     if stat.size_diff > 0]
+            record.update({
+                'peak_bytes': max(peak - current_before, 0),
+                'retained_bytes': current_after - current_before,
+                'rss_start_bytes': rss_start,
+                'rss_peak_bytes': rss_peak,
+                'concurrent_jobs': sampler.probe_peak,
+                'top_sites': [
+                    {'site': _site_name(stat.traceback[0].filename, stat.traceback[0].lineno),
+                     'size_bytes': stat.size_diff, 'count': stat.count_diff}
+                    for stat in stats[:self.top]
+                ]
+            })
+            self.records.append(record)
+
+    def summary(self, method, total_tokens=None, model_bytes=None, shared=()):
+        """
+        Колонки для строки результатов метода.
+
+        Args:
+            method (str): Название метода.
+            total_tokens (int): Количество токенов метода (для bytes_per_token).
+            model_bytes (int): Память, занятая моделью метода.
+            shared (tuple): Ключи общих этапов, выполненных для нескольких методов сразу
+                (например, общая базовая токенизация), которые тоже относятся к методу.
+
+        Returns:
+            dict: mem_peak_mb (наибольший пик по этапам), mem_rss_peak_mb, mem_<этап>_peak_mb,
+                bytes_per_token (пик этапа токенизации на токен), model_rss_mb,
+                mem_top_sites (места выделения самого затратного этапа) и mem_approximate
+                (во время замера в процессе выполнялись другие задачи).
+        """
+        keys = {method, *shared}
+        records = [record for record in self.records if record['method'] in keys and 'peak_bytes' in record]
+        if not records:
+            return {}
+        worst = max(records, key=lambda record: record['peak_bytes'])
+        columns = {
+            'mem_peak_mb': worst['peak_bytes'] / MB,
+            'mem_rss_peak_mb': max(record['rss_peak_bytes'] for record in records) / MB
+        }
+        for record in records:
+            columns[f"mem_{record['stage']}_peak_mb"] = record['peak_bytes'] / MB
+        tokenize_record = next((record for record in records if record['stage'] == 'tokenize'), None)
+        if tokenize_record and total_tokens:
+            columns['bytes_per_token'] = tokenize_record['peak_bytes'] / total_tokens
+        if model_bytes is not None:
+            columns['model_rss_mb'] = model_bytes / MB
+        columns['mem_top_sites'] = '; '.join(
+            f"{site['site']} +{site['size_bytes'] / 1024:.0f} КБ" for site in worst['top_sites']
+        )
+        columns['mem_approximate'] = any(record['concurrent_jobs'] for record in records)
+        return columns
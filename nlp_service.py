@@ -0,0 +1,423 @@
+import os
+import json
+import time
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from sampling import percentile
+
+# Локальный HTTP-сервис токенизации, нормализации, очистки и сходства (asyncio, без веб-фреймворков).
+#
+#   python nlp_service.py --port 8765 --preload razdel nltk_snowball
+#
+#   POST /tokenize    {"texts": [...], "method": "razdel"}               -> {"tokens": [[...], ...]}
+#   POST /normalize   {"tokens": [[...], ...], "method": "nltk_snowball"} -> {"tokens": [[...], ...]}
+#   POST /clean       {"texts": [...], "to_lower": true, "remove_stopwords": true} -> {"texts": [...]}
+#   POST /similarity  {"originals": [...], "processed": [...], "backend": "hashed-ngram"} -> {"scores": [...]}
+#   POST /subword     {"texts": [...], "model": "russian-bpe-16k"}       -> {"ids": [[...]], "tokens": [[...]]}
+#   GET  /health, GET /metrics
+#
+# Вместо "texts" можно передать один "text" (и "original" с "processed" для /similarity,
+# ответ — "score"), тогда и ответ содержит одно значение.
+#
+# Модели загружаются один раз на процесс. Одновременные запросы с одинаковыми параметрами
+# (метод, бэкенд, модель) собираются в пачку: первая строка ждёт не дольше max_wait_ms,
+# пока подойдут другие, после чего пачка целиком уходит в tokenize_batch (nlp.pipe spaCy),
+# Tokenizer.encode_batch или encode SentenceTransformer. Пачки выполняются в пуле из
+# workers потоков. Если в очереди больше max_pending строк, сервис отвечает 503
+# с заголовком Retry-After, а не накапливает задержку.
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 16 * 1024 * 1024
+SUBWORD_MODELS = ('russian-bpe-16k', 'russian-unigram-20k')
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+class Overloaded(HTTPError):
+    """Очередь пачек заполнена."""
+
+    def __init__(self, retry_after=1):
+        super().__init__(503, "Сервис перегружен, повторите запрос позже", {'Retry-After': str(retry_after)})
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+class LatencyStats:
+    """Количество запросов и задержки последних window запросов (миллисекунды)."""
+
+    def __init__(self, window=10000):
+        self.latencies = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+
+    def record(self, latency_ms, status):
+        self.requests += 1
+        if status == 503:
+            self.rejected += 1
+        elif status >= 400:
+            self.errors += 1
+        self.latencies.append(latency_ms)
+
+    def to_dict(self):
+        latencies = list(self.latencies)
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'rejected': self.rejected,
+            'p50_ms': percentile(latencies, 0.5),
+            'p95_ms': percentile(latencies, 0.95),
+            'p99_ms': percentile(latencies, 0.99),
+            'max_ms': max(latencies, default=0.0)
+        }
+
+class MicroBatcher:
+    """
+    Сборка строк одновременных запросов в пачки.
+
+    Args:
+        fn (callable): Обработка пачки: список строк -> список результатов той же длины.
+        executor (Executor): Пул, в котором выполняются пачки.
+        max_batch (int): Максимальное количество строк в пачке.
+        max_wait_ms (float): Сколько ждать следующих запросов после первого.
+        max_pending (int): Максимальное количество ожидающих строк (больше — Overloaded).
+    """
+
+    def __init__(self, fn, executor, max_batch=64, max_wait_ms=5, max_pending=2048):
+        self.fn = fn
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.max_pending = max_pending
+        self.pending = 0
+        self.batches = 0
+        self.items = 0
+        self._queue = deque()
+        self._wakeup = None
+        self._task = None
+
+    async def submit(self, items):
+        """Обработка строк одного запроса в составе пачки."""
+        if not items:
+            return []
+        if self.pending + len(items) > self.max_pending:
+            raise Overloaded()
+        loop = asyncio.get_running_loop()
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._run())
+        future = loop.create_future()
+        self._queue.append((items, future))
+        self.pending += len(items)
+        self._wakeup.set()
+        return await future
+
+    def _queued_items(self):
+        return sum(len(items) for items, _ in self._queue)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            if not self._queue:
+                continue
+            # Пачка набирается не дольше max_wait после первого запроса
+            deadline = loop.time() + self.max_wait
+            while self._queued_items() < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                self._wakeup.clear()
+
+            requests = [self._queue.popleft()]
+            size = len(requests[0][0])
+            while self._queue and size + len(self._queue[0][0]) <= self.max_batch:
+                items, future = self._queue.popleft()
+                requests.append((items, future))
+                size += len(items)
+            batch = [item for items, _ in requests for item in items]
+            try:
+                results = await loop.run_in_executor(self.executor, self.fn, batch)
+            except Exception as e:
+                for _, future in requests:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                start = 0
+                for items, future in requests:
+                    if not future.done():
+                        future.set_result(results[start:start + len(items)])
+                    start += len(items)
+            finally:
+                self.pending -= size
+                self.batches += 1
+                self.items += size
+            if self._queue:
+                self._wakeup.set()
+
+    def to_dict(self):
+        return {
+            'batches': self.batches,
+            'avg_batch': self.items / self.batches if self.batches else 0.0,
+            'pending': self.pending
+        }
+
+def _texts(payload, field='texts', single='text'):
+    """Список строк запроса и признак одиночного значения."""
+    if single in payload:
+        values, is_single = [payload[single]], True
+    else:
+        values, is_single = payload.get(field), False
+    if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+        raise HTTPError(400, f"Ожидается '{field}' (список строк) или '{single}' (строка)")
+    return values, is_single
+
+class NLPService:
+    """
+    Обработчики запросов и пачечные функции.
+
+    Args:
+        workers (int): Количество потоков, выполняющих пачки.
+        max_batch (int): Максимальный размер пачки.
+        max_wait_ms (float): Время сборки пачки.
+        max_pending (int): Предел ожидающих строк в очереди каждого вида пачек.
+        subword_dir (str): Каталог с подсловными моделями (<модель>/tokenizer.json).
+    """
+
+    def __init__(self, workers=1, max_batch=64, max_wait_ms=5, max_pending=2048, subword_dir='.'):
+        self.subword_dir = subword_dir
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='nlp-batch')
+        self.batch_options = {'max_batch': max_batch, 'max_wait_ms': max_wait_ms, 'max_pending': max_pending}
+        self.batchers = {}
+        self.stats = {}
+        self.started_at = time.time()
+        self._subword_models = {}
+        self.routes = {
+            ('POST', '/tokenize'): self.tokenize,
+            ('POST', '/normalize'): self.normalize,
+            ('POST', '/clean'): self.clean,
+            ('POST', '/similarity'): self.similarity,
+            ('POST', '/subword'): self.subword,
+            ('GET', '/health'): self.health,
+            ('GET', '/metrics'): self.metrics
+        }
+
+    def _batcher(self, key, fn):
+        batcher = self.batchers.get(key)
+        if batcher is None:
+            batcher = self.batchers[key] = MicroBatcher(fn, self.executor, **self.batch_options)
+        return batcher
+
+    def preload(self, methods=(), similarity_backends=(), subword_models=()):
+        """Загрузка моделей до первого запроса (прогрев на коротком тексте)."""
+        if methods:
+            import tokenization
+
+            for method in methods:
+                tokenization.tokenize_batch(["Прогрев модели."], method)
+        import similarity
+        for backend in similarity_backends:
+            similarity.get_backend(backend).similarity(["прогрев"], ["прогрев"])
+        for model in subword_models:
+            self._subword_model(model)
+
+    async def tokenize(self, payload):
+        import tokenization
+
+        texts, single = _texts(payload)
+        method = payload.get('method', 'razdel')
+        if method not in tokenization.BATCH_METHODS:
+            raise HTTPError(400, f"Неизвестный метод: {method}")
+        batcher = self._batcher(('tokenize', method), lambda batch: tokenization.tokenize_batch(batch, method))
+        tokens = await batcher.submit(texts)
+        return {'tokens': tokens[0] if single else tokens, 'method': method}
+
+    async def normalize(self, payload):
+        import tokenization
+
+        method = payload.get('method', 'nltk_snowball')
+        normalize_fn = tokenization.BATCH_METHODS.get(method, (None, None))[1]
+        if normalize_fn is None:
+            raise HTTPError(400, f"Метод без нормализации: {method}")
+        single = 'tokens' in payload and payload['tokens'] and isinstance(payload['tokens'][0], str)
+        tokens_list = [payload['tokens']] if single else payload.get('tokens')
+        if not isinstance(tokens_list, list) or not all(
+                isinstance(tokens, list) and all(isinstance(token, str) for token in tokens) for tokens in tokens_list):
+            raise HTTPError(400, "Ожидается 'tokens': список токенов или список списков токенов")
+        batcher = self._batcher(('normalize', method), normalize_fn)
+        result = await batcher.submit(tokens_list)
+        return {'tokens': result[0] if single else result, 'method': method}
+
+    async def clean(self, payload):
+        texts, single = _texts(payload)
+        options = (bool(payload.get('to_lower', True)), bool(payload.get('remove_stopwords', True)))
+
+        def clean_batch(batch):
+            from text_cleaner import clean_text
+            return [clean_text(text, *options) for text in batch]
+
+        cleaned = await self._batcher(('clean', options), clean_batch).submit(texts)
+        return {'texts': cleaned[0] if single else cleaned}
+
+    async def similarity(self, payload):
+        import similarity
+
+        backend_name = payload.get('backend', 'hashed-ngram')
+        if backend_name not in similarity.BACKENDS:
+            raise HTTPError(400, f"Неизвестный бэкенд сходства: {backend_name}")
+        originals, single = _texts(payload, 'originals', 'original')
+        processed = [payload.get('processed')] if single else payload.get('processed')
+        if not isinstance(processed, list) or len(originals) != len(processed) or \
+                not all(isinstance(text, str) for text in processed):
+            raise HTTPError(400, "'originals' и 'processed' должны быть списками строк одной длины")
+
+        def similarity_batch(pairs):
+            backend = similarity.get_backend(backend_name)
+            return backend.similarity([a for a, _ in pairs], [b for _, b in pairs]).tolist()
+
+        batcher = self._batcher(('similarity', backend_name), similarity_batch)
+        scores = await batcher.submit(list(zip(originals, processed)))
+        if single:
+            return {'score': scores[0], 'backend': backend_name}
+        return {'scores': scores, 'backend': backend_name}
+
+    def _subword_model(self, name):
+        if name not in self._subword_models:
+            from tokenizers import Tokenizer
+            self._subword_models[name] = Tokenizer.from_file(
+                os.path.join(self.subword_dir, name, 'tokenizer.json'))
+        return self._subword_models[name]
+
+    async def subword(self, payload):
+        texts, single = _texts(payload)
+        name = payload.get('model', SUBWORD_MODELS[0])
+        if name not in SUBWORD_MODELS:
+            raise HTTPError(400, f"Неизвестная подсловная модель: {name}")
+
+        def encode_batch(batch):
+            encodings = self._subword_model(name).encode_batch(batch)
+            return [(encoding.ids, encoding.tokens) for encoding in encodings]
+
+        encoded = await self._batcher(('subword', name), encode_batch).submit(texts)
+        ids = [item[0] for item in encoded]
+        tokens = [item[1] for item in encoded]
+        return {'ids': ids[0] if single else ids, 'tokens': tokens[0] if single else tokens, 'model': name}
+
+    async def health(self, payload):
+        return {'status': 'ok', 'uptime_sec': time.time() - self.started_at}
+
+    async def metrics(self, payload):
+        return {
+            'uptime_sec': time.time() - self.started_at,
+            'endpoints': {path: stats.to_dict() for path, stats in self.stats.items()},
+            'batchers': {'/'.join(str(part) for part in key): batcher.to_dict()
+                         for key, batcher in self.batchers.items()}
+        }
+
+    async def dispatch(self, method, path, body):
+        """Обработка одного запроса: (статус, ответ, дополнительные заголовки)."""
+        start_time = time.perf_counter()
+        headers = {}
+        try:
+            handler = self.routes.get((method, path))
+            if handler is None:
+                allowed = [m for m, p in self.routes if p == path]
+                raise HTTPError(405 if allowed else 404, f"{method} {path} не поддерживается")
+            try:
+                payload = json.loads(body) if body else {}
+            except ValueError:
+                raise HTTPError(400, "Тело запроса — не JSON") from None
+            if not isinstance(payload, dict):
+                raise HTTPError(400, "Тело запроса должно быть JSON-объектом")
+            status, response = 200, await handler(payload)
+        except HTTPError as e:
+            status, response, headers = e.status, {'error': str(e)}, e.headers
+        except Exception as e:
+            status, response = 500, {'error': f"{type(e).__name__}: {str(e)[:200]}"}
+        if path not in ('/health', '/metrics'):
+            self.stats.setdefault(path, LatencyStats()).record((time.perf_counter() - start_time) * 1000, status)
+        return status, response, headers
+
+    async def handle_connection(self, reader, writer):
+        """Соединение HTTP/1.1 с поддержкой keep-alive."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get('content-length', 0))
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {'error': "Слишком большой запрос"}, {}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+                status, response, extra = await self.dispatch(method, target.split('?', 1)[0], body)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                await self._respond(writer, status, response, extra, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, response, extra, keep_alive):
+        body = json.dumps(response, ensure_ascii=False).encode('utf-8')
+        headers = {'Content-Type': 'application/json; charset=utf-8', 'Content-Length': str(len(body)),
+                   'Connection': 'keep-alive' if keep_alive else 'close', **extra}
+        head = f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n" + \
+            ''.join(f"{name}: {value}\r\n" for name, value in headers.items()) + "\r\n"
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+async def serve(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    server = await asyncio.start_server(service.handle_connection, host, port, limit=MAX_BODY_BYTES)
+    print(f"Сервис запущен: http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Локальный HTTP-сервис токенизации и сходства")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=1, help="Потоки, выполняющие пачки")
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    parser.add_argument('--max-pending', type=int, default=2048, help="Предел очереди (строк) до ответа 503")
+    parser.add_argument('--preload', nargs='*', default=[], help="Методы токенизации, загружаемые при старте")
+    parser.add_argument('--preload-similarity', nargs='*', default=[], help="Бэкенды сходства, загружаемые при старте")
+    parser.add_argument('--preload-subword', nargs='*', default=[], choices=SUBWORD_MODELS)
+    parser.add_argument('--subword-dir', default='.', help="Каталог с подсловными моделями")
+    args = parser.parse_args()
+
+    service = NLPService(args.workers, args.max_batch, args.max_wait_ms, args.max_pending, args.subword_dir)
+    start_time = time.time()
+    service.preload(args.preload, args.preload_similarity, args.preload_subword)
+    if args.preload or args.preload_similarity or args.preload_subword:
+        print(f"Модели загружены за {time.time() - start_time:.1f} сек")
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+import json
+import zlib
+from collections import Counter
+import numpy as np
+
+# Оценка доли OOV с разбиением корпуса по документам.
+#
+# Токены переводятся в целочисленные идентификаторы один раз. Затем для каждого
+# токена считается, в каких фолдах он встречается (минимальный и максимальный номер
+# фолда), и OOV всех фолдов получается одним векторизованным проходом:
+#   - k-fold: токен фолда f отсутствует в обучающей части, если встречается только в фолде f;
+#   - по времени: токен фолда f отсутствует во всех более ранних фолдах, если впервые встречается в f.
+
+def encode_tokens(tokens_list):
+    """
+    Перевод токенов в идентификаторы.
+
+    Returns:
+        tuple: (ids — np.ndarray идентификаторов всех токенов подряд,
+                doc_lengths — np.ndarray количества токенов в документах,
+                vocab_size — размер словаря)
+    """
+    index = {}
+    ids = []
+    doc_lengths = np.empty(len(tokens_list), dtype=np.int64)
+    for i, tokens in enumerate(tokens_list):
+        doc_lengths[i] = len(tokens)
+        ids.extend(index.setdefault(token, len(index)) for token in tokens)
+    return np.asarray(ids, dtype=np.int64), doc_lengths, len(index)
+
+def _summary(oov_counts, test_counts, skip_empty=True):
+    folds = []
+    for oov_count, test_count in zip(oov_counts.tolist(), test_counts.tolist()):
+        if skip_empty and test_count == 0:
+            continue
+        folds.append({
+            'oov_count': oov_count,
+            'test_tokens_count': test_count,
+            'oov_percentage': oov_count / test_count * 100 if test_count else 0.0
+        })
+    percentages = np.array([fold['oov_percentage'] for fold in folds], dtype=float)
+    return {
+        'folds': folds,
+        'mean': float(percentages.mean()) if len(percentages) else 0.0,
+        'variance': float(percentages.var(ddof=1)) if len(percentages) > 1 else 0.0,
+        'std': float(percentages.std(ddof=1)) if len(percentages) > 1 else 0.0,
+        'oov_count': int(oov_counts.sum()),
+        'test_tokens_count': int(test_counts.sum())
+    }
+
+def _fold_bounds(ids, doc_folds, doc_lengths, vocab_size, k):
+    occurrence_folds = np.repeat(doc_folds, doc_lengths)
+    first_fold = np.full(vocab_size, k, dtype=np.int64)
+    last_fold = np.full(vocab_size, -1, dtype=np.int64)
+    np.minimum.at(first_fold, ids, occurrence_folds)
+    np.maximum.at(last_fold, ids, occurrence_folds)
+    return occurrence_folds, first_fold, last_fold
+
+def kfold_oov(tokens_list, k=5, seed=0):
+    """
+    Доля OOV при k-кратной перекрёстной проверке по документам.
+
+    Документы случайно делятся на k фолдов; для каждого фолда словарь строится
+    по остальным k - 1 фолдам, а OOV считается по токенам самого фолда.
+
+    Args:
+        tokens_list (list): Списки токенов документов.
+        k (int): Количество фолдов.
+        seed (int): Зерно генератора для перемешивания документов.
+
+    Returns:
+        dict: OOV по фолдам, среднее (mean), дисперсия (variance) и стандартное отклонение (std) в процентах.
+    """
+    ids, doc_lengths, vocab_size = encode_tokens(tokens_list)
+    n_docs = len(tokens_list)
+    k = max(2, min(k, n_docs)) if n_docs else k
+    if not len(ids):
+        return _summary(np.zeros(k, dtype=np.int64), np.zeros(k, dtype=np.int64))
+
+    doc_folds = np.empty(n_docs, dtype=np.int64)
+    doc_folds[np.random.RandomState(seed).permutation(n_docs)] = np.arange(n_docs) % k
+    occurrence_folds, first_fold, last_fold = _fold_bounds(ids, doc_folds, doc_lengths, vocab_size, k)
+
+    exclusive = (first_fold == last_fold)[ids]
+    oov_counts = np.bincount(occurrence_folds[exclusive], minlength=k)
+    test_counts = np.bincount(occurrence_folds, minlength=k)
+    return _summary(oov_counts, test_counts)
+
+def time_split_oov(tokens_list, dates, k=5):
+    """
+    Доля OOV при разбиении по времени (скользящее начало).
+
+    Документы упорядочиваются по дате и делятся на k последовательных блоков;
+    для блока f словарь строится по всем более ранним блокам. Первый блок
+    не оценивается. Документы без даты ('N/A', пустое значение) пропускаются.
+
+    Args:
+        tokens_list (list): Списки токенов документов.
+        dates (list): Даты документов (ISO-строки, сравниваемые лексикографически).
+        k (int): Количество временных блоков.
+
+    Returns:
+        dict: OOV по блокам 1..k-1, среднее, дисперсия и стандартное отклонение в процентах.
+    """
+    dated = [i for i, date in enumerate(dates) if date and date != 'N/A']
+    dated.sort(key=lambda i: dates[i])
+    tokens_list = [tokens_list[i] for i in dated]
+
+    ids, doc_lengths, vocab_size = encode_tokens(tokens_list)
+    n_docs = len(tokens_list)
+    k = max(2, min(k, n_docs)) if n_docs else k
+    if not len(ids):
+        return _summary(np.zeros(k - 1, dtype=np.int64), np.zeros(k - 1, dtype=np.int64))
+
+    doc_folds = np.arange(n_docs) * k // n_docs
+    occurrence_folds, first_fold, _ = _fold_bounds(ids, doc_folds, doc_lengths, vocab_size, k)
+
+    unseen = first_fold[ids] == occurrence_folds
+    oov_counts = np.bincount(occurrence_folds[unseen], minlength=k)[1:]
+    test_counts = np.bincount(occurrence_folds, minlength=k)[1:]
+    return _summary(oov_counts, test_counts)
+
+def read_texts_and_dates(input_file):
+    """Тексты (с тем же выбором поля, что и у читателей корпуса) и даты статей из JSONL."""
+    texts = []
+    dates = []
+    from corpus_io import open_corpus
+
+    with open_corpus(input_file) as f:
+        for line in f:
+            try:
+                article = json.loads(line.strip())
+            except ValueError:
+                continue
+            text = article.get('preprocessed_text', article.get('cleaned_text', article.get('text', '')))
+            if text:
+                texts.append(text)
+                dates.append(article.get('date'))
+    return texts, dates
+
+class StreamingKFoldOOV:
+    """
+    Потоковая оценка k-fold OOV: документы добавляются по одному, токены не хранятся.
+
+    Для каждого токена хранится одно целое число: младшие k бит — маска фолдов,
+    в которых он встречался, старшие — общее количество вхождений. Токен фолда f
+    отсутствует в обучающей части, если его маска равна 1 << f, поэтому память
+    пропорциональна размеру словаря, а не корпуса.
+
+    Фолды назначаются блоками по k документов: каждый блок — случайная
+    перестановка номеров фолдов, так что фолды остаются сбалансированными.
+    Фолд можно передать явно (fold_for_offset), тогда состояния, собранные
+    по разным частям корпуса, объединяются методом merge.
+
+    Args:
+        k (int): Количество фолдов.
+        seed (int): Зерно генератора фолдов.
+    """
+
+    def __init__(self, k=5, seed=0):
+        self.k = max(2, k)
+        self._rng = np.random.RandomState(seed)
+        self._block = []
+        self._state = {}
+        self.test_counts = np.zeros(self.k, dtype=np.int64)
+        self.documents = 0
+
+    def _next_fold(self):
+        if not self._block:
+            self._block = self._rng.permutation(self.k).tolist()
+        return self._block.pop()
+
+    def add(self, tokens, fold=None):
+        """Учёт токенов очередного документа (фолд по умолчанию — следующий из случайного блока)."""
+        if fold is None:
+            fold = self._next_fold()
+        self.documents += 1
+        self.test_counts[fold] += len(tokens)
+        bit = 1 << fold
+        k = self.k
+        state = self._state
+        for token, count in Counter(tokens).items():
+            state[token] = (state.get(token, 0) | bit) + (count << k)
+
+    @property
+    def vocab_size(self):
+        return len(self._state)
+
+    def result(self):
+        """Текущая оценка в том же формате, что и kfold_oov."""
+        k = self.k
+        mask = (1 << k) - 1
+        oov_counts = np.zeros(k, dtype=np.int64)
+        for value in self._state.values():
+            bits = value & mask
+            if bits & (bits - 1) == 0:
+                oov_counts[bits.bit_length() - 1] += value >> k
+        return _summary(oov_counts, self.test_counts)
+
+    def merge(self, other):
+        """Добавление состояния, собранного по другой части корпуса (с тем же k)."""
+        if other.k != self.k:
+            raise ValueError(f"Разное количество фолдов: {self.k} и {other.k}")
+        k = self.k
+        mask = (1 << k) - 1
+        state = self._state
+        for token, value in other._state.items():
+            current = state.get(token)
+            if current is None:
+                state[token] = value
+            else:
+                state[token] = ((current >> k) + (value >> k)) << k | ((current | value) & mask)
+        self.test_counts += other.test_counts
+        self.documents += other.documents
+        return self
+
+    def to_dict(self):
+        """Состояние в виде, пригодном для JSON."""
+        return {
+            'k': self.k,
+            'documents': self.documents,
+            'test_counts': self.test_counts.tolist(),
+            'tokens': list(self._state),
+            'values': list(self._state.values())
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        estimator = cls(k=data['k'])
+        estimator.documents = data['documents']
+        estimator.test_counts = np.array(data['test_counts'], dtype=np.int64)
+        estimator._state = dict(zip(data['tokens'], data['values']))
+        return estimator
+
+def fold_for_offset(offset, k=5, seed=0):
+    """
+    Фолд документа по его номеру в корпусе (без состояния).
+
+    Номера делятся на блоки по k подряд; внутри блока фолды — циклический сдвиг,
+    зависящий от номера блока, поэтому фолды сбалансированы, а назначение
+    одинаково на любой машине и при любом разбиении корпуса на части.
+    """
+    block = offset // k
+    shift = zlib.crc32(f"{seed}:{block}".encode('ascii')) % k
+    return (offset + shift) % k
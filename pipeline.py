@@ -0,0 +1,345 @@
+import json
+import time
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from corpus_io import open_corpus, set_write_options
+
+# Сквозной потоковый конвейер: очистка → предобработка → токенизация и нормализация.
+#
+# Раньше каждый этап был отдельным проходом с полным промежуточным файлом
+# (corpus.jsonl → cleaned_corpus.jsonl → preprocessed_corpus.jsonl → tokenization.py),
+# и каждая статья заново разбиралась и сериализовалась на каждом шаге. Здесь статья
+# разбирается один раз и проходит все этапы подряд:
+#   - поток чтения делит входной JSONL на пачки строк;
+#   - пачка целиком (разбор JSON, все этапы, сериализация выходов) обрабатывается
+#     в пуле процессов;
+#   - потоки записи дописывают готовые строки в файлы выходов этапов, если они заданы.
+# Между потоками и пулом — очереди ограниченного размера: в памяти одновременно
+# находится не больше нескольких пачек, а порядок статей сохраняется.
+#
+# Выход этапа — статья с полями всех этапов до него включительно, то есть в том же
+# формате, что и промежуточные файлы прежних проходов.
+
+class Stage:
+    """
+    Этап конвейера: вычисляет поле field для каждой статьи пачки.
+
+    Статья, для которой этап вернул None (или пустой текст), дальше не передаётся —
+    как и при раздельных проходах, где такие статьи пропускались.
+    """
+
+    name = None
+    field = None
+
+    def apply(self, article):
+        raise NotImplementedError
+
+    def process(self, articles):
+        """Значения поля для пачки статей (ошибка одной статьи не останавливает пачку)."""
+        values = []
+        for article in articles:
+            try:
+                values.append(self.apply(article))
+            except Exception as e:
+                print(f"Ошибка этапа {self.name}: {article.get('url', 'N/A')} "
+                      f"(title: {str(article.get('title', 'N/A'))[:50]}...) - {str(e)[:100]}")
+                values.append(None)
+        return values
+
+class CleanStage(Stage):
+    """Очистка (text_cleaner.clean_text): text → cleaned_text."""
+
+    name = 'clean'
+    field = 'cleaned_text'
+
+    def __init__(self, to_lower=True, remove_stopwords=True, exact_stopwords=False):
+        self.to_lower = to_lower
+        self.remove_stopwords = remove_stopwords
+        self.exact_stopwords = exact_stopwords
+
+    def apply(self, article):
+        from text_cleaner import clean_text
+
+        return clean_text(article['text'], to_lower=self.to_lower, remove_stopwords=self.remove_stopwords,
+                          exact_stopwords=self.exact_stopwords)
+
+class PreprocessStage(Stage):
+    """Предобработка (universal_preprocessor.preprocess_text): cleaned_text (или text) → preprocessed_text."""
+
+    name = 'preprocess'
+    field = 'preprocessed_text'
+
+    def __init__(self, replace_tokens=True, expand_abbreviations=True):
+        self.replace_tokens = replace_tokens
+        self.expand_abbreviations = expand_abbreviations
+
+    def apply(self, article):
+        from universal_preprocessor import preprocess_text
+
+        text = article.get('cleaned_text', article.get('text', ''))
+        if not text:
+            return None
+        return preprocess_text(text, self.replace_tokens, self.expand_abbreviations)
+
+class TokenizeStage(Stage):
+    """
+    Токенизация и нормализация (tokenization.tokenize_batch) всей пачки сразу: текст → tokens.
+
+    Args:
+        method (str): Метод из tokenization.BATCH_METHODS (например, 'razdel' или 'nltk_snowball').
+    """
+
+    name = 'tokenize'
+    field = 'tokens'
+
+    def __init__(self, method='razdel'):
+        self.method = method
+
+    def process(self, articles):
+        texts = [article.get('preprocessed_text', article.get('cleaned_text', article.get('text', '')))
+                 for article in articles]
+        import tokenization
+
+        return tokenization.tokenize_batch(texts, self.method)
+
+def default_stages(method='razdel', to_lower=True, remove_stopwords=True, replace_tokens=True,
+                   expand_abbreviations=True):
+    """Полный конвейер: очистка, предобработка и (если задан method) токенизация."""
+    stages = [CleanStage(to_lower, remove_stopwords), PreprocessStage(replace_tokens, expand_abbreviations)]
+    if method:
+        stages.append(TokenizeStage(method))
+    return stages
+
+def _process_batch(stages, outputs, lines, collect):
+    """
+    Обработка пачки строк входного файла всеми этапами (выполняется в процессе пула).
+
+    Returns:
+        tuple: (статьи, прошедшие все этапы (если collect), строки выходов по этапам,
+            счётчики: read, invalid и количество статей, прошедших каждый этап)
+    """
+    articles = []
+    invalid = 0
+    for line in lines:
+        try:
+            articles.append(json.loads(line))
+        except ValueError:
+            invalid += 1
+    counts = {'read': len(lines), 'invalid': invalid}
+    output_lines = {}
+    for stage in stages:
+        values = stage.process(articles) if articles else []
+        passed = []
+        for article, value in zip(articles, values):
+            if value is None or value == '':
+                continue
+            article[stage.field] = value
+            passed.append(article)
+        articles = passed
+        counts[stage.name] = len(articles)
+        # Выход этапа сериализуется сразу, пока в статье нет полей следующих этапов
+        if stage.name in outputs:
+            output_lines[stage.name] = [json.dumps(article, ensure_ascii=False) for article in articles]
+    return (articles if collect else []), output_lines, counts
+
+class _Writer:
+    """Поток записи строк в файл выхода этапа."""
+
+    def __init__(self, path, queue_size):
+        self.path = path
+        self.error = None
+        self._queue = queue.Queue(queue_size)
+        self._file = open_corpus(path, 'w')
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            lines = self._queue.get()
+            if lines is None:
+                return
+            if self.error is None and lines:
+                try:
+                    self._file.write('\n'.join(lines) + '\n')
+                except OSError as e:
+                    self.error = e
+
+    def write(self, lines):
+        if self.error is not None:
+            raise self.error
+        self._queue.put(lines)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        if self.error is not None:
+            raise self.error
+
+class Pipeline:
+    """
+    Потоковый конвейер этапов над JSONL-корпусом.
+
+    Args:
+        stages (list): Этапы (по умолчанию — default_stages()).
+        workers (int): Количество процессов для этапов (0 — в текущем процессе).
+        batch_size (int): Количество статей в пачке.
+        queue_size (int): Размер каждой очереди и максимальное число пачек в работе у пула.
+        report_every (int): Частота вывода прогресса (в прочитанных статьях).
+    """
+
+    def __init__(self, stages=None, workers=None, batch_size=256, queue_size=4, report_every=10000):
+        self.stages = stages if stages is not None else default_stages()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.report_every = report_every
+        self.stats = {}
+
+    def _read(self, input_file, batches, stop):
+        def put(item):
+            # Ожидание места в очереди с проверкой остановки (потребитель мог завершиться)
+            while not stop.is_set():
+                try:
+                    batches.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        try:
+            with open_corpus(input_file) as f:
+                lines = []
+                for line in f:
+                    if not line.strip():
+                        continue
+                    lines.append(line)
+                    if len(lines) >= self.batch_size:
+                        if not put(lines):
+                            return
+                        lines = []
+                if lines and not put(lines):
+                    return
+        except Exception as e:
+            put(e)
+            return
+        put(None)
+
+    def _submit(self, executor, lines, outputs, collect):
+        if executor is None:
+            future = Future()
+            future.set_result(_process_batch(self.stages, outputs, lines, collect))
+            return future
+        return executor.submit(_process_batch, self.stages, outputs, lines, collect)
+
+    def _collect(self, future, writers):
+        articles, output_lines, counts = future.result()
+        previous = self.stats['read']
+        for key, value in counts.items():
+            self.stats[key] += value
+        for name, lines in output_lines.items():
+            writers[name].write(lines)
+        if self.report_every and self.stats['read'] // self.report_every > previous // self.report_every:
+            print(f"Конвейер: прочитано статей {self.stats['read']}, "
+                  f"прошли все этапы {self.stats[self.stages[-1].name] if self.stages else self.stats['read']}")
+        return articles
+
+    def run(self, input_file, outputs=None, collect=True):
+        """
+        Обработка корпуса.
+
+        Args:
+            input_file (str): Входной JSONL-файл (например, corpus.jsonl).
+            outputs (dict): Название этапа -> путь к файлу его выхода (по умолчанию без файлов).
+            collect (bool): Возвращать ли статьи, прошедшие все этапы (при False только пишутся выходы).
+
+        Yields:
+            dict: Статьи, прошедшие все этапы, в исходном порядке (с полями всех этапов).
+        """
+        outputs = outputs or {}
+        names = [stage.name for stage in self.stages]
+        unknown = [name for name in outputs if name not in names]
+        if unknown:
+            raise ValueError(f"Неизвестные этапы: {', '.join(unknown)}")
+
+        self.stats = {'read': 0, 'invalid': 0, **{name: 0 for name in names}}
+        stop = threading.Event()
+        batches = queue.Queue(self.queue_size)
+        reader = threading.Thread(target=self._read, args=(input_file, batches, stop), daemon=True)
+        writers = {}
+        executor = ProcessPoolExecutor(max_workers=self.workers) if self.workers != 0 else None
+        try:
+            for name, path in outputs.items():
+                writers[name] = _Writer(path, self.queue_size)
+            reader.start()
+            pending = deque()
+            while True:
+                lines = batches.get()
+                if lines is None:
+                    break
+                if isinstance(lines, Exception):
+                    raise lines
+                pending.append(self._submit(executor, lines, outputs, collect))
+                if len(pending) >= self.queue_size:
+                    yield from self._collect(pending.popleft(), writers)
+            while pending:
+                yield from self._collect(pending.popleft(), writers)
+        finally:
+            stop.set()
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            reader.join()
+            for writer in writers.values():
+                writer.close()
+
+def run_pipeline(input_file='corpus.jsonl', outputs=None, stages=None, workers=None, batch_size=256, queue_size=4):
+    """
+    Один проход по корпусу с записью выходов этапов.
+
+    Returns:
+        dict: Счётчики: read, invalid и количество статей, прошедших каждый этап.
+    """
+    pipeline = Pipeline(stages, workers=workers, batch_size=batch_size, queue_size=queue_size)
+    for _ in pipeline.run(input_file, outputs, collect=False):
+        pass
+    return pipeline.stats
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Очистка, предобработка и токенизация корпуса за один проход")
+    parser.add_argument('input', nargs='?', default='corpus.jsonl')
+    parser.add_argument('--cleaned', help="Файл очищенного корпуса (например, cleaned_corpus.jsonl)")
+    parser.add_argument('--preprocessed', help="Файл предобработанного корпуса (например, preprocessed_corpus.jsonl)")
+    parser.add_argument('--tokens', help="Файл статей с токенами")
+    parser.add_argument('--method', default='razdel', help="Метод токенизации ('none' — без токенизации)")
+    parser.add_argument('--workers', type=int, default=None, help="Количество процессов (0 — без пула)")
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--queue-size', type=int, default=4)
+    parser.add_argument('--compress-level', type=int, default=None, help="Уровень сжатия выходов (.gz, .zst, .xz)")
+    parser.add_argument('--compress-threads', type=int, default=0, help="Потоки сжатия zstd")
+    args = parser.parse_args()
+    set_write_options(args.compress_level, args.compress_threads)
+
+    method = None if args.method == 'none' else args.method
+    if args.tokens and not method:
+        parser.error("--tokens требует метода токенизации")
+    outputs = {name: path for name, path in (('clean', args.cleaned), ('preprocess', args.preprocessed),
+                                             ('tokenize', args.tokens)) if path}
+
+    print("Начало обработки корпуса...")
+    start_time = time.time()
+    stats = run_pipeline(args.input, outputs, default_stages(method), workers=args.workers,
+                         batch_size=args.batch_size, queue_size=args.queue_size)
+    print(f"Обработка завершена за {time.time() - start_time:.2f} секунд")
+    print(f"Прочитано статей: {stats['read']} (некорректных строк: {stats['invalid']})")
+    for name in ('clean', 'preprocess', 'tokenize'):
+        if name in stats:
+            print(f"Прошли этап {name}: {stats[name]}")
+    for name, path in outputs.items():
+        print(f"Выход этапа {name}: {path}")
+
+if __name__ == '__main__':
+    main()
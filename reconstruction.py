@@ -0,0 +1,326 @@
+import os
+import json
+import time
+import bisect
+import argparse
+from collections import Counter
+from subword import normalize_text, read_corpus
+
+# Точная оценка реконструкции подсловных токенизаторов: decode(encode(x)) сравнивается
+# с x напрямую, без эмбеддингов.
+#
+#   python reconstruction.py --input corpus.jsonl
+#   python reconstruction.py --models russian-bpe-16k --keep-spaces --examples 10
+#
+# Исходный и декодированный тексты нормализуются (normalize_text из subword.py). Если
+# в tokenizer.json нет decoder (так у встроенных моделей и у обученных в subword.py),
+# decode вставляет пробел между всеми подсловами, поэтому пробелы по умолчанию
+# удаляются из обеих строк (--keep-spaces — учитывать их, --ignore-spaces — удалять
+# всегда). Для каждой пары считаются точное совпадение, посимвольное расстояние
+# Левенштейна и различающиеся фрагменты.
+#
+# Расстояние считает rapidfuzz, если он установлен. Иначе общий префикс и суффикс
+# отбрасываются, и расстояние оставшихся строк считает битово-параллельный алгоритм
+# Майерса (Hyyrö) — точно, по всей паре. Якоря — k-граммы, которые встречаются ровно
+# один раз в обеих строках и идут в одном порядке, — нужны только для поиска
+# различающихся фрагментов: строки выравниваются по якорям, промежутки между ними
+# уточняются рекурсивно с вдвое меньшими якорями. При перестановке блоков якоря
+# не лежат на оптимальном выравнивании, поэтому фрагменты могут быть крупнее, чем
+# у rapidfuzz, но расстояние от них не зависит.
+
+BUNDLED_MODELS = ('russian-bpe-16k', 'russian-unigram-20k')
+ANCHOR_SIZE = 12
+MIN_ANCHOR_SIZE = 3
+
+def _rapidfuzz_levenshtein():
+    try:
+        from rapidfuzz.distance import Levenshtein
+    except ImportError:
+        return None
+    return Levenshtein
+
+def normalize(text, ignore_spaces=False):
+    """Нормализация для сравнения: normalize_text и, при ignore_spaces, удаление пробелов."""
+    text = normalize_text(text)
+    return text.replace(' ', '') if ignore_spaces else text
+
+def levenshtein(a, b):
+    """
+    Посимвольное расстояние Левенштейна (битово-параллельный алгоритм Майерса/Hyyrö).
+
+    Столбец матрицы расстояний для более короткой строки хранится в двух битовых масках
+    (Python int), поэтому на символ длинной строки приходится десяток операций над
+    целыми числами вместо len(b) операций.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    m = len(b)
+    if m == 0:
+        return len(a)
+    peq = {}
+    for i, char in enumerate(b):
+        peq[char] = peq.get(char, 0) | (1 << i)
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    for char in a:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | ~(xh | pv)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+    return score
+
+def _trim(a, b):
+    """Длины общего префикса и общего суффикса (не перекрывающихся)."""
+    prefix = len(os.path.commonprefix([a, b]))
+    limit = min(len(a), len(b)) - prefix
+    suffix = len(os.path.commonprefix([a[:prefix - 1:-1] if prefix else a[::-1],
+                                       b[:prefix - 1:-1] if prefix else b[::-1]]))
+    return prefix, min(suffix, limit)
+
+def _unique_kgrams(text, k):
+    positions = {}
+    for i in range(len(text) - k + 1):
+        gram = text[i:i + k]
+        positions[gram] = -1 if gram in positions else i
+    return positions
+
+def matching_blocks(a, b, k=ANCHOR_SIZE):
+    """
+    Совпадающие блоки двух строк по уникальным общим k-граммам.
+
+    Returns:
+        list: Кортежи (i, j, size): a[i:i + size] == b[j:j + size], по возрастанию i и j.
+    """
+    if min(len(a), len(b)) < k:
+        return []
+    grams_a = _unique_kgrams(a, k)
+    grams_b = _unique_kgrams(b, k)
+    anchors = sorted((i, grams_b[gram]) for gram, i in grams_a.items()
+                     if i >= 0 and grams_b.get(gram, -1) >= 0)
+
+    # Наибольшая возрастающая по j подпоследовательность якорей (patience)
+    tails, tail_index, previous = [], [], [-1] * len(anchors)
+    for index, (_, j) in enumerate(anchors):
+        position = bisect.bisect_left(tails, j)
+        if position:
+            previous[index] = tail_index[position - 1]
+        if position == len(tails):
+            tails.append(j)
+            tail_index.append(index)
+        else:
+            tails[position] = j
+            tail_index[position] = index
+    chain = []
+    index = tail_index[-1] if tail_index else -1
+    while index >= 0:
+        chain.append(anchors[index])
+        index = previous[index]
+    chain.reverse()
+
+    # Соседние якоря на одной диагонали склеиваются, перекрытия обрезаются
+    blocks = []
+    for i, j in chain:
+        if blocks:
+            block_i, block_j, size = blocks[-1]
+            if i - j == block_i - block_j and i <= block_i + size:
+                blocks[-1] = (block_i, block_j, i + k - block_i)
+                continue
+            shift = max(block_i + size - i, block_j + size - j, 0)
+            if shift >= k:
+                continue
+            i, j = i + shift, j + shift
+            blocks.append((i, j, k - shift))
+        else:
+            blocks.append((i, j, k))
+    return blocks
+
+def _gaps(a, b, k):
+    """Несовпадающие промежутки между блоками: (i, gap_a, j, gap_b) без общих краёв."""
+    start_a = start_b = 0
+    for i, j, size in matching_blocks(a, b, k) + [(len(a), len(b), 0)]:
+        gap_a, gap_b = a[start_a:i], b[start_b:j]
+        if gap_a != gap_b:
+            prefix, suffix = _trim(gap_a, gap_b)
+            yield (start_a + prefix, gap_a[prefix:len(gap_a) - suffix],
+                   start_b + prefix, gap_b[prefix:len(gap_b) - suffix])
+        start_a, start_b = i + size, j + size
+
+def _spans(a, b, k):
+    if k < MIN_ANCHOR_SIZE or min(len(a), len(b)) < k:
+        return [(0, len(a), 0, len(b))]
+    return [(i1 + i, i2 + i, j1 + j, j2 + j)
+            for i, gap_a, j, gap_b in _gaps(a, b, k)
+            for i1, i2, j1, j2 in _spans(gap_a, gap_b, k // 2)]
+
+def _diff_python(a, b):
+    spans = [(i1 + i, i2 + i, j1 + j, j2 + j)
+             for i, gap_a, j, gap_b in _gaps(a, b, ANCHOR_SIZE)
+             for i1, i2, j1, j2 in _spans(gap_a, gap_b, ANCHOR_SIZE // 2)]
+    return levenshtein(a, b), spans
+
+def _diff_rapidfuzz(a, b, levenshtein_module):
+    spans = []
+    for tag, i1, i2, j1, j2 in levenshtein_module.opcodes(a, b):
+        if tag == 'equal':
+            continue
+        if spans and spans[-1][1] == i1 and spans[-1][3] == j1:
+            spans[-1] = (spans[-1][0], i2, spans[-1][2], j2)
+        else:
+            spans.append((i1, i2, j1, j2))
+    return levenshtein_module.distance(a, b), spans
+
+def diff(a, b):
+    """
+    Расстояние Левенштейна и различающиеся фрагменты двух строк.
+
+    Returns:
+        tuple: (distance, spans) — spans: список (i1, i2, j1, j2), a[i1:i2] заменено на b[j1:j2].
+    """
+    if a == b:
+        return 0, []
+    levenshtein_module = _rapidfuzz_levenshtein()
+    if levenshtein_module is not None:
+        return _diff_rapidfuzz(a, b, levenshtein_module)
+    prefix, suffix = _trim(a, b)
+    distance, spans = _diff_python(a[prefix:len(a) - suffix], b[prefix:len(b) - suffix])
+    return distance, [(i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix) for i1, i2, j1, j2 in spans]
+
+def evaluate(originals, decoded, ignore_spaces=False, max_spans=5, top_spans=20):
+    """
+    Сравнение исходных и декодированных текстов.
+
+    Args:
+        originals (list): Исходные тексты.
+        decoded (list): Декодированные тексты (в том же порядке).
+        ignore_spaces (bool): Не учитывать пробелы.
+        max_spans (int): Сколько различающихся фрагментов сохранять для документа.
+        top_spans (int): Сколько самых частых различий вернуть.
+
+    Returns:
+        dict: texts, exact_matches, exact_match_rate (%), edit_distance_mean,
+            char_error_rate (% — сумма расстояний к сумме длин исходных текстов),
+            distances (по документам), documents (несовпавшие: index, distance, cer, spans),
+            top_spans (список (исходный фрагмент, декодированный фрагмент, количество)).
+    """
+    distances = []
+    documents = []
+    span_counts = Counter()
+    total_chars = 0
+    for index, (original, restored) in enumerate(zip(originals, decoded)):
+        a, b = normalize(original, ignore_spaces), normalize(restored, ignore_spaces)
+        distance, spans = diff(a, b)
+        distances.append(distance)
+        total_chars += len(a)
+        if not distance:
+            continue
+        pieces = [(a[i1:i2], b[j1:j2]) for i1, i2, j1, j2 in spans]
+        span_counts.update(pieces)
+        documents.append({
+            'index': index,
+            'distance': distance,
+            'cer': distance / len(a) * 100 if a else 100.0,
+            'spans': [{'position': span[0], 'original': original_piece, 'decoded': decoded_piece}
+                      for span, (original_piece, decoded_piece) in zip(spans[:max_spans], pieces)]
+        })
+
+    texts = len(distances)
+    exact_matches = texts - len(documents)
+    return {
+        'texts': texts,
+        'exact_matches': exact_matches,
+        'exact_match_rate': exact_matches / texts * 100 if texts else 0.0,
+        'edit_distance_mean': sum(distances) / texts if texts else 0.0,
+        'char_error_rate': sum(distances) / total_chars * 100 if total_chars else 0.0,
+        'distances': distances,
+        'documents': documents,
+        'top_spans': [(original, restored, count) for (original, restored), count in span_counts.most_common(top_spans)]
+    }
+
+def spaces_lost(tokenizer):
+    """Теряет ли decode пробелы: без decoder подслова склеиваются через пробел."""
+    return tokenizer.decoder is None
+
+def evaluate_tokenizer(tokenizer, texts, ignore_spaces=None, max_spans=5, top_spans=20):
+    """
+    Пакетные encode/decode всех текстов и evaluate; в результат добавляется time (секунды).
+    ignore_spaces=None — не учитывать пробелы, если их теряет decode (spaces_lost).
+    """
+    if ignore_spaces is None:
+        ignore_spaces = spaces_lost(tokenizer)
+    start_time = time.time()
+    encodings = tokenizer.encode_batch(texts)
+    decoded = tokenizer.decode_batch([encoding.ids for encoding in encodings])
+    result = evaluate(texts, decoded, ignore_spaces, max_spans, top_spans)
+    result['time'] = time.time() - start_time
+    return result
+
+def load_tokenizer(name):
+    """Токенизатор из каталога модели (<name>/tokenizer.json) или из JSON-файла."""
+    from tokenizers import Tokenizer
+
+    path = os.path.join(name, 'tokenizer.json') if os.path.isdir(name) else name
+    return Tokenizer.from_file(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Точная оценка реконструкции подсловных токенизаторов")
+    parser.add_argument('--input', default='corpus.jsonl')
+    parser.add_argument('--models', nargs='+', default=list(BUNDLED_MODELS),
+                        help="Каталоги моделей или файлы tokenizer.json")
+    spaces = parser.add_mutually_exclusive_group()
+    spaces.add_argument('--ignore-spaces', dest='ignore_spaces', action='store_const', const=True, default=None,
+                        help="Сравнивать строки без пробелов (по умолчанию — если у модели нет decoder)")
+    spaces.add_argument('--keep-spaces', dest='ignore_spaces', action='store_const', const=False,
+                        help="Учитывать пробелы, даже если у модели нет decoder")
+    parser.add_argument('--examples', type=int, default=5, help="Сколько худших документов показать")
+    parser.add_argument('--top-spans', type=int, default=10, help="Сколько самых частых различий показать")
+    parser.add_argument('--output', default=None, help="Сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    print("Чтение корпуса...")
+    texts = read_corpus(args.input)
+    print(f"Загружено {len(texts)} статей")
+    if _rapidfuzz_levenshtein() is None:
+        print("rapidfuzz не установлен: расстояние считается по якорям на чистом Python")
+
+    results = {}
+    for name in args.models:
+        tokenizer = load_tokenizer(name)
+        ignore_spaces = args.ignore_spaces
+        if ignore_spaces is None:
+            ignore_spaces = spaces_lost(tokenizer)
+            if ignore_spaces:
+                print(f"У {name} нет decoder: decode разделяет подслова пробелами, "
+                      f"пробелы не учитываются (--keep-spaces, чтобы учитывать)")
+        result = evaluate_tokenizer(tokenizer, texts, ignore_spaces, top_spans=args.top_spans)
+        result['ignore_spaces'] = ignore_spaces
+        results[name] = result
+        print(f"\nМодель: {name} ({result['time']:.2f} сек)")
+        print(f"  Точное совпадение: {result['exact_matches']} из {result['texts']} ({result['exact_match_rate']:.2f}%)")
+        print(f"  Среднее расстояние Левенштейна: {result['edit_distance_mean']:.1f} символов")
+        print(f"  Доля ошибочных символов (CER): {result['char_error_rate']:.2f}%")
+        if result['top_spans']:
+            print("  Частые различия (исходный → декодированный):")
+            for original, restored, count in result['top_spans']:
+                print(f"    {original!r} → {restored!r}: {count}")
+        for document in sorted(result['documents'], key=lambda d: -d['cer'])[:args.examples]:
+            print(f"  Документ {document['index']}: расстояние {document['distance']}, CER {document['cer']:.2f}%")
+            for span in document['spans']:
+                print(f"    [{span['position']}] {span['original']!r} → {span['decoded']!r}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\nРезультаты сохранены в {args.output}")
+
+if __name__ == '__main__':
+    main()
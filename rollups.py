@@ -0,0 +1,463 @@
+import os
+import re
+import json
+import base64
+import hashlib
+from collections import Counter
+import numpy as np
+from chart_data import TOP_TOKENS, length_counts, merge_counts, mean_length
+from corpus_io import open_corpus, compression_from_path
+
+# Предварительные агрегаты корпуса по дням и рубрикам.
+#
+# Для каждой ячейки (день, рубрика) хранится объединяемое состояние: количество
+# документов и токенов, частоты длин токенов, эскиз словаря (HyperLogLog) и
+# самые частые токены. Метрики любого среза (диапазон дат, набор рубрик) получаются
+# объединением ячеек, без повторной токенизации. Количество документов и токенов
+# и гистограмма длин объединяются точно, размер словаря — оценка с погрешностью
+# около 1.6%, частоты топ-токенов — нижние оценки с известной границей погрешности.
+#
+# Новые статьи добавляются к сохранённым агрегатам (update): для каждого дня хранятся
+# 64-битные хеши учтённых статей (по URL, без него — по тексту), поэтому уже учтённые
+# статьи не токенизируются повторно, а дозагруженные статьи дня и статьи без даты
+# из новых файлов добавляются. Изменённые статьи пересчитываются явно (refresh_days).
+#
+#   python rollups.py update corpus.jsonl --output rollups.json.gz --method razdel
+#   python rollups.py show rollups.json.gz --from 2025-10-01 --to 2025-10-09 --category Экономика
+
+ROLLUP_FORMAT_VERSION = 2
+
+UNDATED = 'N/A'
+NO_CATEGORY = 'N/A'
+# Количество токенов, частоты которых хранятся в каждой ячейке
+TOP_CAPACITY = 1000
+HLL_PRECISION = 12
+
+_DAY_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}')
+
+def day_of(date):
+    """День статьи ('YYYY-MM-DD') по дате в формате ISO; статьи без даты — UNDATED."""
+    match = _DAY_PATTERN.match((date or '').strip())
+    return match.group(0) if match else UNDATED
+
+def article_key(text, url=None):
+    """64-битный ключ статьи для учёта уже добавленных статей: хеш URL, а без него — текста."""
+    return int.from_bytes(hashlib.blake2b((url or text).encode('utf-8'), digest_size=8).digest(), 'little')
+
+def category_of(category):
+    """Рубрика статьи; пустая рубрика — NO_CATEGORY."""
+    return (category or '').strip() or NO_CATEGORY
+
+class VocabularySketch:
+    """
+    Эскиз HyperLogLog для оценки количества различных токенов.
+
+    Эскизы объединяются поэлементным максимумом регистров, поэтому размер словаря
+    любого набора ячеек оценивается без хранения самих токенов.
+
+    Args:
+        precision (int): Число бит номера регистра (2 ** precision регистров).
+    """
+
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype=np.uint8)
+
+    def add(self, tokens):
+        """Учёт токенов (повторы не влияют на оценку)."""
+        p = self.precision
+        width = 64 - p
+        low_mask = (1 << width) - 1
+        registers = self.registers
+        for token in set(tokens):
+            value = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+            index = value >> width
+            rank = width - (value & low_mask).bit_length() + 1
+            if rank > registers[index]:
+                registers[index] = rank
+        return self
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError(f"Разная точность эскизов: {self.precision} и {other.precision}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        """Оценка количества различных токенов."""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.exp2(-self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Поправка для малых словарей: линейный подсчёт по пустым регистрам
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * np.log(m / zeros)))
+        return int(round(raw))
+
+    def to_dict(self):
+        return {'precision': self.precision, 'registers': base64.b64encode(self.registers.tobytes()).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data):
+        registers = np.frombuffer(base64.b64decode(data['registers']), dtype=np.uint8).copy()
+        return cls(data['precision'], registers)
+
+class TopTokens:
+    """
+    Частоты самых частых токенов с границей погрешности.
+
+    Хранятся точные частоты не более capacity токенов; threshold — верхняя граница
+    частоты любого токена, не попавшего в список. При объединении частоты складываются,
+    поэтому у объединённого состояния частоты — нижние оценки, а недоучёт любого
+    токена не превышает threshold.
+
+    Args:
+        capacity (int): Количество хранимых токенов.
+    """
+
+    def __init__(self, capacity=TOP_CAPACITY, counts=None, threshold=0):
+        self.capacity = capacity
+        self.counts = counts if counts is not None else {}
+        self.threshold = threshold
+
+    @classmethod
+    def from_counter(cls, counter, capacity=TOP_CAPACITY):
+        top = counter.most_common(capacity + 1)
+        threshold = top[capacity][1] if len(top) > capacity else 0
+        return cls(capacity, dict(top[:capacity]), threshold)
+
+    @classmethod
+    def combine(cls, summaries, capacity=TOP_CAPACITY):
+        """Объединение нескольких состояний за один проход."""
+        counts = Counter()
+        threshold = 0
+        for summary in summaries:
+            counts.update(summary.counts)
+            threshold += summary.threshold
+        result = cls.from_counter(counts, capacity)
+        # Токен вне списка мог быть отброшен при усечении или отсутствовать в части состояний
+        result.threshold += threshold
+        return result
+
+    def merge(self, other):
+        merged = TopTokens.combine([self, other], self.capacity)
+        self.counts, self.threshold = merged.counts, merged.threshold
+        return self
+
+    def top(self, k=TOP_TOKENS):
+        return Counter(self.counts).most_common(k)
+
+    def to_dict(self):
+        return {'capacity': self.capacity, 'threshold': self.threshold,
+                'tokens': list(self.counts), 'counts': list(self.counts.values())}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['capacity'], dict(zip(data['tokens'], data['counts'])), data['threshold'])
+
+class Rollup:
+    """Объединяемые метрики набора документов (ячейки или среза)."""
+
+    def __init__(self, documents=0, total_tokens=0, lengths=None, vocabulary=None, top=None):
+        self.documents = documents
+        self.total_tokens = total_tokens
+        self.lengths = lengths if lengths is not None else np.zeros(0, dtype=np.int64)
+        self.vocabulary = vocabulary or VocabularySketch()
+        self.top = top or TopTokens()
+
+    @classmethod
+    def from_tokens(cls, tokens_list, capacity=TOP_CAPACITY):
+        counter = Counter()
+        for tokens in tokens_list:
+            counter.update(tokens)
+        return cls(
+            documents=len(tokens_list),
+            total_tokens=sum(counter.values()),
+            lengths=length_counts(tokens_list),
+            vocabulary=VocabularySketch().add(counter),
+            top=TopTokens.from_counter(counter, capacity)
+        )
+
+    @classmethod
+    def combine(cls, rollups, capacity=TOP_CAPACITY):
+        """Объединение нескольких агрегатов за один проход (исходные агрегаты не изменяются)."""
+        if not rollups:
+            return cls(top=TopTokens(capacity))
+        return cls(
+            documents=sum(rollup.documents for rollup in rollups),
+            total_tokens=sum(rollup.total_tokens for rollup in rollups),
+            lengths=merge_counts([rollup.lengths for rollup in rollups]),
+            vocabulary=VocabularySketch(rollups[0].vocabulary.precision,
+                                        np.maximum.reduce([rollup.vocabulary.registers for rollup in rollups])),
+            top=TopTokens.combine([rollup.top for rollup in rollups], capacity)
+        )
+
+    def merge(self, other):
+        self.documents += other.documents
+        self.total_tokens += other.total_tokens
+        self.lengths = merge_counts([self.lengths, other.lengths])
+        self.vocabulary.merge(other.vocabulary)
+        self.top.merge(other.top)
+        return self
+
+    def summary(self, k=TOP_TOKENS):
+        """
+        Метрики в формате compute_metrics дашборда (без OOV).
+
+        Returns:
+            dict: documents, total_tokens, vocab_size (оценка), avg_token_length, length_counts,
+                token_freq (топ-k токенов) и top_error (граница недоучёта частот).
+        """
+        return {
+            'documents': self.documents,
+            'total_tokens': self.total_tokens,
+            'vocab_size': self.vocabulary.estimate() if self.total_tokens else 0,
+            'avg_token_length': mean_length(self.lengths),
+            'length_counts': self.lengths.tolist(),
+            'token_freq': dict(self.top.top(k)),
+            'top_error': self.top.threshold
+        }
+
+    def to_dict(self):
+        return {
+            'documents': self.documents,
+            'total_tokens': self.total_tokens,
+            'lengths': self.lengths.tolist(),
+            'vocabulary': self.vocabulary.to_dict(),
+            'top': self.top.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            documents=data['documents'],
+            total_tokens=data['total_tokens'],
+            lengths=np.array(data['lengths'], dtype=np.int64),
+            vocabulary=VocabularySketch.from_dict(data['vocabulary']),
+            top=TopTokens.from_dict(data['top'])
+        )
+
+class RollupStore:
+    """
+    Агрегаты корпуса по ячейкам (день, рубрика).
+
+    Args:
+        config (dict): Параметры обработки (метод, фильтры); агрегаты с разными
+            параметрами не объединяются.
+        capacity (int): Количество хранимых топ-токенов в ячейке.
+    """
+
+    def __init__(self, config=None, capacity=TOP_CAPACITY):
+        self.config = config or {}
+        self.capacity = capacity
+        self.cells = {}
+        # День -> ключи статей, учтённых через update (см. article_key)
+        self.ingested = {}
+
+    def add_documents(self, tokens_list, dates, categories):
+        """Учёт документов: токены группируются по ячейкам и добавляются к их агрегатам."""
+        groups = {}
+        for tokens, date, category in zip(tokens_list, dates, categories):
+            groups.setdefault((day_of(date), category_of(category)), []).append(tokens)
+        for cell, cell_tokens in groups.items():
+            rollup = Rollup.from_tokens(cell_tokens, self.capacity)
+            if cell in self.cells:
+                self.cells[cell].merge(rollup)
+            else:
+                self.cells[cell] = rollup
+        return self
+
+    def days(self):
+        """Дни с документами (без UNDATED), по возрастанию."""
+        return sorted({day for day, _ in self.cells if day != UNDATED})
+
+    def categories(self):
+        return sorted({category for _, category in self.cells})
+
+    def drop_days(self, days):
+        days = set(days)
+        self.cells = {cell: rollup for cell, rollup in self.cells.items() if cell[0] not in days}
+        self.ingested = {day: keys for day, keys in self.ingested.items() if day not in days}
+
+    def select(self, start=None, end=None, categories=None, include_undated=True):
+        """
+        Объединённые метрики среза.
+
+        Args:
+            start (str): Первый день ('YYYY-MM-DD', включительно; None — без ограничения).
+            end (str): Последний день (включительно).
+            categories (list): Рубрики (None — все).
+            include_undated (bool): Учитывать статьи без даты.
+
+        Returns:
+            Rollup: Агрегат среза (новый объект, ячейки не изменяются).
+        """
+        categories = set(categories) if categories is not None else None
+        selected = []
+        for (day, category), rollup in self.cells.items():
+            if categories is not None and category not in categories:
+                continue
+            if day == UNDATED:
+                if not include_undated:
+                    continue
+            elif (start and day < start) or (end and day > end):
+                continue
+            selected.append(rollup)
+        return Rollup.combine(selected, self.capacity)
+
+    def update(self, input_file, tokenize_fn, refresh_days=(), chunk_size=1000):
+        """
+        Добавление новых статей корпуса.
+
+        Статьи, уже учтённые в агрегатах (по article_key), пропускаются без токенизации,
+        поэтому корпус можно дозагружать по частям, в том числе дни, собранные не полностью,
+        и статьи без даты (день UNDATED). Дни из refresh_days пересчитываются заново.
+
+        Args:
+            input_file (str): JSONL-файл или каталог колоночного корпуса.
+            tokenize_fn (callable): Функция: список текстов → списки токенов.
+            refresh_days (list): Дни, агрегаты которых строятся заново.
+            chunk_size (int): Количество статей в пачке токенизации.
+
+        Returns:
+            list: Дни, в которые добавлены статьи (или пересчитанные).
+        """
+        self.drop_days(refresh_days)
+        added = set()
+        texts, dates, categories = [], [], []
+
+        def flush():
+            self.add_documents(tokenize_fn(texts), dates, categories)
+            print(f"Агрегаты: обработано статей {len(texts)}")
+            texts.clear()
+            dates.clear()
+            categories.clear()
+
+        for text, date, category, url in iter_articles(input_file):
+            day = day_of(date)
+            key = article_key(text, url)
+            ingested = self.ingested.setdefault(day, set())
+            if key in ingested:
+                continue
+            ingested.add(key)
+            added.add(day)
+            texts.append(text)
+            dates.append(date)
+            categories.append(category)
+            if len(texts) >= chunk_size:
+                flush()
+        if texts:
+            flush()
+        return sorted(added)
+
+    def to_dict(self):
+        return {
+            'version': ROLLUP_FORMAT_VERSION,
+            'config': self.config,
+            'capacity': self.capacity,
+            'cells': [{'day': day, 'category': category, **rollup.to_dict()}
+                      for (day, category), rollup in sorted(self.cells.items())],
+            'ingested': {
+                day: base64.b64encode(np.array(sorted(keys), dtype='<u8').tobytes()).decode('ascii')
+                for day, keys in sorted(self.ingested.items())
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version') != ROLLUP_FORMAT_VERSION:
+            raise ValueError(f"Неподдерживаемая версия формата агрегатов: {data.get('version')}")
+        store = cls(data['config'], data['capacity'])
+        for cell in data['cells']:
+            store.cells[(cell['day'], cell['category'])] = Rollup.from_dict(cell)
+        for day, keys in data['ingested'].items():
+            store.ingested[day] = set(np.frombuffer(base64.b64decode(keys), dtype='<u8').tolist())
+        return store
+
+    def save(self, path):
+        """Атомарная запись в JSON (сжатие — по расширению: rollups.json.gz)."""
+        tmp_path = path + '.tmp'
+        with open_corpus(tmp_path, 'w', compression=compression_from_path(path)) as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open_corpus(path) as f:
+            return cls.from_dict(json.load(f))
+
+def iter_articles(input_file):
+    """
+    Тексты статей с датой и рубрикой (JSONL или каталог колоночного корпуса).
+
+    Yields:
+        tuple: (текст, дата, рубрика, URL) для статей с непустым текстом.
+    """
+    if os.path.isdir(input_file):
+        import corpus_store
+
+        available = set(corpus_store.list_columns(input_file))
+        column = next(name for name in ('preprocessed_text', 'cleaned_text', 'text') if name in available)
+        columns = [column, 'date', 'category'] + (['url'] if 'url' in available else [])
+        for batch in corpus_store.iter_batches(input_file, columns):
+            urls = batch['url'] if 'url' in batch else [None] * len(batch[column])
+            for text, date, category, url in zip(batch[column], batch['date'], batch['category'], urls):
+                if text:
+                    yield text, date, category, url
+        return
+    with open_corpus(input_file) as f:
+        for line in f:
+            try:
+                article = json.loads(line.strip())
+            except ValueError:
+                continue
+            text = article.get('preprocessed_text', article.get('cleaned_text', article.get('text', '')))
+            if text:
+                yield text, article.get('date'), article.get('category'), article.get('url')
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Агрегаты метрик корпуса по дням и рубрикам")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    update = subparsers.add_parser('update', help="Построить агрегаты или добавить новые дни")
+    update.add_argument('input', nargs='?', default='preprocessed_corpus.jsonl')
+    update.add_argument('--output', default='rollups.json.gz')
+    update.add_argument('--method', default='razdel', help="Метод токенизации (tokenization.BATCH_METHODS)")
+    update.add_argument('--refresh-days', nargs='*', default=[], help="Дни, которые нужно пересчитать")
+    update.add_argument('--chunk-size', type=int, default=1000)
+
+    show = subparsers.add_parser('show', help="Метрики среза")
+    show.add_argument('rollups', nargs='?', default='rollups.json.gz')
+    show.add_argument('--from', dest='start')
+    show.add_argument('--to', dest='end')
+    show.add_argument('--category', nargs='*', default=None)
+    show.add_argument('--no-undated', action='store_true', help="Не учитывать статьи без даты")
+    args = parser.parse_args()
+
+    if args.command == 'update':
+        config = {'method': args.method}
+        if os.path.exists(args.output):
+            store = RollupStore.load(args.output)
+            if store.config != config:
+                parser.error(f"{args.output} построен с другими параметрами: {store.config}")
+        else:
+            store = RollupStore(config)
+        import tokenization
+
+        added = store.update(args.input, lambda texts: tokenization.tokenize_batch(texts, args.method),
+                             refresh_days=args.refresh_days, chunk_size=args.chunk_size)
+        store.save(args.output)
+        print(f"Пополнено дней: {len(added)}; всего ячеек: {len(store.cells)} -> {args.output}")
+    else:
+        store = RollupStore.load(args.rollups)
+        summary = store.select(args.start, args.end, args.category, not args.no_undated).summary()
+        print(f"Документов: {summary['documents']}, токенов: {summary['total_tokens']}, "
+              f"словарь ≈ {summary['vocab_size']}, средняя длина токена {summary['avg_token_length']:.2f}")
+        print(f"Топ-токены (недоучёт частот не больше {summary['top_error']}):")
+        for token, count in summary['token_freq'].items():
+            print(f"  {token:<20} {count}")
+
+if __name__ == '__main__':
+    main()
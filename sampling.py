@@ -0,0 +1,199 @@
+import math
+import time
+from statistics import NormalDist
+import numpy as np
+
+# Оценка дорогих метрик (косинусное сходство и т.п.) по стратифицированной случайной выборке.
+#
+# Документы делятся на страты (по дате, категории или длине текста) и выбираются
+# пачками пропорционально размерам страт. После каждой пачки пересчитывается
+# стратифицированное среднее и его доверительный интервал; выборка прекращается,
+# когда интервал стал достаточно узким или исчерпан бюджет времени.
+
+def length_strata(texts, num_bins=4):
+    """Страты по длине текста: номер квантильного интервала длины (0..num_bins-1)."""
+    lengths = np.array([len(text) for text in texts])
+    if not len(lengths):
+        return []
+    edges = np.quantile(lengths, np.linspace(0, 1, num_bins + 1)[1:-1])
+    return np.searchsorted(edges, lengths, side='right').tolist()
+
+def date_strata(dates, period='month'):
+    """Страты по дате публикации: год-месяц ('month') или год ('year'); без даты — 'N/A'."""
+    size = 7 if period == 'month' else 4
+    return [date[:size] if date and date != 'N/A' else 'N/A' for date in dates]
+
+class StratifiedSampler:
+    """
+    Последовательный стратифицированный выбор без возвращения.
+
+    Очередной элемент берётся из страты, которая сильнее всего отстаёт от
+    пропорционального размещения, поэтому выборка остаётся пропорциональной
+    на любом шаге и её можно прервать в любой момент.
+
+    Args:
+        strata (list): Ключ страты для каждого элемента совокупности.
+        seed (int): Зерно генератора.
+    """
+
+    def __init__(self, strata, seed=0):
+        rng = np.random.RandomState(seed)
+        groups = {}
+        for index, key in enumerate(strata):
+            groups.setdefault(key, []).append(index)
+        self.keys = list(groups)
+        self.population = len(strata)
+        self.sizes = {key: len(groups[key]) for key in self.keys}
+        self._queues = {key: rng.permutation(groups[key]).tolist() for key in self.keys}
+        self.drawn = {key: 0 for key in self.keys}
+        self.total_drawn = 0
+
+    def exhausted(self):
+        return self.total_drawn >= self.population
+
+    def draw(self, n):
+        """Следующие n элементов выборки: список пар (индекс, страта)."""
+        sample = []
+        while len(sample) < n and not self.exhausted():
+            target = self.total_drawn + 1
+            key = max((key for key in self.keys if self._queues[key]),
+                      key=lambda key: self.sizes[key] / self.population * target - self.drawn[key])
+            sample.append((self._queues[key].pop(), key))
+            self.drawn[key] += 1
+            self.total_drawn += 1
+        return sample
+
+def percentile(values, q):
+    """Выборочный квантиль q (0..1) без интерполяции; для пустой выборки — 0.0."""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def moments(values):
+    """Достаточные статистики выборки: количество, сумма и сумма квадратов значений."""
+    values = np.asarray(values, dtype=float)
+    return {'n': len(values), 'sum': float(values.sum()), 'sumsq': float(np.dot(values, values))}
+
+def estimate_from_moments(strata_moments, sizes, confidence=0.95):
+    """
+    Стратифицированное среднее и доверительный интервал по достаточным статистикам страт.
+
+    Дисперсия оценки: sum(W_h^2 * s_h^2 / n_h * (1 - n_h / N_h)), где W_h — доля
+    страты в совокупности. Для страт с одним значением берётся общая дисперсия выборки.
+    Статистики (n, sum, sumsq) складываются, поэтому выборки, собранные на разных
+    машинах, объединяются без хранения самих значений.
+
+    Args:
+        strata_moments (dict): Страта -> {'n', 'sum', 'sumsq'}.
+        sizes (dict): Страта -> размер страты в совокупности.
+        confidence (float): Уровень доверия.
+
+    Returns:
+        tuple: (среднее, нижняя граница, верхняя граница) или (None, None, None) без данных.
+    """
+    sampled = {key: m for key, m in strata_moments.items() if m['n']}
+    if not sampled:
+        return None, None, None
+
+    def variance(n, total, total_sq):
+        return max(total_sq - total * total / n, 0.0) / (n - 1) if n > 1 else 0.0
+
+    pooled_var = variance(sum(m['n'] for m in sampled.values()), sum(m['sum'] for m in sampled.values()),
+                          sum(m['sumsq'] for m in sampled.values()))
+
+    # Веса нормируются по охваченным стратам: пока не все страты представлены, оценка относится к ним
+    covered = sum(sizes[key] for key in sampled)
+    mean = 0.0
+    estimate_var = 0.0
+    for key, m in sampled.items():
+        weight = sizes[key] / covered
+        n = m['n']
+        stratum_var = variance(n, m['sum'], m['sumsq']) if n > 1 else pooled_var
+        mean += weight * m['sum'] / n
+        estimate_var += weight ** 2 * stratum_var / n * max(1 - n / sizes[key], 0.0)
+
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    half_width = z * math.sqrt(estimate_var)
+    return mean, mean - half_width, mean + half_width
+
+def stratified_estimate(values_by_stratum, sizes, confidence=0.95):
+    """
+    Стратифицированное среднее и доверительный интервал по значениям выборки.
+
+    Args:
+        values_by_stratum (dict): Страта -> список измеренных значений.
+        sizes (dict): Страта -> размер страты в совокупности.
+        confidence (float): Уровень доверия.
+
+    Returns:
+        tuple: (среднее, нижняя граница, верхняя граница) или (None, None, None) без данных.
+    """
+    return estimate_from_moments({key: moments(values) for key, values in values_by_stratum.items()},
+                                 sizes, confidence)
+
+def estimate_metric(metric_fn, population, strata=None, ci_width=0.02, time_budget=None, min_samples=20,
+                    max_samples=None, batch_size=8, confidence=0.95, seed=0):
+    """
+    Оценка среднего значения дорогой метрики по выборке.
+
+    Args:
+        metric_fn (callable): Функция списка индексов -> список значений метрики
+            (вызывается пачками, чтобы бэкенд мог обрабатывать их вместе).
+        population (int): Размер совокупности (индексы 0..population-1).
+        strata (list): Ключ страты для каждого индекса (по умолчанию одна страта).
+        ci_width (float): Целевая ширина доверительного интервала (None — не ограничивать).
+        time_budget (float): Бюджет времени в секундах (None — не ограничивать).
+        min_samples (int): Минимальный размер выборки перед проверкой условий остановки.
+        max_samples (int): Максимальный размер выборки.
+        batch_size (int): Размер пачки для metric_fn.
+        confidence (float): Уровень доверия интервала.
+        seed (int): Зерно генератора.
+
+    Returns:
+        dict: estimate, ci_low, ci_high, ci_width, samples, population, time_sec и
+            stopped_by ('ci', 'time', 'max_samples' или 'exhausted').
+    """
+    sampler = StratifiedSampler(strata if strata is not None else [0] * population, seed=seed)
+    # Достаточные статистики страт пополняются по пачке: пересчёт оценки не зависит от размера выборки
+    strata_moments = {key: moments([]) for key in sampler.keys}
+    estimate = ci_low = ci_high = None
+    stopped_by = 'exhausted'
+    samples = 0
+    start_time = time.time()
+
+    while not sampler.exhausted():
+        size = batch_size if max_samples is None else min(batch_size, max_samples - samples)
+        batch = sampler.draw(size)
+        values = metric_fn([index for index, _ in batch])
+        for (_, key), value in zip(batch, values):
+            value = float(value)
+            m = strata_moments[key]
+            m['n'] += 1
+            m['sum'] += value
+            m['sumsq'] += value * value
+        samples += len(batch)
+        estimate, ci_low, ci_high = estimate_from_moments(strata_moments, sampler.sizes, confidence)
+
+        if max_samples is not None and samples >= max_samples:
+            stopped_by = 'max_samples'
+            break
+        if samples < min_samples:
+            continue
+        if ci_width is not None and ci_high - ci_low <= ci_width:
+            stopped_by = 'ci'
+            break
+        if time_budget is not None and time.time() - start_time >= time_budget:
+            stopped_by = 'time'
+            break
+
+    return {
+        'estimate': estimate if estimate is not None else 0.0,
+        'ci_low': ci_low if ci_low is not None else 0.0,
+        'ci_high': ci_high if ci_high is not None else 0.0,
+        'ci_width': ci_high - ci_low if estimate is not None else 0.0,
+        'samples': samples,
+        'population': population,
+        'time_sec': time.time() - start_time,
+        'stopped_by': stopped_by
+    }
@@ -0,0 +1,381 @@
+import requests
+from bs4 import BeautifulSoup
+import json
+import time
+import re
+import queue
+import threading
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import WebDriverException
+import google_colab_selenium as gs
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Конфигурация источников
+sources = [
+    {
+        'name': 'ria.ru',
+        'news_url': 'https://ria.ru/lenta/',
+        'article_selector': 'a.list-item__title, a[href*="/2025"]',
+        'title_selectors': ['h1.article__second-title', 'div.article__title', 'h1', '[itemprop="headline"]'],
+        'text_selectors': ['.article__text', '.article__block[data-type="text"] .article__text', 'div.article__body p', 'article p', 'div.article__body div', '.article__content p', '.article__content div'],
+        'date_selectors': ['.article__info-date a', 'time', '[itemprop="datePublished"]', '[property="article:published_time"]'],
+        'category_selectors': ['.article__tags-item', '[data-analytics-rubric]', 'a[href*="/world/"], a[href*="/politics/"]'],
+        'dynamic': True
+    },
+    {
+        'name': 'lenta.ru',
+        'news_url': 'https://lenta.ru/',
+        'article_selector': 'a[href*="/news/"]',
+        'title_selectors': ['h1', '.topic-header__title', '.article__title'],
+        'text_selectors': ['.topic-body__content p', '.article__body p', '.topic-body__text', '.article__text'],
+        'date_selectors': ['time', '.publish-date', '[itemprop="datePublished"]', 'meta[property="article:published_time"]'],
+        'category_selectors': ['.rubric', '.category', '[data-rubric]', '.topic-header__rubric'],
+        'dynamic': True
+    },
+    {
+        'name': 'tass.ru',
+        'news_url': 'https://tass.ru/ekonomika',
+        'article_selector': 'a.NewsCard_link__[data-testid], a.news-preview__link, a.card__link, a[href*="/ekonomika/"]',
+        'title_selectors': ['h1.NewsCard_title__[data-testid]', 'h1.article__title', 'h1', '[itemprop="headline"]'],
+        'text_selectors': ['div.TextBlock_wrapper__[data-testid] p', 'div.text-block p', 'article p', '.ArticleBody_wrapper__[data-testid] p', '.article__text p', '.news-text p', '.NewsCard_text__[data-testid]', '.article-content p'],
+        'date_selectors': ['time.NewsCard_date__[data-testid]', 'span.datetime__[data-testid]', 'time', '[itemprop="datePublished"]'],
+        'category_selectors': ['a.Tag_wrapper__[data-testid]', 'div.category a', '[data-category]', 'meta[name="category"]'],
+        'dynamic': True
+    },
+    {
+        'name': 'kommersant.ru',
+        'news_url': 'https://www.kommersant.ru/lenta',
+        'article_selector': 'a.uho__link, a.article-link, a[href*="/doc/"]',
+        'title_selectors': ['h1.doc_header__name', 'h1.article__title', '[itemprop="headline"]'],
+        'text_selectors': ['div.doc__text p', '.article__body p', 'article p', '.doc__text div'],
+        'date_selectors': ['time.doc_header__publish_time', 'time', '[itemprop="datePublished"]'],
+        'category_selectors': ['div.doc_header__rubric', 'a.category', '[data-rubric]'],
+        'dynamic': True
+    },
+]
+
+def setup_driver():
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless')
+    options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36')
+    options.add_argument('--disable-blink-features=AutomationControlled')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    return gs.Chrome(options=options)
+
+class DriverPool:
+    """
+    Ограниченный пул долгоживущих драйверов Chrome.
+
+    Драйверы создаются лениво (не больше size одновременно), выдаются потокам
+    ThreadPoolExecutor и возвращаются обратно. Перед выдачей драйвер проходит
+    проверку работоспособности; после max_pages страниц или после ошибки он
+    пересоздаётся.
+
+    Args:
+        size (int): Максимальное число одновременно запущенных браузеров.
+        max_pages (int): Количество страниц, после которого драйвер пересоздаётся.
+        factory (callable): Функция создания драйвера.
+    """
+
+    def __init__(self, size=4, max_pages=50, factory=setup_driver):
+        self.size = size
+        self.max_pages = max_pages
+        self.factory = factory
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._pages = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.recycled = 0
+
+    def _is_alive(self, driver):
+        try:
+            driver.execute_script('return 1')
+            return True
+        except Exception:
+            return False
+
+    def _destroy(self, driver):
+        with self._lock:
+            self._pages.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def acquire(self):
+        """Получение драйвера из пула (блокируется, пока все драйверы заняты)."""
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    driver = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                if self._is_alive(driver):
+                    return driver
+                print("Драйвер не отвечает, пересоздаём...")
+                self._destroy(driver)
+                with self._lock:
+                    self.recycled += 1
+
+            driver = self.factory()
+            with self._lock:
+                self._pages[id(driver)] = 0
+                self.created += 1
+            return driver
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, driver, broken=False):
+        """
+        Возврат драйвера в пул.
+
+        Args:
+            driver: Драйвер, полученный через acquire().
+            broken (bool): Была ли ошибка при работе с драйвером.
+        """
+        try:
+            with self._lock:
+                pages = self._pages.get(id(driver), 0) + 1
+                self._pages[id(driver)] = pages
+            if broken or pages >= self.max_pages:
+                self._destroy(driver)
+                with self._lock:
+                    self.recycled += 1
+            else:
+                self._idle.put(driver)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Завершение всех простаивающих драйверов."""
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._destroy(driver)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+def extract_from_meta(soup, url):
+    """Извлечение данных из мета-тегов и общих блоков"""
+    data = {}
+    data['title'] = (soup.find('title').text.strip() if soup.find('title') else
+                     soup.find('meta', property='og:title')['content'] if soup.find('meta', property='og:title') else
+                     'N/A')
+
+    date_match = re.search(r'/(\d{4})(\d{2})(\d{2})/', url)
+    if date_match:
+        data['date'] = f"{date_match.group(1)}-{date_match.group(2)}-{date_match.group(3)}"
+    else:
+        date_meta = soup.find('meta', property='article:published_time')
+        data['date'] = date_meta['content'] if date_meta else 'N/A'
+
+    rubric_meta = soup.find('meta', attrs={'name': re.compile('analytics:rubric|category', re.I)})
+    data['category'] = rubric_meta['content'] if rubric_meta else 'N/A'
+
+    text_parts = []
+    for block in soup.find_all(['div', 'article'], class_=['TextBlock_wrapper__[data-testid]', 'text-block', 'ArticleBody_wrapper__[data-testid]',
+                                                          'article__block', 'news-full__text', 'topic-body__content', 'doc__text', 'general-material__body']):
+        text_elem = block.find_all(['p', 'div'], class_=['article__text', 'news-full__content', 'topic-body__text', 'text-block', 'doc__text',
+                                                        'TextBlock_wrapper__[data-testid]', 'general-material__text', 'NewsCard_text__[data-testid]', 'article-content'])
+        for elem in text_elem:
+            if elem.text.strip():
+                text_parts.append(elem.text.strip())
+
+    if not text_parts:
+        desc_meta = soup.find('meta', property='og:description')
+        text_parts = [desc_meta['content']] if desc_meta else []
+
+    data['text'] = ' '.join(text_parts)
+    data['url'] = url
+    return data
+
+def get_article_links(source, pool, limit=50):
+    """Получение ссылок на статьи с главной страницы"""
+    links = []
+    driver = pool.acquire()
+    broken = False
+    wait = WebDriverWait(driver, 10)
+
+    try:
+        print(f"[{source['name']}] Загружаем главную страницу: {source['news_url']}")
+        driver.get(source['news_url'])
+        wait.until(EC.any_of(
+            EC.presence_of_element_located((By.CSS_SELECTOR, source['article_selector'])),
+            EC.presence_of_element_located((By.TAG_NAME, "article"))
+        ))
+
+        soup = BeautifulSoup(driver.page_source, 'html.parser')
+        articles = soup.select(source['article_selector'])[:limit]
+        print(f"[{source['name']}] Найдено {len(articles)} элементов статей")
+
+        base_url = source['news_url'].split('/')[0] + '//' + source['news_url'].split('/')[2]
+        raw_links = [a.get('href', '') for a in articles]
+        print(f"[{source['name']}] Сырые ссылки: {raw_links[:3]}...")
+
+        for link in raw_links:
+            if not link:
+                continue
+            if not link.startswith('http'):
+                if not link.startswith('/'):
+                    link = '/' + link
+                link = base_url + link
+            if source['name'] in link and 'http' in link:
+                links.append(link)
+        print(f"[{source['name']}] Отфильтровано {len(links)} валидных ссылок: {links[:3]}...")
+    except Exception as e:
+        print(f"[{source['name']}] Ошибка ссылок: {e}")
+        broken = True
+        try:
+            with open(f"{source['name']}_debug.html", 'w', encoding='utf-8') as f:
+                f.write(driver.page_source)
+        except WebDriverException:
+            pass
+    finally:
+        pool.release(driver, broken=broken)
+    return links
+
+def parse_article(url, source, pool):
+    """Парсинг отдельной статьи"""
+    driver = None
+    broken = False
+
+    try:
+        headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.5',
+            'Referer': source['news_url']
+        }
+        response = requests.head(url, headers=headers, timeout=5, allow_redirects=True)
+        if response.status_code != 200:
+            print(f"[{source['name']}] Страница недоступна: {url} (статус {response.status_code})")
+            return None
+
+        # Драйвер берём из пула только после проверки доступности страницы
+        driver = pool.acquire()
+        wait = WebDriverWait(driver, 15)
+        print(f"[{source['name']}] Загружаем {url}")
+        driver.get(url)
+        wait.until(EC.any_of(
+            EC.presence_of_element_located((By.CSS_SELECTOR, ",".join(source['text_selectors']))),
+            EC.presence_of_element_located((By.TAG_NAME, "article"))
+        ))
+
+        soup = BeautifulSoup(driver.page_source, 'html.parser')
+        article = extract_from_meta(soup, url)
+
+        if len(article['text'].split()) < 30:
+            print(f"[{source['name']}] Мало текста из мета ({len(article['text'].split())} слов), ищем в DOM...")
+            text_elements = soup.select(','.join(source['text_selectors']))
+            text_parts = [el.get_text(strip=True) for el in text_elements if el.get_text(strip=True)]
+
+            if text_parts:
+                article['text'] = ' '.join(text_parts)
+                print(f"[{source['name']}] Найдено {len(text_parts)} блоков текста")
+            else:
+                fallback_elements = soup.select('article p, main p, .article p, .news-full p, .topic-body p, .text-block p, .doc__text p, .article-content p')
+                text_parts = [p.get_text(strip=True) for p in fallback_elements if p.get_text(strip=True) and len(p.get_text(strip=True)) > 20]
+                if text_parts:
+                    article['text'] = ' '.join(text_parts)
+                    print(f"[{source['name']}] Fallback: найдено {len(text_parts)} параграфов")
+
+        if len(article['title']) < 10:
+            for selector in source['title_selectors']:
+                title_elem = soup.select_one(selector)
+                if title_elem and title_elem.text.strip():
+                    article['title'] = title_elem.text.strip()
+                    print(f"[{source['name']}] Заголовок найден с селектором: {selector}")
+                    break
+
+        words = len(article['text'].split())
+        if article['title'] and words > 20:
+            print(f"[{source['name']}] Успешно: {words} слов")
+            return article
+        else:
+            print(f"[{source['name']}] Недостаточно контента: title='{article['title'][:50]}...', words={words}")
+            return None
+
+    except Exception as e:
+        print(f"[{source['name']}] Ошибка парсинга {url}: {str(e)[:100]}")
+        if driver is not None:
+            broken = True
+            try:
+                with open(f"{source['name']}_article_debug.html", 'w', encoding='utf-8') as f:
+                    f.write(driver.page_source)
+            except WebDriverException:
+                pass
+        return None
+    finally:
+        if driver is not None:
+            pool.release(driver, broken=broken)
+
+def main(pool_size=4, max_pages_per_driver=50):
+    """Основная функция для сбора статей"""
+    corpus_file = 'corpus.jsonl'
+    total_words = 0
+    min_words = 50000
+
+    with open(corpus_file, 'w', encoding='utf-8') as f:
+        f.write('')
+
+    # Один пул браузеров на весь сбор: число потоков совпадает с размером пула
+    with DriverPool(size=pool_size, max_pages=max_pages_per_driver) as pool:
+        for source in sources:
+            print(f"\n=== Сбор с {source['name']} ===")
+            links = get_article_links(source, pool, limit=50)  # Ограничение на 50 ссылок на источник
+
+            with ThreadPoolExecutor(max_workers=pool.size) as executor:
+                future_to_url = {executor.submit(parse_article, link, source, pool): link for link in links}
+                for future in as_completed(future_to_url):
+                    if total_words >= min_words:
+                        break
+                    url = future_to_url[future]
+                    try:
+                        article = future.result()
+                        if article and article['text']:
+                            words = len(article['text'].split())
+                            if words > 50:
+                                with open(corpus_file, 'a', encoding='utf-8') as f:
+                                    json.dump(article, f, ensure_ascii=False)
+                                    f.write('\n')
+                                total_words += words
+                                print(f"[{source['name']}] ✅ Добавлено: {article['title'][:60]}... ({words} слов). Итого: {total_words}")
+                            else:
+                                print(f"[{source['name']}] ❌ Мало слов: {words}")
+                        else:
+                            print(f"[{source['name']}] ❌ Не удалось извлечь статью: {url}")
+                    except Exception as e:
+                        print(f"[{source['name']}] Ошибка обработки {url}: {e}")
+
+                    if total_words < min_words:
+                        time.sleep(1)  # Минимальная задержка для обхода защиты
+
+            if total_words >= min_words:
+                break
+
+        print(f"Создано драйверов: {pool.created}, пересоздано: {pool.recycled}")
+
+    with open(corpus_file, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    print(f"\n=== ИТОГО ===")
+    print(f"Сохранено статей: {len(lines)}")
+    print(f"Общее слов: {total_words}")
+    if lines:
+        print("Пример первой статьи:")
+        print(json.loads(lines[0]))
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,263 @@
+import re
+import copy
+import time
+import numpy as np
+
+# Бэкенды косинусного сходства исходного и обработанного текста.
+#
+#   transformer       — SentenceTransformer (MiniLM), как и раньше;
+#   transformer-int8  — та же модель с динамической int8-квантизацией линейных слоёв (CPU);
+#   hashed-ngram      — хешированные символьные n-граммы с весами TF-IDF: не требует
+#                       загрузки модели и работает на разреженных векторах numpy.
+#
+# Все бэкенды считают сходство пачками пар: similarity(originals, processed)[i] —
+# сходство originals[i] и processed[i].
+
+DEFAULT_MODEL = 'paraphrase-multilingual-MiniLM-L12-v2'
+
+class SimilarityBackend:
+    """Базовый класс бэкенда сходства."""
+
+    name = None
+
+    def fit(self, texts):
+        """Подготовка по корпусу (например, веса IDF); по умолчанию ничего не делает."""
+        return self
+
+    def similarity(self, originals, processed):
+        """
+        Косинусное сходство пар текстов.
+
+        Args:
+            originals (list): Исходные тексты.
+            processed (list): Обработанные тексты (той же длины).
+
+        Returns:
+            np.ndarray: Сходство каждой пары (пустой текст даёт 0.0).
+        """
+        raise NotImplementedError
+
+    def score(self, original_text, processed_text):
+        """Сходство одной пары текстов."""
+        return float(self.similarity([original_text], [processed_text])[0])
+
+class TransformerBackend(SimilarityBackend):
+    """
+    Эмбеддинги SentenceTransformer.
+
+    Args:
+        model_name (str): Название модели.
+        batch_size (int): Размер пачки при кодировании.
+        device (str): Устройство ('cpu', 'cuda'; по умолчанию — выбор библиотеки).
+    """
+
+    name = 'transformer'
+
+    def __init__(self, model_name=DEFAULT_MODEL, batch_size=32, device=None):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.device = device
+        self._model = None
+
+    def _load_model(self):
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(self.model_name, device=self.device)
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = self._load_model()
+        return self._model
+
+    def similarity(self, originals, processed):
+        scores = np.zeros(len(originals), dtype=np.float32)
+        valid = [i for i, (a, b) in enumerate(zip(originals, processed)) if a and b]
+        if not valid:
+            return scores
+        # Обе стороны пар кодируются одним вызовом, эмбеддинги нормализуются моделью
+        embeddings = self.model.encode([originals[i] for i in valid] + [processed[i] for i in valid],
+                                       batch_size=self.batch_size, normalize_embeddings=True,
+                                       convert_to_numpy=True)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        left, right = embeddings[:len(valid)], embeddings[len(valid):]
+        scores[valid] = np.einsum('ij,ij->i', left, right)
+        return scores
+
+class QuantizedTransformerBackend(TransformerBackend):
+    """Та же модель SentenceTransformer с динамической int8-квантизацией линейных слоёв (только CPU)."""
+
+    name = 'transformer-int8'
+
+    def __init__(self, model_name=DEFAULT_MODEL, batch_size=32):
+        super().__init__(model_name, batch_size, device='cpu')
+
+    def _load_model(self):
+        import torch
+
+        model = super()._load_model()
+        model.eval()
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+_SPACE_RE = re.compile(r'\s+')
+
+class HashedNgramBackend(SimilarityBackend):
+    """
+    Хешированные символьные n-граммы с весами TF-IDF.
+
+    Текст переводится в массив кодов символов, хеши всех n-грамм считаются
+    векторно (полиномиальный хеш), признаки — остаток от деления на n_features.
+    Вектор документа хранится разреженно: отсортированные номера признаков и веса.
+    Без вызова fit используются только сублинейные веса TF.
+
+    Args:
+        ngram_range (tuple): Минимальная и максимальная длина n-граммы.
+        n_features (int): Размер пространства признаков.
+    """
+
+    name = 'hashed-ngram'
+
+    _BASE = np.uint64(1000003)
+    _MASK = np.uint64((1 << 32) - 1)
+
+    def __init__(self, ngram_range=(2, 4), n_features=2 ** 20):
+        self.ngram_range = ngram_range
+        self.n_features = n_features
+        self.idf = None
+
+    def _features(self, text):
+        text = ' ' + _SPACE_RE.sub(' ', text.lower()).strip() + ' '
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+        parts = []
+        hashes = np.zeros(len(codes), dtype=np.uint64)
+        for n in range(1, self.ngram_range[1] + 1):
+            if n > len(codes):
+                break
+            # hashes[i] — хеш n-граммы, начинающейся в позиции i
+            hashes = (hashes[:len(codes) - n + 1] * self._BASE + codes[n - 1:]) & self._MASK
+            if n >= self.ngram_range[0]:
+                parts.append((hashes * np.uint64(n) * np.uint64(2654435761) & self._MASK) % np.uint64(self.n_features))
+        if not parts:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        features, counts = np.unique(np.concatenate(parts).astype(np.int64), return_counts=True)
+        return features, counts
+
+    def fit(self, texts):
+        """Расчёт весов IDF по корпусу."""
+        doc_freq = np.zeros(self.n_features, dtype=np.int64)
+        n_docs = 0
+        for text in texts:
+            features, _ = self._features(text)
+            doc_freq[features] += 1
+            n_docs += 1
+        self.idf = (np.log((1 + n_docs) / (1 + doc_freq)) + 1).astype(np.float32)
+        return self
+
+    def vector(self, text):
+        """Разреженный нормированный вектор текста: (номера признаков, веса)."""
+        features, counts = self._features(text)
+        weights = 1 + np.log(counts, dtype=np.float32)
+        if self.idf is not None:
+            weights *= self.idf[features]
+        norm = np.sqrt(np.dot(weights, weights))
+        if norm:
+            weights /= norm
+        return features, weights
+
+    def similarity(self, originals, processed):
+        scores = np.zeros(len(originals), dtype=np.float32)
+        vectors = {}
+        for i, (a, b) in enumerate(zip(originals, processed)):
+            if not a or not b:
+                continue
+            # Исходные тексты обычно повторяются (один текст — несколько методов)
+            if a not in vectors:
+                vectors[a] = self.vector(a)
+            features_a, weights_a = vectors[a]
+            features_b, weights_b = self.vector(b)
+            _, index_a, index_b = np.intersect1d(features_a, features_b, assume_unique=True, return_indices=True)
+            scores[i] = np.dot(weights_a[index_a], weights_b[index_b])
+        return scores
+
+BACKENDS = {
+    'transformer': TransformerBackend,
+    'transformer-int8': QuantizedTransformerBackend,
+    'hashed-ngram': HashedNgramBackend
+}
+
+_instances = {}
+
+def get_backend(backend='transformer'):
+    """
+    Бэкенд по названию (экземпляры кешируются, модель загружается один раз).
+
+    Args:
+        backend (str | SimilarityBackend): Название из BACKENDS или готовый экземпляр.
+    """
+    if isinstance(backend, SimilarityBackend):
+        return backend
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд сходства: {backend}")
+    if backend not in _instances:
+        _instances[backend] = BACKENDS[backend]()
+    return _instances[backend]
+
+def fit_backend(backend, texts):
+    """
+    Бэкенд, подготовленный по корпусу texts.
+
+    Общие экземпляры get_backend при этом не меняются: бэкенд с состоянием корпуса
+    (веса IDF) копируется и обучается заново, бэкенд без него (модель) возвращается общий.
+
+    Args:
+        backend (str | SimilarityBackend): Название из BACKENDS или готовый экземпляр.
+        texts (iterable): Тексты корпуса.
+    """
+    backend = get_backend(backend)
+    if type(backend).fit is SimilarityBackend.fit:
+        return backend
+    return copy.copy(backend).fit(texts)
+
+def compare_backends(originals, processed, backends=tuple(BACKENDS), reference='transformer', fit_texts=None):
+    """
+    Сравнение бэкендов на одних и тех же парах: скорость и согласие с эталоном.
+
+    Args:
+        originals (list): Исходные тексты.
+        processed (list): Обработанные тексты.
+        backends (iterable): Названия или экземпляры бэкендов.
+        reference (str): Эталонный бэкенд, с которым считается корреляция.
+        fit_texts (list): Тексты для fit (по умолчанию — originals).
+
+    Returns:
+        list: Строки отчёта: backend, pairs, time_sec, pairs_per_sec, mean_similarity,
+            pearson и spearman (корреляция с эталоном).
+    """
+    import pandas as pd
+
+    scores = {}
+    rows = []
+    for backend in backends:
+        backend = get_backend(backend)
+        start_time = time.time()
+        backend = fit_backend(backend, fit_texts if fit_texts is not None else originals)
+        scores[backend.name] = backend.similarity(originals, processed)
+        elapsed = time.time() - start_time
+        rows.append({
+            'backend': backend.name,
+            'pairs': len(originals),
+            'time_sec': elapsed,
+            'pairs_per_sec': len(originals) / elapsed if elapsed else float('inf'),
+            'mean_similarity': float(scores[backend.name].mean()) if len(originals) else 0.0
+        })
+        print(f"{backend.name}: {rows[-1]['pairs_per_sec']:.1f} пар/с")
+
+    reference_scores = pd.Series(scores[reference]) if reference in scores else None
+    for row in rows:
+        if reference_scores is None or len(reference_scores) < 2:
+            row['pearson'] = row['spearman'] = None
+            continue
+        current = pd.Series(scores[row['backend']])
+        row['pearson'] = current.corr(reference_scores)
+        # Спирмен — корреляция Пирсона рангов (без зависимости от scipy)
+        row['spearman'] = current.rank().corr(reference_scores.rank())
+    return rows
@@ -0,0 +1,53 @@
+import json
+
+from dedup import deduplicate_corpus, find_duplicates
+
+BASE = ("Правительство объявило о новых мерах поддержки малого бизнеса в регионах страны. "
+        "Программа включает льготные кредиты, налоговые каникулы и субсидии на аренду помещений. "
+        "По словам министра, первые выплаты начнутся уже в следующем месяце, а заявки будут "
+        "принимать через портал государственных услуг и многофункциональные центры.")
+NEAR = BASE.replace("следующем месяце", "следующем квартале")
+OTHER = ("Футбольный клуб из Казани одержал уверенную победу в домашнем матче чемпионата. "
+         "Главный тренер команды отметил слаженную игру защиты и высокую дисциплину игроков. "
+         "Следующую встречу команда проведёт на выезде против действующего чемпиона лиги.")
+
+def write_corpus(path, lines):
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in lines:
+            f.write((line if isinstance(line, str) else json.dumps(line, ensure_ascii=False)) + '\n')
+
+def read_lines(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f]
+
+def test_near_duplicates_share_a_cluster(tmp_path):
+    corpus = tmp_path / 'corpus.jsonl'
+    write_corpus(corpus, [{'text': BASE}, {'text': OTHER}, {'text': NEAR}])
+    clusters = find_duplicates(str(corpus), threshold=0.5, workers=1)
+    assert clusters == {0: 0, 2: 0}
+
+def test_distinct_articles_are_not_clustered(tmp_path):
+    corpus = tmp_path / 'corpus.jsonl'
+    write_corpus(corpus, [{'text': BASE}, {'text': OTHER}])
+    assert find_duplicates(str(corpus), threshold=0.5, workers=1) == {}
+
+def test_drop_mode_keeps_first_of_cluster(tmp_path):
+    corpus, output = tmp_path / 'corpus.jsonl', tmp_path / 'out.jsonl'
+    write_corpus(corpus, [{'id': 1, 'text': BASE}, {'id': 2, 'text': OTHER}, {'id': 3, 'text': NEAR}])
+    assert deduplicate_corpus(str(corpus), str(output), mode='drop', threshold=0.5, workers=1) == (3, 1, 1)
+    assert [json.loads(line)['id'] for line in read_lines(output)] == [1, 2]
+
+def test_tag_mode_marks_clusters_and_passes_bad_lines(tmp_path):
+    corpus, output = tmp_path / 'corpus.jsonl', tmp_path / 'out.jsonl'
+    write_corpus(corpus, [{'id': 1, 'text': BASE}, 'не json', {'id': 2, 'text': OTHER}, {'id': 3, 'text': NEAR}])
+    assert deduplicate_corpus(str(corpus), str(output), mode='tag', threshold=0.5, workers=1) == (4, 1, 1)
+    lines = read_lines(output)
+    assert lines[1] == 'не json'
+    tagged = [json.loads(line) for i, line in enumerate(lines) if i != 1]
+    assert [(a['id'], a['duplicate_cluster']) for a in tagged] == [(1, 0), (2, None), (3, 0)]
+
+def test_bucket_size_is_capped(tmp_path):
+    corpus = tmp_path / 'corpus.jsonl'
+    write_corpus(corpus, [{'text': BASE}] * 5)
+    # Копии сливаются с представителем корзины, даже когда новых представителей уже не принимают
+    assert find_duplicates(str(corpus), threshold=0.5, workers=1, max_bucket=1) == {i: 0 for i in range(5)}
@@ -0,0 +1,22 @@
+import gzip
+import os
+import time
+from collections import Counter
+
+import exporters
+
+def test_export_writes_into_directory(tmp_path):
+    path = exporters.export_frequencies(Counter(мама=2, рама=1), 'csv.gz', directory=str(tmp_path))
+    assert os.path.dirname(path) == str(tmp_path)
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        assert f.read().splitlines()[:2] == ['rank,token,frequency,percentage', '1,мама,2,66.66666666666666']
+
+def test_remove_stale_keeps_fresh_files(tmp_path):
+    old, fresh, keep = tmp_path / 'old.csv.gz', tmp_path / 'fresh.csv.gz', tmp_path / '.gitkeep'
+    for path in (old, fresh, keep):
+        path.write_bytes(b'')
+    past = time.time() - 7200
+    os.utime(old, (past, past))
+    os.utime(keep, (past, past))
+    assert exporters.remove_stale(str(tmp_path), 3600) == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['.gitkeep', 'fresh.csv.gz']
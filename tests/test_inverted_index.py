@@ -0,0 +1,44 @@
+import numpy as np
+
+from inverted_index import InvertedIndex, varint_decode, varint_encode
+
+def test_varint_round_trip():
+    values = [0, 1, 127, 128, 300, 16383, 16384, 2 ** 21, 2 ** 32 - 1, 2 ** 40 + 5]
+    data, sizes = varint_encode(values)
+    assert sizes.tolist() == [1, 1, 1, 2, 2, 2, 3, 4, 5, 6]
+    assert len(data) == sizes.sum()
+    assert varint_decode(data).tolist() == values
+
+def test_varint_empty():
+    data, sizes = varint_encode([])
+    assert len(data) == 0 and len(sizes) == 0
+    assert varint_decode(data).tolist() == []
+
+def test_varint_random_round_trip():
+    values = np.random.RandomState(0).randint(0, 2 ** 31, size=5000)
+    assert np.array_equal(varint_decode(varint_encode(values)[0]), values)
+
+def brute_force_occurrences(tokens_list, wanted):
+    return sorted((doc, position) for doc, tokens in enumerate(tokens_list)
+                  for position, token in enumerate(tokens) if token in wanted)
+
+def test_occurrences_match_brute_force():
+    rng = np.random.RandomState(1)
+    words = ['мама', 'мыла', 'раму', 'рама', 'рамка', 'папа', 'окно']
+    tokens_list = [[words[i] for i in rng.randint(0, len(words), size=rng.randint(0, 40))] for _ in range(60)]
+    index = InvertedIndex.build(tokens_list)
+    for token in words:
+        docs, positions = index.occurrences(*index.token_range(token))
+        assert sorted(zip(docs.tolist(), positions.tolist())) == brute_force_occurrences(tokens_list, {token})
+    docs, positions = index.occurrences(*index.token_range('рам', prefix=True))
+    assert sorted(zip(docs.tolist(), positions.tolist())) == \
+        brute_force_occurrences(tokens_list, {'раму', 'рама', 'рамка'})
+
+def test_search_snippets_and_doc_refs(tmp_path):
+    index = InvertedIndex.build([['мама', 'мыла', 'раму'], [], ['раму', 'мыла', 'папа']], doc_refs=[10, 11, 12])
+    path = str(tmp_path / 'index.npz')
+    index.save(path)
+    result = InvertedIndex.load(path).search('мыла', window=1)
+    assert result['occurrences'] == 2 and result['documents'] == 2
+    assert [(s['doc'], s['left'], s['token'], s['right']) for s in result['snippets']] == \
+        [(10, 'мама', 'мыла', 'раму'), (12, 'раму', 'мыла', 'папа')]
@@ -0,0 +1,119 @@
+import threading
+
+import pytest
+
+from job_scheduler import JobScheduler, SchedulerBusy
+
+def blocker():
+    """Задача, занимающая поток, пока не будет вызван release."""
+    started, release = threading.Event(), threading.Event()
+
+    def fn(report):
+        started.set()
+        release.wait(5)
+        return 'blocker'
+    return fn, started, release
+
+@pytest.fixture
+def scheduler():
+    return JobScheduler(max_workers=1, max_queued=20, max_queued_per_user=10)
+
+def test_round_robin_between_users(scheduler):
+    fn, started, release = blocker()
+    scheduler.submit('block', fn, 'a')
+    assert started.wait(5)
+
+    order = []
+    jobs = []
+    for key, user in [('a1', 'a'), ('a2', 'a'), ('a3', 'a'), ('b1', 'b'), ('c1', 'c'), ('b2', 'b')]:
+        jobs.append(scheduler.submit(key, lambda report, key=key: order.append(key), user, replace=False))
+    assert [scheduler.queue_position(job) for job in jobs] == [0, 3, 5, 1, 2, 4]
+
+    release.set()
+    for job in jobs:
+        assert job.wait(5)
+    # Серия задач пользователя a не задерживает остальных
+    assert order == ['a1', 'b1', 'c1', 'a2', 'b2', 'a3']
+
+def test_identical_jobs_are_coalesced(scheduler):
+    fn, started, release = blocker()
+    scheduler.submit('block', fn, 'a')
+    assert started.wait(5)
+
+    calls = []
+    first = scheduler.submit('same', lambda report: calls.append(1) or 42, 'a')
+    second = scheduler.submit('same', lambda report: calls.append(2) or 43, 'b')
+    assert second is first
+    assert first.users == {'a', 'b'}
+    assert scheduler.stats()['coalesced'] == 1
+
+    # Отказ одного пользователя не отменяет задачу, нужную другому
+    scheduler.cancel(first, 'a')
+    assert first.status == 'queued'
+
+    release.set()
+    assert first.wait(5)
+    assert first.get() == 42 and calls == [1]
+
+def test_cancel_by_last_user_and_replace(scheduler):
+    fn, started, release = blocker()
+    scheduler.submit('block', fn, 'a')
+    assert started.wait(5)
+
+    old = scheduler.submit('old', lambda report: 'old', 'a')
+    new = scheduler.submit('new', lambda report: 'new', 'a')
+    # Новый запуск пользователя заменяет его ожидающую задачу
+    assert old.status == 'cancelled' and old.done
+    release.set()
+    assert new.wait(5) and new.get() == 'new'
+    with pytest.raises(RuntimeError):
+        old.get()
+
+def test_queue_limits():
+    scheduler = JobScheduler(max_workers=1, max_queued=20, max_queued_per_user=1)
+    fn, started, release = blocker()
+    scheduler.submit('block', fn, 'a')
+    assert started.wait(5)
+    scheduler.submit('x', lambda report: None, 'b', replace=False)
+    with pytest.raises(SchedulerBusy):
+        scheduler.submit('y', lambda report: None, 'b', replace=False)
+    assert scheduler.stats()['rejected'] == 1
+    release.set()
+
+def test_failed_job_reports_error(scheduler):
+    def fail(report):
+        raise ValueError("ошибка")
+    job = scheduler.submit('fail', fail, 'a')
+    assert job.wait(5)
+    assert job.status == 'failed'
+    with pytest.raises(ValueError):
+        job.get()
+
+def test_result_is_released_after_all_users_collect(scheduler):
+    fn, started, release = blocker()
+    scheduler.submit('block', fn, 'a')
+    assert started.wait(5)
+
+    job = scheduler.submit('same', lambda report: ['токены'], 'a')
+    assert scheduler.submit('same', lambda report: None, 'b') is job
+    release.set()
+    assert job.wait(5)
+
+    assert scheduler.collect(job, 'a') == ['токены']
+    # Пользователь b ещё не забрал результат
+    assert scheduler.get(job.id) is job and job.result == ['токены']
+    assert scheduler.collect(job, 'b') == ['токены']
+    assert job.result is None and scheduler.get(job.id) is None
+    with pytest.raises(RuntimeError):
+        job.get()
+
+def test_finished_jobs_are_purged_without_new_submissions():
+    scheduler = JobScheduler(max_workers=1, keep_finished_sec=0)
+    fn, started, release = blocker()
+    first = scheduler.submit('block', fn, 'a')
+    assert started.wait(5)
+    second = scheduler.submit('second', lambda report: 'second', 'b')
+    release.set()
+    assert second.wait(5)
+    # Завершение второй задачи в потоке удаляет первую, которую так и не забрали
+    assert scheduler.get(first.id) is None and first.result is None
@@ -0,0 +1,66 @@
+import os
+
+from lemma_table import Lemmatizer, LemmaTable, compact, journal_path, open_lemmatizer, write_table
+
+LEMMAS = {'мыла': 'мыть', 'раму': 'рама', 'рамы': 'рама', 'мама': 'мама', 'ёжики': 'ёжик'}
+
+class FakeParse:
+    def __init__(self, normal_form):
+        self.normal_form = normal_form
+
+class FakeAnalyzer:
+    """Вместо pymorphy2: лемма — токен без последней буквы."""
+
+    def __init__(self):
+        self.calls = []
+
+    def parse(self, token):
+        self.calls.append(token)
+        return [FakeParse(token[:-1])]
+
+def test_lookups(tmp_path):
+    path = str(tmp_path / 'lemmas.bin')
+    assert write_table(LEMMAS, path) == len(LEMMAS)
+    with LemmaTable(path) as table:
+        assert len(table) == len(LEMMAS)
+        for token, lemma in LEMMAS.items():
+            assert table.get(token) == lemma
+        assert table.get('папа') is None
+        assert table.get('', 'нет') == 'нет'
+        assert dict(table.items()) == LEMMAS
+
+def test_empty_table(tmp_path):
+    path = str(tmp_path / 'lemmas.bin')
+    write_table({}, path)
+    with LemmaTable(path) as table:
+        assert len(table) == 0
+        assert table.get('мама') is None
+
+def test_lemmatizer_uses_analyzer_only_for_misses(tmp_path):
+    path = str(tmp_path / 'lemmas.bin')
+    write_table(LEMMAS, path)
+    analyzer = FakeAnalyzer()
+    lemmatizer = Lemmatizer(LemmaTable(path), lambda: analyzer)
+    assert lemmatizer.lemmatize(['мама', 'мыла', 'папы', 'папы']) == ['мама', 'мыть', 'пап', 'пап']
+    assert analyzer.calls == ['папы']
+    # Повторный промах берётся из уже найденных лемм
+    assert (lemmatizer.hits, lemmatizer.misses) == (3, 1)
+
+def test_learned_misses_are_compacted(tmp_path):
+    path = str(tmp_path / 'lemmas.bin')
+    write_table(LEMMAS, path)
+    lemmatizer = open_lemmatizer(path, FakeAnalyzer, learn=True)
+    version = lemmatizer.version
+    lemmatizer.normal_form('папы')
+    lemmatizer._journal.close()
+
+    # Журнал виден новым процессам и меняет версию для ключей кеша токенов
+    reopened = open_lemmatizer(path)
+    assert reopened.normal_form('папы') == 'пап'
+    assert reopened.version != version
+
+    assert compact(path) == 1
+    with LemmaTable(path) as table:
+        assert table.get('папы') == 'пап'
+    assert not os.path.exists(journal_path(path))
+    assert open_lemmatizer(path).version not in (version, reopened.version)
@@ -0,0 +1,53 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from nlp_service import MicroBatcher, Overloaded
+
+def test_results_are_split_back_per_request():
+    batches = []
+
+    def fn(batch):
+        batches.append(list(batch))
+        return [item.upper() for item in batch]
+
+    async def scenario():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            batcher = MicroBatcher(fn, executor, max_batch=4, max_wait_ms=20)
+            requests = [['а', 'б'], ['в'], [], ['г', 'д', 'е'], ['ж']]
+            results = await asyncio.gather(*(batcher.submit(items) for items in requests))
+            return requests, results, batcher
+
+    requests, results, batcher = asyncio.run(scenario())
+    assert results == [[item.upper() for item in items] for items in requests]
+    # Пачки не больше max_batch, запрос не разрезается между пачками
+    assert all(len(batch) <= 4 for batch in batches)
+    assert sorted(item for batch in batches for item in batch) == sorted('абвгдеж')
+    assert batcher.pending == 0 and batcher.items == 7
+    assert len(batches) < 4
+
+def test_batch_error_is_raised_for_every_request():
+    def fn(batch):
+        raise ValueError("ошибка пачки")
+
+    async def scenario():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            batcher = MicroBatcher(fn, executor, max_batch=8, max_wait_ms=20)
+            return await asyncio.gather(batcher.submit(['а']), batcher.submit(['б']), return_exceptions=True), batcher
+
+    results, batcher = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert batcher.pending == 0
+
+def test_overloaded_when_too_many_pending():
+    async def scenario():
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            batcher = MicroBatcher(lambda batch: batch, executor, max_batch=8, max_wait_ms=20, max_pending=2)
+            first = asyncio.ensure_future(batcher.submit(['а', 'б']))
+            await asyncio.sleep(0)
+            with pytest.raises(Overloaded):
+                await batcher.submit(['в'])
+            return await first
+
+    assert asyncio.run(scenario()) == ['а', 'б']
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from oov import StreamingKFoldOOV, fold_for_offset
+
+def corpus(seed=0, documents=200):
+    rng = np.random.RandomState(seed)
+    return [[f"t{value}" for value in rng.zipf(1.3, size=rng.randint(1, 50))] for _ in range(documents)]
+
+def test_merge_equals_single_pass():
+    docs = corpus()
+    single = StreamingKFoldOOV(k=5)
+    for offset, tokens in enumerate(docs):
+        single.add(tokens, fold_for_offset(offset, 5))
+
+    # Части корпуса (например, шарды) обрабатываются отдельно и объединяются
+    parts = [StreamingKFoldOOV(k=5) for _ in range(3)]
+    for offset, tokens in enumerate(docs):
+        parts[offset % 3].add(tokens, fold_for_offset(offset, 5))
+    merged = parts[0].merge(parts[1]).merge(parts[2])
+
+    assert merged.documents == single.documents
+    assert merged.vocab_size == single.vocab_size
+    assert merged.test_counts.tolist() == single.test_counts.tolist()
+    assert merged.result() == single.result()
+
+def test_dict_round_trip():
+    estimator = StreamingKFoldOOV(k=3)
+    for tokens in corpus(documents=30):
+        estimator.add(tokens)
+    restored = StreamingKFoldOOV.from_dict(estimator.to_dict())
+    assert restored.result() == estimator.result()
+
+def test_merge_rejects_different_k():
+    with pytest.raises(ValueError):
+        StreamingKFoldOOV(k=3).merge(StreamingKFoldOOV(k=5))
+
+def test_folds_are_balanced():
+    folds = [fold_for_offset(offset, 5) for offset in range(1000)]
+    assert np.bincount(folds).tolist() == [200] * 5
@@ -0,0 +1,100 @@
+import random
+import pytest
+
+import reconstruction
+from reconstruction import diff, levenshtein
+
+def dp_levenshtein(a, b):
+    """Эталон: классическое динамическое программирование."""
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+def apply_spans(a, b, spans):
+    """Восстановление b из a по различающимся фрагментам (между ними строки должны совпадать)."""
+    result = []
+    position_a = position_b = 0
+    for i1, i2, j1, j2 in spans:
+        assert a[position_a:i1] == b[position_b:j1]
+        result.append(a[position_a:i1] + b[j1:j2])
+        position_a, position_b = i2, j2
+    assert a[position_a:] == b[position_b:]
+    return ''.join(result) + a[position_a:]
+
+def random_edit(rng, text, alphabet):
+    chars = list(text)
+    for _ in range(rng.randint(1, 6)):
+        operation = rng.choice(['insert', 'delete', 'replace', 'move'])
+        position = rng.randrange(len(chars) + 1)
+        if operation == 'insert':
+            chars.insert(position, rng.choice(alphabet))
+        elif operation == 'delete' and position < len(chars):
+            del chars[position]
+        elif operation == 'replace' and position < len(chars):
+            chars[position] = rng.choice(alphabet)
+        elif operation == 'move' and len(chars) > 2:
+            start = rng.randrange(len(chars) - 1)
+            end = min(len(chars), start + rng.randint(1, 30))
+            block = chars[start:end]
+            del chars[start:end]
+            target = rng.randrange(len(chars) + 1)
+            chars[target:target] = block
+    return ''.join(chars)
+
+@pytest.fixture
+def pure_python(monkeypatch):
+    # Проверяется собственная реализация, даже если rapidfuzz установлен
+    monkeypatch.setattr(reconstruction, '_rapidfuzz_levenshtein', lambda: None)
+
+@pytest.mark.parametrize('a, b', [
+    ('', ''), ('', 'абв'), ('абв', ''), ('kitten', 'sitting'),
+    ('мама мыла раму', 'мама мыла раму'), ('ab' * 40, 'ba' * 40), ('x' * 70, 'x' * 65 + 'y'),
+])
+def test_levenshtein_matches_dp(a, b):
+    assert levenshtein(a, b) == dp_levenshtein(a, b)
+
+def test_block_swap_is_exact(pure_python):
+    # Якоря обоих блоков не лежат на оптимальном выравнивании
+    a = 'дзийаджйвзгб  ебазвийжзие'
+    b = '  ебазвийжзидзийаджйвзгбе'
+    distance, spans = diff(a, b)
+    assert distance == dp_levenshtein(a, b) == 20
+    assert apply_spans(a, b, spans) == b
+
+def test_random_block_swaps(pure_python):
+    rng = random.Random(2)
+    for _ in range(300):
+        text = ''.join(rng.choice('абвгдежзий ') for _ in range(rng.randint(24, 80)))
+        start = rng.randrange(len(text) - 23)
+        swapped = text[:start] + text[start + 12:start + 24] + text[start:start + 12] + text[start + 24:]
+        distance, spans = diff(text, swapped)
+        assert distance == dp_levenshtein(text, swapped), (text, swapped)
+        assert apply_spans(text, swapped, spans) == swapped
+
+def test_random_edits_with_block_moves(pure_python):
+    rng = random.Random(0)
+    alphabet = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя ,.'
+    for _ in range(300):
+        a = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 150)))
+        b = random_edit(rng, a, alphabet)
+        distance, spans = diff(a, b)
+        assert distance == dp_levenshtein(a, b), (a, b)
+        assert apply_spans(a, b, spans) == b
+
+def test_evaluate_counts_exact_matches():
+    result = reconstruction.evaluate(['Мама мыла раму.', 'Папа'], ['Мама мыла раму.', 'Папы'])
+    assert result['exact_match_rate'] == 50.0
+
+def test_trained_model_without_decoder_round_trips():
+    from subword import train_model
+
+    texts = ['мама мыла раму', 'папа читал газету', 'рама стояла у окна'] * 5
+    tokenizer = train_model(texts, 'bpe', 40, min_frequency=1)
+    assert reconstruction.spaces_lost(tokenizer)
+    # decode разделяет подслова пробелами: по умолчанию пробелы не учитываются
+    assert reconstruction.evaluate_tokenizer(tokenizer, texts)['exact_match_rate'] == 100.0
+    assert reconstruction.evaluate_tokenizer(tokenizer, texts, ignore_spaces=False)['char_error_rate'] > 0
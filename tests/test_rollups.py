@@ -0,0 +1,48 @@
+from collections import Counter
+
+import numpy as np
+
+from rollups import Rollup, RollupStore, TopTokens, VocabularySketch
+
+def test_hll_merge_equals_union():
+    left = VocabularySketch().add([f"a{i}" for i in range(3000)])
+    right = VocabularySketch().add([f"a{i}" for i in range(2000, 6000)])
+    union = VocabularySketch().add([f"a{i}" for i in range(6000)])
+    left.merge(right)
+    assert np.array_equal(left.registers, union.registers)
+    assert abs(left.estimate() - 6000) / 6000 < 0.05
+
+def test_hll_small_cardinality_is_close():
+    assert abs(VocabularySketch().add(['мама', 'мыла', 'раму', 'мама']).estimate() - 3) <= 1
+
+def test_top_tokens_merge_is_exact_within_capacity():
+    a, b = Counter(x=5, y=3), Counter(y=4, z=1)
+    merged = TopTokens.from_counter(a, capacity=10).merge(TopTokens.from_counter(b, capacity=10))
+    assert merged.counts == {'x': 5, 'y': 7, 'z': 1}
+    assert merged.threshold == 0
+
+def test_top_tokens_merge_error_bound():
+    rng = np.random.RandomState(0)
+    parts = [Counter(rng.zipf(1.5, size=2000).tolist()) for _ in range(4)]
+    total = sum(parts, Counter())
+    merged = TopTokens.combine([TopTokens.from_counter(part, capacity=20) for part in parts], capacity=20)
+    for token, count in total.items():
+        # Частоты — нижние оценки, недоучёт не больше threshold
+        estimate = merged.counts.get(token, 0)
+        assert estimate <= count <= estimate + merged.threshold
+
+def test_rollup_combine_matches_single_pass():
+    docs = [['мама', 'мыла', 'раму'], ['папа', 'мыл', 'окно'], ['мама', 'папа']]
+    combined = Rollup.combine([Rollup.from_tokens(docs[:2]), Rollup.from_tokens(docs[2:])])
+    single = Rollup.from_tokens(docs)
+    assert combined.summary() == single.summary()
+
+def test_store_round_trip_keeps_ingested(tmp_path):
+    store = RollupStore({'method': 'test'}).add_documents([['a', 'b'], ['c']], ['2025-10-01', None], ['Спорт', None])
+    store.ingested['2025-10-01'] = {1, 2 ** 63 + 7}
+    path = str(tmp_path / 'rollups.json.gz')
+    store.save(path)
+    loaded = RollupStore.load(path)
+    assert loaded.ingested == store.ingested
+    assert loaded.select().summary() == store.select().summary()
+    assert loaded.select(include_undated=False).documents == 1
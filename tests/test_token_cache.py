@@ -0,0 +1,41 @@
+from token_cache import TokenCache
+
+def open_pair(tmp_path, **options):
+    path = str(tmp_path / 'cache.sqlite')
+    first, second = TokenCache(path, **options), TokenCache(path, **options)
+    # Блокировка не должна ждать: любое ожидание — ошибка теста, а не задержка
+    first._conn.execute("PRAGMA busy_timeout=100")
+    second._conn.execute("PRAGMA busy_timeout=100")
+    return first, second
+
+def test_reads_do_not_hold_the_write_lock(tmp_path):
+    first, second = open_pair(tmp_path)
+    first.put('текст', 'razdel', ['мама', 'мыла'])
+    first.flush()
+    assert first.get('текст', 'razdel') == ['мама', 'мыла']
+    first.put('другой', 'razdel', ['раму'])
+    # Попадания и несохранённые записи одного экземпляра не мешают другому читать и писать
+    assert second.get('текст', 'razdel') == ['мама', 'мыла']
+    second.put('третий', 'razdel', ['окно'])
+    second.flush()
+    first.flush()
+    assert second.get('другой', 'razdel') == ['раму']
+    assert first.get('третий', 'razdel') == ['окно']
+
+def test_size_limit_counts_other_writers(tmp_path):
+    first, second = open_pair(tmp_path, max_bytes=400, commit_every=2)
+    for i in range(40):
+        (first if i % 2 else second).put(f"текст {i}", 'm', [f"t{i}_{j}" for j in range(5)])
+    first.flush()
+    second.flush()
+    assert first.stats()['size_bytes'] <= 400
+
+def test_vocab_pruning_is_seen_by_other_instances(tmp_path):
+    first, second = open_pair(tmp_path, max_bytes=200, commit_every=1)
+    for i in range(20):
+        first.put(f"текст {i}", 'm', [f"t{i}_{j}" for j in range(5)])
+    first.prune_vocab()
+    assert first.stats()['vocab_size'] < 100
+    second.put('новый', 'm', ['t19_0', 'новый'])
+    assert first.get('новый', 'm') == ['t19_0', 'новый']
+    assert first.get('текст 19', 'm') == [f"t19_{j}" for j in range(5)]
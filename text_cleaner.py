@@ -1,29 +1,66 @@
 import re
+import os
 import json
 import time
+import hashlib
+from functools import lru_cache
 from bs4 import BeautifulSoup
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-import nltk
+from corpus_io import open_corpus, compression_from_path
+
+# NLTK импортируется и его ресурсы проверяются только при первой очистке текста,
+# а не при импорте модуля: быстрый старт коротких заданий и приложений, импортирующих модуль.
 
 # Загрузка ресурсов NLTK для русского языка
-def ensure_nltk_resources():
-    try:
-        nltk.data.find('tokenizers/punkt_tab')
-        nltk.data.find('corpora/stopwords')
-    except LookupError:
-        print("Загружаем необходимые ресурсы NLTK...")
-        nltk.download('punkt_tab')
-        nltk.download('stopwords')
+@lru_cache(maxsize=None)
+def ensure_nltk_resources(*resources):
+    import nltk
 
-ensure_nltk_resources()
+    for resource in resources or ('tokenizers/punkt_tab', 'corpora/stopwords'):
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            print("Загружаем необходимые ресурсы NLTK...")
+            nltk.download(resource.split('/')[-1])
 
-# Инициализация стоп-слов для русского языка
-stop_words = set(stopwords.words('russian'))
 # Дополнительные стоп-слова для новостных сайтов
-stop_words.update(['тасс', 'риа', 'новости', 'лента', 'коммерсант'])
+NEWS_STOP_WORDS = frozenset({'тасс', 'риа', 'новости', 'лента', 'коммерсант'})
+
+@lru_cache(maxsize=None)
+def get_stop_words():
+    """Стоп-слова для русского языка (NLTK и новостные), загружаются при первом обращении."""
+    ensure_nltk_resources('corpora/stopwords')
+    from nltk.corpus import stopwords
+    return frozenset(stopwords.words('russian')) | NEWS_STOP_WORDS
+
+def __getattr__(name):
+    # Совместимость: text_cleaner.stop_words по-прежнему доступен, но вычисляется лениво
+    if name == 'stop_words':
+        return get_stop_words()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Слово (в том числе составное через дефис, "кто-то") вместе с предшествующим пробелом
+_WORD_RE = re.compile(r' ?(\w+(?:-\w+)*)')
+
+def filter_stopwords(text, words=None):
+    """
+    Удаление стоп-слов без полной токенизации NLTK.
+
+    Текст сканируется скомпилированным выражением по словам; стоп-слово
+    вырезается вместе с предшествующим пробелом, остальные пробелы
+    и пунктуация исходного текста сохраняются.
+
+    Args:
+        text (str): Текст после стандартизации пробелов.
+        words (frozenset): Множество стоп-слов (по умолчанию — get_stop_words()).
+
+    Returns:
+        str: Текст без стоп-слов.
+    """
+    if words is None:
+        words = get_stop_words()
+    return _WORD_RE.sub(lambda m: '' if m.group(1) in words else m.group(), text).strip()
 
-def clean_text(text, to_lower=True, remove_stopwords=True):
+def clean_text(text, to_lower=True, remove_stopwords=True, exact_stopwords=False):
     """
     Очистка и нормализация текста.
 
@@ -31,6 +68,8 @@ def clean_text(text, to_lower=True, remove_stopwords=True):
         text (str): Исходный текст.
         to_lower (bool): Приводить ли текст к нижнему регистру.
         remove_stopwords (bool): Удалять ли стоп-слова.
+        exact_stopwords (bool): Удалять стоп-слова через word_tokenize NLTK, как в прежних
+            версиях (результат — токены через пробел); по умолчанию используется filter_stopwords.
 
     Returns:
         str: Очищенный и нормализованный текст или None при ошибке.
@@ -74,10 +113,15 @@ def clean_text(text, to_lower=True, remove_stopwords=True):
             text = text.lower()
 
         # Удаление стоп-слова
-        if remove_stopwords:
+        if remove_stopwords and not exact_stopwords:
+            text = filter_stopwords(text)
+        elif remove_stopwords:
             try:
+                ensure_nltk_resources('tokenizers/punkt_tab')
+                from nltk.tokenize import word_tokenize
+                words = get_stop_words()
                 tokens = word_tokenize(text, language='russian')
-                tokens = [token for token in tokens if token not in stop_words and token.strip()]
+                tokens = [token for token in tokens if token not in words and token.strip()]
                 text = ' '.join(tokens)
             except Exception as e:
                 print(f"Ошибка токенизации: {str(e)[:100]}")
@@ -89,7 +133,8 @@ def clean_text(text, to_lower=True, remove_stopwords=True):
         print(f"Ошибка в clean_text: {str(e)[:100]}")
         return None
 
-def process_corpus(input_file='corpus.jsonl', output_file='cleaned_corpus.jsonl', to_lower=True, remove_stopwords=True):
+def process_corpus(input_file='corpus.jsonl', output_file='cleaned_corpus.jsonl', to_lower=True, remove_stopwords=True,
+                   exact_stopwords=False):
     """
     Обработка корпуса из JSONL-файла.
 
@@ -98,6 +143,7 @@ def process_corpus(input_file='corpus.jsonl', output_file='cleaned_corpus.jsonl'
         output_file (str): Путь к выходному файлу с очищенным текстом.
         to_lower (bool): Приводить ли текст к нижнему регистру.
         remove_stopwords (bool): Удалять ли стоп-слова.
+        exact_stopwords (bool): Удалять стоп-слова прежним способом (через word_tokenize).
 
     Returns:
         tuple: (количество обработанных статей, количество ошибок, общее количество слов)
@@ -106,11 +152,16 @@ def process_corpus(input_file='corpus.jsonl', output_file='cleaned_corpus.jsonl'
     error_count = 0
     total_words = 0
 
-    with open(input_file, 'r', encoding='utf-8') as f_in, open(output_file, 'w', encoding='utf-8') as f_out:
+    # Манифест инкрементального режима (если был) не соответствует перезаписанному файлу
+    if os.path.exists(output_file + '.manifest.json'):
+        os.remove(output_file + '.manifest.json')
+
+    with open_corpus(input_file) as f_in, open_corpus(output_file, 'w') as f_out:
         for line in f_in:
             try:
                 article = json.loads(line.strip())
-                cleaned_text = clean_text(article['text'], to_lower=to_lower, remove_stopwords=remove_stopwords)
+                cleaned_text = clean_text(article['text'], to_lower=to_lower, remove_stopwords=remove_stopwords,
+                                          exact_stopwords=exact_stopwords)
                 if cleaned_text:
                     article['cleaned_text'] = cleaned_text
                     words = len(cleaned_text.split())
@@ -128,26 +179,287 @@ def process_corpus(input_file='corpus.jsonl', output_file='cleaned_corpus.jsonl'
 
     return processed_count, error_count, total_words
 
+def process_store(store_dir, to_lower=True, remove_stopwords=True, batch_size=10000, exact_stopwords=False):
+    """
+    Обработка колоночного корпуса (см. corpus_store).
+
+    Читается только колонка text, результат записывается отдельной колонкой
+    cleaned_text (для пропущенных статей — пустое значение).
+
+    Args:
+        store_dir (str): Каталог колоночного корпуса.
+        to_lower (bool): Приводить ли текст к нижнему регистру.
+        remove_stopwords (bool): Удалять ли стоп-слова.
+        exact_stopwords (bool): Удалять стоп-слова прежним способом (через word_tokenize).
+        batch_size (int): Размер пачки при чтении и записи.
+
+    Returns:
+        tuple: (количество обработанных статей, количество ошибок, общее количество слов)
+    """
+    import corpus_store
+
+    stats = {'processed': 0, 'errors': 0, 'words': 0}
+
+    def cleaned_batches():
+        for batch in corpus_store.iter_batches(store_dir, ['text'], batch_size):
+            cleaned = []
+            for text in batch['text']:
+                cleaned_text = clean_text(text, to_lower=to_lower, remove_stopwords=remove_stopwords,
+                                        exact_stopwords=exact_stopwords) if text else None
+                if cleaned_text:
+                    stats['processed'] += 1
+                    stats['words'] += len(cleaned_text.split())
+                else:
+                    stats['errors'] += 1
+                cleaned.append(cleaned_text)
+            yield cleaned
+
+    corpus_store.append_column(store_dir, 'cleaned_text', cleaned_batches())
+    return stats['processed'], stats['errors'], stats['words']
+
+# Версия правил очистки: при изменении clean_text инкрементальный режим пересобирает выход
+CLEANER_VERSION = 1
+# Формат манифеста: articles[ключ] = [хеш содержимого, смещение текущей строки статьи в
+# выходном файле или None, если статья не записана (пустой очищенный текст)]
+MANIFEST_FORMAT = 2
+# Уплотнение выходного файла, когда устаревшие строки составляют не меньше этой доли
+COMPACT_RATIO = 0.25
+
+def article_key(article):
+    """Ключ статьи в манифесте: URL, а при его отсутствии — хеш содержимого."""
+    return article.get('url') or 'sha1:' + content_hash(article)
+
+def content_hash(article):
+    """SHA-1 от всех полей исходной статьи (без учёта порядка ключей)."""
+    payload = json.dumps(article, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def _read_manifest(manifest_file):
+    """Чтение манифеста; None, если его нет или он другого формата."""
+    if not os.path.exists(manifest_file):
+        return None
+    try:
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != MANIFEST_FORMAT:
+        return None
+    return manifest
+
+def _load_manifest(manifest_file, settings):
+    """Чтение манифеста; при отсутствии, другом формате или смене настроек возвращает None."""
+    manifest = _read_manifest(manifest_file)
+    if manifest is None:
+        return None
+    if manifest.get('settings') != settings:
+        print("Настройки очистки изменились, выполняется полная пересборка...")
+        return None
+    return manifest
+
+def _save_manifest(manifest_file, manifest):
+    """Атомарная запись манифеста через временный файл."""
+    tmp_file = manifest_file + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_file, manifest_file)
+
+def _iter_live_lines(output_file, manifest):
+    """Строки текущих версий статей: (смещение, строка в байтах), файл читается потоком."""
+    live = {entry[1] for entry in manifest['articles'].values() if entry[1] is not None}
+    offset = 0
+    with open(output_file, 'rb') as f:
+        for line in f:
+            if offset in live:
+                yield offset, line
+            offset += len(line)
+
+def iter_cleaned(output_file, manifest_file=None):
+    """
+    Строки выходного файла без устаревших и удалённых версий статей.
+
+    Между уплотнениями файл инкрементального режима содержит и прежние версии
+    изменённых статей; текущие определяются по манифесту. Для файла без манифеста
+    (обычный режим) возвращаются все строки.
+
+    Yields:
+        str: Строка JSONL.
+    """
+    manifest = _read_manifest(manifest_file or output_file + '.manifest.json')
+    if manifest is None:
+        with open_corpus(output_file) as f:
+            yield from f
+        return
+    for _, line in _iter_live_lines(output_file, manifest):
+        yield line.decode('utf-8')
+
+def _compact_output(output_file, manifest):
+    """Потоковое удаление устаревших версий статей; смещения в манифесте обновляются."""
+    moved = {}
+    tmp_file = output_file + '.tmp'
+    with open(tmp_file, 'wb') as f_out:
+        for offset, line in _iter_live_lines(output_file, manifest):
+            moved[offset] = f_out.tell()
+            f_out.write(line)
+        f_out.flush()
+        os.fsync(f_out.fileno())
+    os.replace(tmp_file, output_file)
+    for entry in manifest['articles'].values():
+        if entry[1] is not None:
+            entry[1] = moved[entry[1]]
+    manifest['output_size'] = os.path.getsize(output_file)
+    manifest['output_lines'] = len(moved)
+    manifest['stale_lines'] = 0
+
+def process_corpus_incremental(input_file='corpus.jsonl', output_file='cleaned_corpus.jsonl', to_lower=True,
+                               remove_stopwords=True, manifest_file=None, checkpoint_every=100,
+                               exact_stopwords=False, compact_ratio=COMPACT_RATIO):
+    """
+    Инкрементальная обработка корпуса с возобновлением после сбоя.
+
+    Манифест хранит настройки очистки и для каждой статьи (по URL) хеш содержимого
+    и смещение её текущей строки в выходном файле. Обрабатываются только новые и
+    изменённые статьи, результат дописывается в конец выходного файла; прежняя
+    версия изменённой статьи (и статья, которая теперь очищается в пустой текст)
+    становится устаревшей строкой. Файл уплотняется потоково, когда устаревшие строки
+    составляют не меньше compact_ratio; до этого текущие версии читает iter_cleaned.
+    Каждые checkpoint_every статей манифест сохраняется вместе с размером выходного
+    файла; при перезапуске хвост, записанный после последней контрольной точки,
+    отбрасывается.
+
+    Args:
+        input_file (str): Путь к входному файлу corpus.jsonl.
+        output_file (str): Путь к выходному файлу с очищенным текстом.
+        to_lower (bool): Приводить ли текст к нижнему регистру.
+        remove_stopwords (bool): Удалять ли стоп-слова.
+        exact_stopwords (bool): Удалять стоп-слова прежним способом (через word_tokenize).
+        manifest_file (str): Путь к манифесту (по умолчанию <output_file>.manifest.json).
+        checkpoint_every (int): Частота сохранения контрольных точек (в статьях).
+        compact_ratio (float): Доля устаревших строк, при которой файл уплотняется (0 — всегда).
+
+    Returns:
+        tuple: (количество обработанных статей, количество ошибок, общее количество слов, количество пропущенных без изменений)
+    """
+    # Контрольные точки — смещения в выходном файле, поэтому он не сжимается (входной может быть сжат)
+    if compression_from_path(output_file):
+        raise ValueError(f"Инкрементальный режим пишет только несжатый файл: {output_file}")
+    manifest_file = manifest_file or output_file + '.manifest.json'
+    settings = {'to_lower': to_lower, 'remove_stopwords': remove_stopwords, 'exact_stopwords': exact_stopwords,
+                'version': CLEANER_VERSION}
+
+    manifest = _load_manifest(manifest_file, settings)
+    output_size = os.path.getsize(output_file) if os.path.exists(output_file) else 0
+    if manifest is None or output_size < manifest.get('output_size', 0):
+        manifest = {'format': MANIFEST_FORMAT, 'settings': settings, 'output_size': 0, 'output_lines': 0,
+                    'articles': {}, 'stale_lines': 0}
+    elif output_size > manifest['output_size']:
+        print("Обнаружен незавершённый запуск, продолжаем с последней контрольной точки...")
+    # Отбрасываем всё, что было записано после последней контрольной точки
+    with open(output_file, 'a', encoding='utf-8') as f_out:
+        f_out.truncate(manifest['output_size'])
+
+    articles = manifest['articles']
+    processed_count = 0
+    error_count = 0
+    total_words = 0
+    unchanged_count = 0
+    since_checkpoint = 0
+
+    def checkpoint(f_out):
+        f_out.flush()
+        os.fsync(f_out.fileno())
+        manifest['output_size'] = os.path.getsize(output_file)
+        _save_manifest(manifest_file, manifest)
+
+    # Выход пишется в байтах: смещения строк в манифесте — позиции в файле
+    with open_corpus(input_file) as f_in, open(output_file, 'ab') as f_out:
+        for line in f_in:
+            article = {}
+            try:
+                article = json.loads(line.strip())
+                key = article_key(article)
+                digest = content_hash(article)
+                previous = articles.get(key)
+                if previous and previous[0] == digest:
+                    unchanged_count += 1
+                    continue
+
+                cleaned_text = clean_text(article['text'], to_lower=to_lower, remove_stopwords=remove_stopwords,
+                                          exact_stopwords=exact_stopwords)
+                offset = None
+                if cleaned_text:
+                    article['cleaned_text'] = cleaned_text
+                    total_words += len(cleaned_text.split())
+                    offset = f_out.tell()
+                    f_out.write((json.dumps(article, ensure_ascii=False) + '\n').encode('utf-8'))
+                    manifest['output_lines'] += 1
+                    processed_count += 1
+                else:
+                    print(f"Пропущена статья: {article.get('url', 'N/A')} (title: {article.get('title', 'N/A')[:50]}...) - пустой очищенный текст")
+                    error_count += 1
+                # Предыдущая версия изменённой (или ставшей пустой) статьи остаётся в файле до уплотнения
+                if previous and previous[1] is not None:
+                    manifest['stale_lines'] += 1
+                articles[key] = [digest, offset]
+            except Exception as e:
+                print(f"Ошибка обработки статьи: {article.get('url', 'N/A')} (title: {article.get('title', 'N/A')[:50]}...) - {str(e)[:100]}")
+                error_count += 1
+                continue
+
+            since_checkpoint += 1
+            if since_checkpoint >= checkpoint_every:
+                checkpoint(f_out)
+                since_checkpoint = 0
+
+        checkpoint(f_out)
+
+    stale_lines = manifest['stale_lines']
+    if stale_lines and stale_lines >= compact_ratio * manifest['output_lines']:
+        print(f"Уплотнение выходного файла: удаляется устаревших версий статей: {stale_lines}")
+        _compact_output(output_file, manifest)
+        _save_manifest(manifest_file, manifest)
+    elif stale_lines:
+        print(f"Устаревших версий статей в файле: {stale_lines} из {manifest['output_lines']} строк "
+              f"(уплотнение с доли {compact_ratio:.0%})")
+
+    return processed_count, error_count, total_words, unchanged_count
+
 def main():
-    input_file = 'corpus.jsonl'
-    output_file = 'cleaned_corpus.jsonl'
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Очистка текстов корпуса")
+    parser.add_argument('--input', default='corpus.jsonl')
+    parser.add_argument('--output', default='cleaned_corpus.jsonl')
+    parser.add_argument('--incremental', action='store_true',
+                        help="Обрабатывать только новые и изменённые статьи (с возобновлением после сбоя)")
+    parser.add_argument('--compact-ratio', type=float, default=COMPACT_RATIO,
+                        help="Доля устаревших строк, при которой выход уплотняется (инкрементальный режим)")
+    args = parser.parse_args()
+    input_file = args.input
+    output_file = args.output
 
     print("Начало обработки корпуса...")
     start_time = time.time()
-    processed_count, error_count, total_words = process_corpus(input_file, output_file, to_lower=True, remove_stopwords=True)
+    if args.incremental:
+        processed_count, error_count, total_words, unchanged_count = process_corpus_incremental(
+            input_file, output_file, to_lower=True, remove_stopwords=True, compact_ratio=args.compact_ratio)
+        print(f"Без изменений (пропущено): {unchanged_count}")
+    else:
+        processed_count, error_count, total_words = process_corpus(input_file, output_file, to_lower=True, remove_stopwords=True)
     print(f"Обработка завершена за {time.time() - start_time:.2f} секунд")
     print(f"Обработано статей: {processed_count}")
     print(f"Ошибок: {error_count}")
     print(f"Общее слов после очистки: {total_words}")
 
     # Вывод примера первой очищенной статьи
-    with open(output_file, 'r', encoding='utf-8') as f:
-        lines = f.readlines()
-        if lines:
-            print("Пример первой очищенной статьи:")
-            first_article = json.loads(lines[0])
-            print(f"Title: {first_article['title'][:60]}...")
-            print(f"Cleaned text: {first_article['cleaned_text'][:200]}...")
+    first_line = next(iter_cleaned(output_file), None)
+    if first_line:
+        print("Пример первой очищенной статьи:")
+        first_article = json.loads(first_line)
+        print(f"Title: {first_article['title'][:60]}...")
+        print(f"Cleaned text: {first_article['cleaned_text'][:200]}...")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -1,17 +1,16 @@
 import streamlit as st
 import json
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from collections import Counter
-from nltk.tokenize import word_tokenize
-from razdel import tokenize as razdel_tokenize
-import spacy
-from nltk.stem import SnowballStemmer
-import nltk
+from functools import lru_cache
 import os
+import time
 import warnings
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import exporters
+
+# Тяжёлые библиотеки (NLTK, razdel, pandas, plotly, numpy) импортируются при первом
+# использовании: первая страница интерфейса отрисовывается без них.
 
 # Игнорируем предупреждения
 warnings.filterwarnings("ignore")
@@ -21,7 +20,9 @@ def is_streamlit_running():
     return hasattr(st, 'runtime') and st.runtime.exists()
 
 # Загрузка ресурсов NLTK
+@lru_cache(maxsize=None)
 def ensure_nltk_resources():
+    import nltk
     try:
         nltk.data.find('tokenizers/punkt_tab')
     except LookupError:
@@ -30,6 +31,8 @@ def ensure_nltk_resources():
 # Функции токенизации
 def nltk_tokenize(text, language):
     try:
+        from nltk.tokenize import word_tokenize
+        ensure_nltk_resources()
         lang = 'russian' if language == 'Русский' else 'english'
         return [t for t in word_tokenize(text, language=lang) if t.strip()]
     except:
@@ -37,63 +40,420 @@ def nltk_tokenize(text, language):
 
 def razdel_tokenize_func(text, language):
     if language == 'Русский':
+        from razdel import tokenize as razdel_tokenize
         return [token.text for token in razdel_tokenize(text) if token.text.strip()]
     return text.split()
 
 # Функции нормализации
+@lru_cache(maxsize=None)
+def get_stemmer(lang):
+    from nltk.stem import SnowballStemmer
+    return SnowballStemmer(lang)
+
 def snowball_stem(tokens, language):
     lang = 'russian' if language == 'Русский' else 'english'
-    stemmer = SnowballStemmer(lang)
+    stemmer = get_stemmer(lang)
     return [stemmer.stem(token) for token in tokens]
 
+# Токенизация выбранным методом (без дополнительных фильтров)
+def tokenize_text(text, method, language):
+    if method == 'nltk':
+        return nltk_tokenize(text, language)
+    if method == 'razdel':
+        return razdel_tokenize_func(text, language)
+    if method == 'nltk_snowball':
+        return snowball_stem(nltk_tokenize(text, language), language)
+    return []
+
+# Общий для всех сессий кеш токенов (тот же файл использует tokenization.run_experiment)
+@st.cache_resource
+def get_token_cache():
+    from token_cache import TokenCache
+    return TokenCache()
+
+# Общий для всех сессий планировщик задач обработки: ограниченный пул потоков,
+# очереди сессий с круговой очерёдностью и объединение одинаковых задач
+@st.cache_resource
+def get_scheduler():
+    from job_scheduler import JobScheduler
+    return JobScheduler()
+
+@st.cache_resource
+def get_profile_lock():
+    import threading
+    return threading.Lock()
+
+def session_user():
+    """Пользователь планировщика — сессия браузера."""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else 'local'
+
+@st.cache_data(show_spinner=False)
+def _file_digest(path, mtime_ns, size):
+    import hashlib
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def file_digest(path):
+    """Хеш содержимого файла (пересчитывается только при изменении файла)."""
+    stat = os.stat(path)
+    return _file_digest(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+UPLOAD_DIR = 'uploads'
+
+# Файлы полного экспорта отдаются статической раздачей Streamlit (server.enableStaticServing,
+# каталог static рядом со скриптом): файл читается потоково, а не целиком в память сессии
+EXPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'exports')
+EXPORT_URL = 'app/static/exports'
+EXPORT_MAX_AGE_SEC = 3600
+
+@st.cache_resource
+def get_export_dir():
+    """Каталог файлов экспорта; при запуске сервера из него удаляются устаревшие файлы."""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    exporters.remove_stale(EXPORT_DIR, EXPORT_MAX_AGE_SEC)
+    return EXPORT_DIR
+
+def save_upload(uploaded_file):
+    """Сохранение загруженного файла под именем по хешу содержимого: у каждой сессии свой файл."""
+    import hashlib
+    data = uploaded_file.getbuffer()
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(UPLOAD_DIR, f"{hashlib.sha256(data).hexdigest()[:16]}.jsonl")
+    if not os.path.exists(path):
+        tmp_path = f"{path}.{session_user()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    return path
+
+def submit_job(key, fn, job_state):
+    """Постановка задачи в очередь сессии; при перегрузке — предупреждение вместо запуска."""
+    from job_scheduler import SchedulerBusy
+    try:
+        job = get_scheduler().submit(key, fn, session_user())
+    except SchedulerBusy as e:
+        st.warning(f"⏳ Сервер перегружен, попробуйте позже. {e}")
+        return False
+    st.session_state['job'] = {**job_state, 'id': job.id}
+    return True
+
+def wait_for_job(job_state):
+    """
+    Ожидание задачи сессии с показом места в очереди и хода выполнения.
+
+    Returns:
+        Результат задачи или None (задача отменена, завершилась ошибкой или неизвестна).
+    """
+    scheduler = get_scheduler()
+    job = scheduler.get(job_state['id'])
+    if job is None:
+        del st.session_state['job']
+        return None
+    progress_bar = st.progress(0.0)
+    status_text = st.empty()
+    while not job.wait(0.25):
+        if job.status == 'queued':
+            status_text.text(f"⏳ В очереди: перед вами задач — {scheduler.queue_position(job)}")
+        else:
+            status_text.text(job.message)
+        progress_bar.progress(job.progress)
+    progress_bar.empty()
+    status_text.empty()
+    del st.session_state['job']
+    try:
+        # Результат забирается через планировщик: когда его заберут все сессии, он освобождается
+        return scheduler.collect(job, session_user())
+    except Exception as e:
+        st.error(f"❌ Ошибка обработки: {str(e)[:200]}")
+        return None
+
+def render_scheduler_stats():
+    """Нагрузка сервера: очереди, задержки и объединённые задачи."""
+    stats = get_scheduler().stats()
+    with st.expander("📡 Нагрузка сервера"):
+        col1, col2 = st.columns(2)
+        col1.metric("Выполняется", f"{stats['running']}/{stats['workers']}")
+        col2.metric("В очереди", stats['queued'])
+        col1.metric("Ожидание p95", f"{stats['wait_p95']:.1f} с")
+        col2.metric("Обработка p95", f"{stats['run_p95']:.1f} с")
+        st.caption(f"Задач: {stats['submitted']}, объединено: {stats['coalesced']}, "
+                   f"отклонено: {stats['rejected']}, отменено: {stats['cancelled']}, ошибок: {stats['failed']}")
+
+METHOD_NAMES = {
+    'nltk': 'NLTK Tokenizer',
+    'razdel': 'Razdel Tokenizer',
+    'nltk_snowball': 'NLTK + Snowball Stemmer'
+}
+
+# Базовая токенизация и нормализация каждого метода: методы с общей базой
+# (nltk и nltk_snowball) в режиме сравнения токенизируют корпус один раз
+METHOD_BASE = {'nltk': 'nltk', 'razdel': 'razdel', 'nltk_snowball': 'nltk'}
+METHOD_NORMALIZERS = {'nltk_snowball': snowball_stem}
+
+# Фильтры, применяемые к токенам после токенизации и нормализации
+def apply_filters(tokens, language, lowercase=True, remove_stopwords=True, min_token_length=2):
+    if lowercase:
+        tokens = [token.lower() for token in tokens]
+    if remove_stopwords:
+        stopwords = get_stopwords(language)
+        tokens = [token for token in tokens if token not in stopwords]
+    return [token for token in tokens if len(token) >= min_token_length]
+
+def run_method_group(base_method, methods, texts, language, filters, profile_memory=False):
+    """Обработка корпуса группой методов с общей базовой токенизацией (выполняется в отдельном процессе)."""
+    from memprofile import MemoryProfiler
+
+    profiler = MemoryProfiler(enabled=profile_memory).start()
+    start_time = time.time()
+    with profiler.stage(f"base:{base_method}", 'tokenize'):
+        base_tokens = [tokenize_text(text, base_method, language) for text in texts]
+    base_time = time.time() - start_time
+
+    results = {}
+    for method in methods:
+        start_time = time.time()
+        normalize_fn = METHOD_NORMALIZERS.get(method)
+        tokens_list = []
+        with profiler.stage(method, 'normalize'):
+            for tokens in base_tokens:
+                if normalize_fn:
+                    tokens = normalize_fn(tokens, language)
+                tokens = apply_filters(tokens, language, **filters)
+                if tokens:
+                    tokens_list.append(tokens)
+        with profiler.stage(method, 'metrics'):
+            metrics = compute_metrics(tokens_list)
+        elapsed = base_time + time.time() - start_time
+
+        # Полный словарь частот в основной процесс не передаём: для графиков хватает частот длин и топа
+        metrics.pop('token_counts')
+        metrics['docs_per_sec'] = len(texts) / elapsed if elapsed else 0
+        metrics['time_sec'] = elapsed
+        if profile_memory:
+            metrics['memory'] = profiler.summary(method, metrics['total_tokens'], shared=(f"base:{base_method}",))
+        results[method] = metrics
+    profiler.stop()
+    return results
+
+def compare_methods(texts, methods, language, filters, max_workers=None, profile_memory=False):
+    """
+    Параллельное сравнение нескольких методов на одном прочитанном корпусе.
+
+    Методы группируются по базовой токенизации, группы обрабатываются
+    в пуле процессов, поэтому общее время близко ко времени самой медленной группы.
+
+    Returns:
+        dict: Метод -> метрики.
+    """
+    groups = {}
+    for method in methods:
+        groups.setdefault(METHOD_BASE[method], []).append(method)
+
+    results = {}
+    with ProcessPoolExecutor(max_workers=max_workers or len(groups)) as executor:
+        futures = [executor.submit(run_method_group, base, group, texts, language, filters, profile_memory)
+                   for base, group in groups.items()]
+        for future in as_completed(futures):
+            results.update(future.result())
+    return {method: results[method] for method in methods}
+
+def run_comparison_job(texts, methods, language, filters, profile_memory, report):
+    """Задача планировщика: сравнение методов (без вызовов Streamlit)."""
+    report(0.0, "⚖️ Сравниваем методы...")
+    start_time = time.time()
+    results = compare_methods(texts, methods, language, filters, profile_memory=profile_memory)
+    return {'results': results, 'wall_time': time.time() - start_time}
+
+def process_single(texts, article_meta, method, language, filters, cache, profile_lock, report, concurrency=None):
+    """
+    Задача планировщика: обработка корпуса одним методом (без вызовов Streamlit).
+
+    Args:
+        cache (TokenCache): Кеш токенов (None — без кеша).
+        profile_lock (threading.Lock): Блокировка профилирования (None — без профилирования).
+        report (callable): report(fraction, message) — ход выполнения.
+        concurrency (callable): Сколько других задач планировщика выполняется сейчас
+            (их выделения памяти попадают в профиль, см. memprofile).
+
+    Returns:
+        dict: tokens_list, metrics, index, rollups, cache_stats ((попадания, всего) или None),
+            memory_summary и memory_records.
+    """
+    from contextlib import nullcontext
+    from memprofile import MemoryProfiler
+    from inverted_index import InvertedIndex
+    from rollups import RollupStore
+    
+    # tracemalloc общий для процесса, поэтому профилируемые задачи выполняются по одной
+    with profile_lock or nullcontext():
+        profiler = MemoryProfiler(enabled=profile_lock is not None, concurrency=concurrency).start()
+        tokens_list = []
+        doc_refs = []
+        misses = 0
+        cache_params = {'language': 'russian' if language == 'Русский' else 'english'}
+        
+        def compute(text):
+            nonlocal misses
+            misses += 1
+            return tokenize_text(text, method, language)
+        
+        with profiler.stage(method, 'tokenize'):
+            for i, text in enumerate(texts):
+                if cache:
+                    tokens = cache.get_or_compute(text, method, compute, params=cache_params)
+                else:
+                    tokens = tokenize_text(text, method, language)
+                
+                # Применение дополнительных фильтров
+                tokens = apply_filters(tokens, language, **filters)
+                
+                if tokens:
+                    tokens_list.append(tokens)
+                    doc_refs.append(i)
+                report((i + 1) / len(texts) * 0.9, f"Обработка текста {i+1}/{len(texts)}...")
+        if cache:
+            cache.flush()
+        
+        result = {'tokens_list': tokens_list, 'cache_stats': (len(texts) - misses, len(texts)) if cache else None}
+        if not tokens_list:
+            profiler.stop()
+            return result
+        
+        report(0.9, "📈 Вычисляем метрики...")
+        with profiler.stage(method, 'metrics'):
+            metrics = compute_metrics(tokens_list)
+        # Индекс для поиска по корпусу и агрегаты по дням и рубрикам
+        with profiler.stage(method, 'index'):
+            index = InvertedIndex.build(tokens_list, doc_refs)
+        with profiler.stage(method, 'rollups'):
+            rollups = RollupStore({'method': method}).add_documents(
+                tokens_list,
+                [article_meta[i][0] for i in doc_refs],
+                [article_meta[i][1] for i in doc_refs])
+        profiler.stop()
+    
+    result.update({
+        'metrics': metrics,
+        'index': index,
+        'rollups': rollups,
+        'memory_summary': profiler.summary(method, metrics['total_tokens']) if profile_lock else None,
+        'memory_records': profiler.records
+    })
+    return result
+
+def render_comparison(results, wall_time):
+    """Отображение результатов сравнения методов рядом друг с другом."""
+    import pandas as pd
+    import plotly.express as px
+    from chart_data import length_edges, length_histogram, merge_counts
+
+    st.success(f"✅ Сравнение завершено за {wall_time:.2f} с "
+               f"(сумма времени методов: {sum(r['time_sec'] for r in results.values()):.2f} с)")
+
+    summary_df = pd.DataFrame([{
+        'Метод': METHOD_NAMES.get(method, method),
+        'Словарь': metrics['vocab_size'],
+        'OOV, %': round(metrics['oov_percentage'], 2),
+        'OOV σ': round(metrics['oov_std'], 2),
+        'Токенов': metrics['total_tokens'],
+        'Средняя длина': round(metrics['avg_token_length'], 2),
+        'Документов/с': round(metrics['docs_per_sec'], 1),
+        **memory_columns(metrics.get('memory'))
+    } for method, metrics in results.items()])
+    st.dataframe(summary_df, use_container_width=True, hide_index=True)
+
+    # Общие интервалы длин для всех методов, чтобы столбцы были сопоставимы
+    edges = length_edges(merge_counts([metrics['length_counts'] for metrics in results.values()]))
+    length_df = pd.DataFrame([
+        {'Метод': METHOD_NAMES.get(method, method), 'Длина токена': label, 'Количество': count}
+        for method, metrics in results.items()
+        for label, count in zip(*length_histogram(metrics['length_counts'], edges).values())
+    ])
+    fig = px.bar(length_df, x='Длина токена', y='Количество', color='Метод', barmode='group',
+                 title="Распределение длин токенов по методам")
+    st.plotly_chart(fig, use_container_width=True)
+
+    columns = st.columns(len(results))
+    for column, (method, metrics) in zip(columns, results.items()):
+        with column:
+            st.markdown(f"**{METHOD_NAMES.get(method, method)}** — топ токенов")
+            st.dataframe(pd.DataFrame(list(metrics['token_freq'].items()), columns=['Токен', 'Частота']),
+                         use_container_width=True, hide_index=True)
+
+def memory_columns(memory):
+    """Колонки таблицы с профилем памяти метода (пусто, если профилирование выключено)."""
+    if not memory:
+        return {}
+    return {
+        'Пик памяти, МБ': round(memory['mem_peak_mb'], 1),
+        'RSS, МБ': round(memory['mem_rss_peak_mb'], 1),
+        'Байт/токен': round(memory.get('bytes_per_token', 0), 1),
+        'Места выделения': memory['mem_top_sites']
+    }
+
 # Вычисление метрик
-def compute_metrics(tokens_list, vocab, test_ratio=0.2):
-    # Разделяем данные на "известные" и "неизвестные" токены
+def compute_metrics(tokens_list, test_ratio=0.2):
+    from oov import kfold_oov
+    from chart_data import TOP_TOKENS, length_counts, mean_length
+
     all_tokens = [token for tokens in tokens_list for token in tokens]
     
     if not all_tokens:
-        return {'oov_percentage': 0, 'vocab_size': 0, 'token_freq': {}, 'token_lengths': []}
+        return {'oov_percentage': 0, 'oov_std': 0, 'oov_folds': 0, 'vocab_size': 0, 'token_freq': {},
+                'token_counts': Counter(), 'length_counts': [], 'avg_token_length': 0, 'total_tokens': 0,
+                'oov_count': 0, 'test_tokens_count': 0}
     
-    # Создаем эталонный словарь из части данных
-    split_index = int(len(all_tokens) * (1 - test_ratio))
-    train_tokens = all_tokens[:split_index]
-    test_tokens = all_tokens[split_index:]
-    
-    reference_vocab = set(train_tokens)
-    
-    # OOV считаем на тестовой части
-    oov_tokens = sum(1 for token in test_tokens if token not in reference_vocab)
-    oov_percentage = (oov_tokens / len(test_tokens)) * 100 if test_tokens else 0
+    # OOV: перекрёстная проверка по документам, k = 1 / test_ratio фолдов
+    # (документы не разрезаются между обучающей и тестовой частью)
+    oov_result = kfold_oov(tokens_list, k=round(1 / test_ratio))
     
     token_freq = Counter(all_tokens)
-    top_tokens = dict(token_freq.most_common(10))
+    top_tokens = dict(token_freq.most_common(TOP_TOKENS))
+    # Вместо длины каждого токена — частоты длин (по ним строится гистограмма)
+    lengths = length_counts(tokens_list)
     
     return {
-        'token_lengths': [len(token) for token in all_tokens],
-        'oov_percentage': oov_percentage,
+        'length_counts': lengths.tolist(),
+        'avg_token_length': mean_length(lengths),
+        'total_tokens': len(all_tokens),
+        'oov_percentage': oov_result['mean'],
+        'oov_std': oov_result['std'],
+        'oov_folds': len(oov_result['folds']),
         'token_freq': top_tokens,
-        'vocab_size': len(set(all_tokens)),
-        'oov_count': oov_tokens,
-        'test_tokens_count': len(test_tokens)
+        'token_counts': token_freq,
+        'vocab_size': len(token_freq),
+        'oov_count': oov_result['oov_count'],
+        'test_tokens_count': oov_result['test_tokens_count']
     }
 
 # Чтение корпуса
-def read_corpus(file_path):
+def read_corpus(file_path, with_meta=False):
+    """Тексты корпуса; при with_meta — ещё и пары (дата, рубрика) для каждого текста."""
+    from corpus_io import open_corpus
+
     texts = []
+    meta = []
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
+        # Сжатие (gzip, zstd, xz) определяется по содержимому файла
+        with open_corpus(file_path) as f:
             for line in f:
                 try:
                     article = json.loads(line.strip())
                     text = article.get('preprocessed_text', article.get('cleaned_text', article.get('text', '')))
                     if text:
                         texts.append(text)
+                        meta.append((article.get('date'), article.get('category')))
                 except:
                     continue
     except Exception as e:
         st.error(f"Ошибка чтения файла: {str(e)[:100]}")
-        return []
-    return texts
+        texts, meta = [], []
+    return (texts, meta) if with_meta else texts
 
 # Генерация отчёта
 def generate_report(metrics, method, language):
@@ -813,19 +1173,39 @@ def main():
         language = st.selectbox("🌐 Выберите язык", ["Русский", "Английский"])
         
         # Выбор метода обработки
-        method = st.selectbox(
-            "🔧 Метод обработки",
-            ['nltk', 'razdel', 'nltk_snowball'],
-            format_func=lambda x: {
-                'nltk': 'NLTK Tokenizer',
-                'razdel': 'Razdel Tokenizer', 
-                'nltk_snowball': 'NLTK + Snowball Stemmer'
-            }[x]
-        )
+        compare_mode = st.checkbox("⚖️ Сравнить несколько методов",
+                                   help="Выбранные методы обрабатываются параллельно на одном чтении корпуса")
+        
+        if compare_mode:
+            selected_methods = st.multiselect(
+                "🔧 Методы для сравнения",
+                list(METHOD_NAMES),
+                default=list(METHOD_NAMES),
+                format_func=lambda x: METHOD_NAMES[x]
+            )
+            method = selected_methods[0] if selected_methods else 'nltk'
+        else:
+            method = st.selectbox(
+                "🔧 Метод обработки",
+                list(METHOD_NAMES),
+                format_func=lambda x: METHOD_NAMES[x]
+            )
         
         min_token_length = 2
         remove_stopwords = True
         lowercase = True
+
+        export_format = st.selectbox("💾 Формат полного экспорта", exporters.available_formats(),
+                                     help="Формат файлов с полным частотным словарём и статистикой документов")
+
+        use_cache = st.checkbox("💾 Кешировать токенизацию", value=True,
+                                help="Повторная обработка неизменённых текстов читает токены из кеша на диске")
+
+        profile_memory = st.checkbox("🧠 Профилировать память",
+                                     help="Пик памяти, RSS, байт на токен и места выделения памяти по этапам "
+                                          "(tracemalloc замедляет обработку)")
+        
+        render_scheduler_stats()
         
         # Информация о методах
         with st.expander("ℹ️ О методах обработки"):
@@ -849,22 +1229,23 @@ def main():
             if not use_default:
                 uploaded_file = st.file_uploader(
                     "Загрузите JSONL файл", 
-                    type=["jsonl", "json", "txt"],
-                    help="Поддерживаются файлы в формате JSONL, JSON или текстовые файлы"
+                    type=["jsonl", "json", "txt", "gz", "zst", "xz"],
+                    help="Поддерживаются файлы в формате JSONL, JSON или текстовые файлы, в том числе сжатые (gzip, zstd, xz)"
                 )
                 
                 if uploaded_file:
                     with st.spinner("Сохраняем файл..."):
-                        with open("uploaded_corpus.jsonl", "wb") as f:
-                            f.write(uploaded_file.getbuffer())
+                        upload_path = save_upload(uploaded_file)
                     st.success("Файл успешно загружен!")
             
-            file_path = 'preprocessed_corpus.jsonl' if use_default else "uploaded_corpus.jsonl" if uploaded_file else None
+            file_path = 'preprocessed_corpus.jsonl' if use_default else upload_path if uploaded_file else None
+    
+    # Корпус читается один раз за проход скрипта
+    texts, article_meta = read_corpus(file_path, with_meta=True) if file_path and os.path.exists(file_path) else (None, None)
     
     with col2:
         # Статистика и информация
-        if file_path and os.path.exists(file_path):
-            texts = read_corpus(file_path)
+        if texts is not None:
             if texts:
                 st.metric("📊 Загружено текстов", len(texts))
                 avg_length = sum(len(text.split()) for text in texts) / len(texts)
@@ -875,8 +1256,7 @@ def main():
             st.info("👆 Загрузите данные для начала анализа")
     
     # Обработка данных
-    if file_path and os.path.exists(file_path):
-        texts = read_corpus(file_path)
+    if texts is not None:
         if not texts:
             st.error("❌ Не удалось загрузить данные из файла!")
             return
@@ -891,47 +1271,65 @@ def main():
                 help="Запуск анализа текстового корпуса"
             )
         
+        # Обработка выполняется общим для всех сессий планировщиком: задача ставится в очередь
+        # этой сессии, скрипт ждёт её результат (и подхватывает его после перезапуска)
+        filters = {'lowercase': lowercase, 'remove_stopwords': remove_stopwords,
+                   'min_token_length': min_token_length}
+        scheduler_stats = get_scheduler().stats()
+        if 'job' not in st.session_state and (scheduler_stats['queued'] or
+                                              scheduler_stats['running'] >= scheduler_stats['workers']):
+            st.info(f"⏳ Сервер загружен: выполняются {scheduler_stats['running']} задач, "
+                    f"ожидают {scheduler_stats['queued']}. Новая обработка встанет в очередь.")
+        
+        if process_btn and compare_mode and not selected_methods:
+            st.warning("Выберите хотя бы один метод для сравнения")
+            return
         if process_btn:
-            # Прогресс-бар и статус
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            # Обработка корпуса
-            tokens_list = []
-            vocab = set()
-            
-            for i, text in enumerate(texts):
-                status_text.text(f"Обработка текста {i+1}/{len(texts)}...")
-                
-                if method == 'nltk':
-                    tokens = nltk_tokenize(text, language)
-                elif method == 'razdel':
-                    tokens = razdel_tokenize_func(text, language)
-                elif method == 'nltk_snowball':
-                    tokens = snowball_stem(nltk_tokenize(text, language), language)
-                else:
-                    tokens = []
-                
-                # Применение дополнительных фильтров
-                if lowercase:
-                    tokens = [token.lower() for token in tokens]
-                if remove_stopwords:
-                    tokens = [token for token in tokens if token not in get_stopwords(language)]
-                tokens = [token for token in tokens if len(token) >= min_token_length]
-                
-                if tokens:
-                    tokens_list.append(tokens)
-                    vocab.update(tokens)
-                
-                progress_bar.progress((i + 1) / len(texts))
+            digest = file_digest(file_path)
+            if compare_mode:
+                job_state = {'mode': 'compare', 'methods': selected_methods}
+                fn = lambda report: run_comparison_job(texts, selected_methods, language, filters,
+                                                       profile_memory, report)
+            else:
+                job_state = {'mode': 'single', 'method': method}
+                cache = get_token_cache() if use_cache else None
+                profile_lock = get_profile_lock() if profile_memory else None
+                # Непрофилируемые задачи блокировку не берут: их число учитывается в профиле
+                scheduler = get_scheduler()
+                concurrency = lambda: scheduler.stats()['running'] - 1
+                fn = lambda report: process_single(texts, article_meta, method, language, filters,
+                                                   cache, profile_lock, report, concurrency)
+            job_state.update({'language': language, 'profile_memory': profile_memory})
+            key = json.dumps([digest, job_state, filters, use_cache], sort_keys=True, ensure_ascii=False)
+            if not submit_job(key, fn, job_state):
+                return
+        
+        job_state = st.session_state.get('job')
+        result = wait_for_job(job_state) if job_state else None
+        if result is not None and job_state['mode'] == 'compare':
+            render_comparison(result['results'], result['wall_time'])
+        elif result is not None:
+            method = job_state['method']
+            language = job_state['language']
+            profile_memory = job_state['profile_memory']
+            tokens_list = result['tokens_list']
             
+            if result['cache_stats']:
+                hits, total = result['cache_stats']
+                st.caption(f"Кеш токенов: попаданий {hits} из {total} ({hits / total if total else 0:.1%})")
             if not tokens_list:
                 st.error("❌ Ошибка обработки: токены не получены!")
                 return
+            metrics = result['metrics']
             
-            # Вычисление метрик
-            with st.spinner("📈 Вычисляем метрики..."):
-                metrics = compute_metrics(tokens_list, vocab)
+            # Индекс поиска и агрегаты по датам и рубрикам переживают перезапуски скрипта
+            st.session_state['token_index'] = {
+                'index': result['index'],
+                'method': method,
+                'lowercase': filters['lowercase'],
+                'top_tokens': list(metrics['token_freq'])
+            }
+            st.session_state['rollups'] = {'store': result['rollups'], 'method': method}
             
             st.success("✅ Обработка завершена!")
             
@@ -955,12 +1353,12 @@ def main():
                 <div class="metric-card">
                     <h3>⚠️ OOV</h3>
                     <h2>{metrics['oov_percentage']:.2f}%</h2>
-                    <p>вне словаря</p>
+                    <p>вне словаря (±{metrics['oov_std']:.2f}, {metrics['oov_folds']} фолдов)</p>
                 </div>
                 """, unsafe_allow_html=True)
             
             with col3:
-                avg_len = sum(metrics['token_lengths']) / len(metrics['token_lengths'])
+                avg_len = metrics['avg_token_length']
                 st.markdown(f"""
                 <div class="metric-card">
                     <h3>📏 Длина</h3>
@@ -970,7 +1368,7 @@ def main():
                 """, unsafe_allow_html=True)
             
             with col4:
-                total_tokens = sum(len(tokens) for tokens in tokens_list)
+                total_tokens = metrics['total_tokens']
                 st.markdown(f"""
                 <div class="metric-card">
                     <h3>🔤 Токены</h3>
@@ -979,21 +1377,45 @@ def main():
                 </div>
                 """, unsafe_allow_html=True)
             
+            import pandas as pd
+            import plotly.express as px
+            from chart_data import length_histogram
+
+            if profile_memory:
+                # Профиль памяти: итог по методу и разбивка по этапам
+                from memprofile import MB
+                st.markdown('<div class="section-header">🧠 Память</div>', unsafe_allow_html=True)
+                if result['memory_summary'].get('mem_approximate'):
+                    st.caption("⚠️ Значения приблизительные: во время замера выполнялись другие задачи, "
+                               "их выделения памяти учтены в пике и местах выделения")
+                st.dataframe(pd.DataFrame([memory_columns(result['memory_summary'])]),
+                             use_container_width=True, hide_index=True)
+                st.dataframe(pd.DataFrame([{
+                    'Этап': record['stage'],
+                    'Пик, МБ': round(record['peak_bytes'] / MB, 2),
+                    'Осталось занято, МБ': round(record['retained_bytes'] / MB, 2),
+                    'RSS, МБ': round(record['rss_peak_bytes'] / MB, 1),
+                    'Другие задачи': record['concurrent_jobs'],
+                    'Места выделения': '; '.join(site['site'] for site in record['top_sites'])
+                } for record in result['memory_records']]), use_container_width=True, hide_index=True)
+
             # Визуализация в табах
             tab1, tab2, tab3, tab4 = st.tabs(["📈 Распределения", "🔤 Частотность", "📋 Детали", "💾 Экспорт"])
             
             with tab1:
-                # Распределение длин токенов
-                fig1 = px.histogram(metrics['token_lengths'], nbins=50, 
-                                  title="Распределение длин токенов",
-                                  labels={'value': 'Длина токена', 'count': 'Количество'},
-                                  color_discrete_sequence=['#667eea'])
-                fig1.update_layout(showlegend=False)
+                # Распределение длин токенов: гистограмма посчитана заранее, в браузер уходят только столбцы
+                histogram = length_histogram(metrics['length_counts'])
+                fig1 = px.bar(x=histogram['labels'], y=histogram['counts'],
+                              title="Распределение длин токенов",
+                              labels={'x': 'Длина токена', 'y': 'Количество'},
+                              color_discrete_sequence=['#667eea'])
+                fig1.update_layout(showlegend=False, bargap=0.05)
+                fig1.update_xaxes(type='category')
                 st.plotly_chart(fig1, use_container_width=True)
             
             with tab2:
                 # Частотность токенов
-                token_freq_df = pd.DataFrame(list(metrics['token_freq'].items())[:15], 
+                token_freq_df = pd.DataFrame(list(metrics['token_freq'].items()), 
                                            columns=['Токен', 'Частота'])
                 fig2 = px.bar(token_freq_df, x='Токен', y='Частота', 
                             title="Топ-15 самых частых токенов",
@@ -1044,13 +1466,14 @@ def main():
                     )
                 
                 with col2:
-                    # JSON экспорт
+                    # JSON экспорт: сводные метрики без списка длин каждого токена и полного словаря
                     json_report = json.dumps({
-                        'metrics': metrics,
+                        'metrics': {key: value for key, value in metrics.items()
+                                    if key != 'token_counts'},
                         'method': method,
                         'language': language,
                         'timestamp': str(datetime.now())
-                    }, ensure_ascii=False, indent=2)
+                    }, ensure_ascii=False)
                     
                     st.download_button(
                         "📄 Скачать JSON данные",
@@ -1073,9 +1496,164 @@ def main():
                         help="Таблица частотности токенов в CSV формате"
                     )
                 
+                # Полный экспорт: файлы пишутся потоково во временный каталог
+                st.markdown(f"**Полный экспорт ({export_format})**")
+                with st.spinner("Готовим файлы экспорта..."):
+                    export_dir = get_export_dir()
+                    # Файлы закрытых сессий удаляются по возрасту перед каждым экспортом
+                    exporters.remove_stale(export_dir, EXPORT_MAX_AGE_SEC)
+                    freq_path = exporters.export_frequencies(metrics['token_counts'], export_format,
+                                                             directory=export_dir)
+                    docs_path = exporters.export_documents(tokens_list, export_format, directory=export_dir)
+                    replace_export_files([freq_path, docs_path])
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    render_export_download(f"📚 Весь словарь ({metrics['vocab_size']} токенов)", freq_path,
+                                           f"token_frequency_full.{export_format}", export_format)
+                with col2:
+                    render_export_download(f"📑 Статистика документов ({len(tokens_list)})", docs_path,
+                                           f"document_stats.{export_format}", export_format)
+                
                 # Предпросмотр отчета
                 with st.expander("👁️ Предпросмотр HTML отчёта", expanded=False):
                     st.components.v1.html(report_html, height=600, scrolling=True)
+        
+        # Срезы и поиск по последнему обработанному корпусу (без повторной токенизации)
+        if not compare_mode and 'rollups' in st.session_state:
+            render_rollups(st.session_state['rollups'])
+        if not compare_mode and 'token_index' in st.session_state:
+            render_search(st.session_state['token_index'])
+
+def render_rollups(state):
+    """Метрики среза корпуса по диапазону дат и рубрикам (объединение агрегатов ячеек)."""
+    import pandas as pd
+    import plotly.express as px
+    from datetime import date
+    from chart_data import length_histogram
+    
+    store = state['store']
+    days = store.days()
+    st.markdown('<div class="section-header">📅 Срезы по датам и рубрикам</div>', unsafe_allow_html=True)
+    
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        if days:
+            first, last = date.fromisoformat(days[0]), date.fromisoformat(days[-1])
+            period = st.date_input("Период", value=(first, last), min_value=first, max_value=last,
+                                   key='rollup_period')
+        else:
+            period = ()
+            st.caption("В корпусе нет статей с датой")
+    with col2:
+        categories = st.multiselect("Рубрики", store.categories(), key='rollup_categories',
+                                    help="Пусто — все рубрики")
+    with col3:
+        include_undated = st.checkbox("Статьи без даты", value=True, key='rollup_undated')
+    
+    # Пока в календаре выбран только первый день, срез — этот день
+    period = tuple(period) if isinstance(period, (tuple, list)) else (period,)
+    start = period[0].isoformat() if period else None
+    end = period[-1].isoformat() if period else None
+    
+    start_time = time.perf_counter()
+    summary = store.select(start, end, categories or None, include_undated).summary()
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+    if not summary['documents']:
+        st.info("В выбранном срезе нет документов")
+        return
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("📄 Документов", summary['documents'])
+    col2.metric("🔤 Токенов", summary['total_tokens'])
+    col3.metric("📚 Словарь ≈", summary['vocab_size'])
+    col4.metric("📏 Средняя длина", f"{summary['avg_token_length']:.1f}")
+    st.caption(f"Срез собран из {len(store.cells)} ячеек (день × рубрика) за {elapsed_ms:.1f} мс; "
+               f"размер словаря — оценка HyperLogLog"
+               + (f", частоты топ-токенов занижены не более чем на {summary['top_error']}" if summary['top_error'] else ""))
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        histogram = length_histogram(summary['length_counts'])
+        fig = px.bar(x=histogram['labels'], y=histogram['counts'], title="Распределение длин токенов",
+                     labels={'x': 'Длина токена', 'y': 'Количество'}, color_discrete_sequence=['#667eea'])
+        fig.update_layout(showlegend=False, bargap=0.05)
+        fig.update_xaxes(type='category')
+        st.plotly_chart(fig, use_container_width=True, key='rollup_lengths')
+    with col2:
+        freq_df = pd.DataFrame(list(summary['token_freq'].items()), columns=['Токен', 'Частота'])
+        fig = px.bar(freq_df, x='Токен', y='Частота', title="Топ-15 самых частых токенов",
+                     color='Частота', color_continuous_scale='Viridis')
+        st.plotly_chart(fig, use_container_width=True, key='rollup_top')
+
+def render_search(state):
+    """Поиск токена по индексу последней обработки: количество документов и фрагменты контекста."""
+    import pandas as pd
+    
+    index = state['index']
+    st.markdown('<div class="section-header">🔎 Поиск по корпусу</div>', unsafe_allow_html=True)
+    st.caption(f"Индекс метода {state['method']}: {index.num_docs} документов, {len(index.vocab)} токенов, "
+               f"{index.size_bytes() / 1024 / 1024:.1f} МБ")
+    
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        query = st.text_input("Токен или префикс", key='search_query',
+                              help="Звёздочка в конце — поиск по префиксу, например: москв*")
+    with col2:
+        top_token = st.selectbox("…или токен из топа", [''] + state['top_tokens'], key='search_top_token')
+    with col3:
+        window = st.number_input("Контекст, токенов", min_value=1, max_value=20, value=5, key='search_window')
+    
+    query = query.strip() or top_token
+    prefix = query.endswith('*')
+    query = query.rstrip('*')
+    if state['lowercase']:
+        query = query.lower()
+    if not query:
+        return
+    
+    result = index.search(query, prefix=prefix, limit=50, window=window)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("📄 Документов", result['documents'])
+    col2.metric("🔤 Вхождений", result['occurrences'])
+    col3.metric("⏱️ Поиск", f"{result['time_ms']:.1f} мс")
+    
+    if not result['snippets']:
+        st.info("Токен не найден")
+        return
+    if prefix:
+        st.dataframe(pd.DataFrame(result['tokens'], columns=['Токен', 'Вхождений', 'Документов']),
+                     use_container_width=True, hide_index=True)
+    st.dataframe(pd.DataFrame([{
+        'Текст': snippet['doc'] + 1,
+        'Левый контекст': snippet['left'],
+        'Токен': snippet['token'],
+        'Правый контекст': snippet['right']
+    } for snippet in result['snippets']]), use_container_width=True, hide_index=True)
+
+def replace_export_files(paths):
+    """Удаление временных файлов предыдущего экспорта этой сессии."""
+    for path in st.session_state.get('export_files', []):
+        if path not in paths and os.path.exists(path):
+            os.remove(path)
+    st.session_state['export_files'] = paths
+
+def render_export_download(label, path, file_name, export_format):
+    """
+    Ссылка на скачивание файла экспорта из статической раздачи.
+
+    Без server.enableStaticServing файл отдаётся через st.download_button,
+    который читает его целиком в память.
+    """
+    if st.get_option('server.enableStaticServing'):
+        import html
+        url = f"{EXPORT_URL}/{os.path.basename(path)}"
+        st.markdown(f'<a href="{html.escape(url)}" download="{html.escape(file_name)}">{html.escape(label)}</a>',
+                    unsafe_allow_html=True)
+        return
+    with open(path, 'rb') as f:
+        st.download_button(label, f, file_name=file_name, mime=exporters.EXPORT_FORMATS[export_format],
+                           use_container_width=True)
 
 def get_stopwords(language):
     """Получение стоп-слов для указанного языка"""
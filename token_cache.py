@@ -0,0 +1,284 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from importlib import metadata
+
+# Постоянный кеш результатов токенизации и нормализации.
+#
+# Общий для tokenization.run_experiment и text_processing_app: ключ записи — хеш текста,
+# название метода, его параметры и версии библиотек. Токены хранятся компактно —
+# массивом идентификаторов (uint32) в общем словаре. При превышении лимита размера
+# вытесняются давно не использованные записи.
+#
+# Кешем могут одновременно пользоваться несколько процессов. Размер кеша пересчитывается
+# в транзакции записи, а словарь чистится от токенов, на которые не ссылается ни одна запись;
+# после чистки увеличивается поколение словаря (таблица meta), и остальные процессы
+# перечитывают словарь в следующей транзакции (чтения или записи).
+#
+# Попадания и промахи кеш не считает: экземпляр общий для сессий приложения,
+# счётчики ведут вызывающие (см. get_or_compute).
+
+DEFAULT_CACHE_PATH = 'token_cache.sqlite'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+_LIBRARIES = ['nltk', 'razdel', 'spacy', 'pymorphy2']
+
+def library_versions(libraries=_LIBRARIES):
+    """Версии библиотек токенизации (отсутствующие помечаются как 'n/a')."""
+    versions = {}
+    for name in libraries:
+        try:
+            versions[name] = metadata.version(name)
+        except metadata.PackageNotFoundError:
+            versions[name] = 'n/a'
+    return versions
+
+class TokenCache:
+    """
+    Кеш токенов на диске (SQLite).
+
+    Чтение не блокирует других: запись и словарь читаются в одном снимке базы
+    (отложенная транзакция). Новые записи и время последнего обращения копятся
+    в памяти и записываются пачкой в короткой транзакции записи (BEGIN IMMEDIATE),
+    поэтому блокировка записи не удерживается между вызовами.
+
+    Args:
+        path (str): Путь к файлу кеша.
+        max_bytes (int): Максимальный суммарный размер сохранённых токенов.
+        commit_every (int): Количество новых записей (или обращений) между записями пачки.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES, commit_every=500):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.commit_every = commit_every
+        self._versions = json.dumps(library_versions(), sort_keys=True)
+        self._lock = threading.Lock()
+        # Ещё не записанные в базу новые записи (ключ -> токены) и обращения (ключ -> время)
+        self._puts = {}
+        self._touched = {}
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vocab (id INTEGER PRIMARY KEY, token TEXT UNIQUE NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, ids BLOB NOT NULL, "
+                           "size INTEGER NOT NULL, last_access REAL NOT NULL)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+        self._token_to_id = {}
+        self._id_to_token = {}
+        self._loaded_id = 0
+        self._vocab_generation = self._read_meta('vocab_generation')
+        self._load_vocab()
+
+    def _read_meta(self, key, default=0):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _write_meta(self, key, value):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _read_total_bytes(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _load_vocab(self):
+        # Дочитываем словарь: его могли пополнить другие процессы, работающие с тем же кешем.
+        # Граница — последний прочитанный из базы идентификатор, а не наибольший известный:
+        # собственные токены могли получить идентификаторы после токенов других процессов
+        for token_id, token in self._conn.execute("SELECT id, token FROM vocab WHERE id > ?", (self._loaded_id,)):
+            self._token_to_id[token] = token_id
+            self._id_to_token[token_id] = token
+            self._loaded_id = max(self._loaded_id, token_id)
+
+    def _check_vocab(self):
+        # Вызывается внутри транзакции: словарь в памяти соответствует её снимку базы
+        generation = self._read_meta('vocab_generation')
+        if generation != self._vocab_generation:
+            # Словарь почистил другой процесс: идентификаторы удалённых токенов могли переиспользоваться
+            self._token_to_id.clear()
+            self._id_to_token.clear()
+            self._loaded_id = 0
+            self._load_vocab()
+            self._vocab_generation = generation
+
+    def make_key(self, text, method, params=None):
+        """Ключ записи: хеш текста + метод + параметры + версии библиотек."""
+        h = hashlib.sha1(text.encode('utf-8'))
+        h.update(b'\0' + method.encode('utf-8'))
+        h.update(b'\0' + json.dumps(params or {}, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        h.update(b'\0' + self._versions.encode('utf-8'))
+        return h.hexdigest()
+
+    def _token_id(self, token):
+        token_id = self._token_to_id.get(token)
+        if token_id is None:
+            self._conn.execute("INSERT OR IGNORE INTO vocab (token) VALUES (?)", (token,))
+            token_id = self._conn.execute("SELECT id FROM vocab WHERE token = ?", (token,)).fetchone()[0]
+            self._token_to_id[token] = token_id
+            self._id_to_token[token_id] = token
+        return token_id
+
+    def _encode(self, tokens):
+        return array('I', [self._token_id(token) for token in tokens]).tobytes()
+
+    def _decode(self, blob):
+        ids = array('I')
+        ids.frombytes(blob)
+        id_to_token = self._id_to_token
+        try:
+            return [id_to_token[token_id] for token_id in ids]
+        except KeyError:
+            self._load_vocab()
+            return [id_to_token[token_id] for token_id in ids]
+
+    def get(self, text, method, params=None):
+        """Токены из кеша или None, если записи нет."""
+        key = self.make_key(text, method, params)
+        with self._lock:
+            tokens = self._puts.get(key)
+            if tokens is not None:
+                return list(tokens)
+            # Отложенная транзакция только читает: другие процессы могут читать и писать одновременно
+            self._conn.execute("BEGIN")
+            try:
+                self._check_vocab()
+                row = self._conn.execute("SELECT ids FROM entries WHERE key = ?", (key,)).fetchone()
+                tokens = self._decode(row[0]) if row is not None else None
+            finally:
+                self._conn.commit()
+            if tokens is not None:
+                self._touched[key] = time.time()
+                if len(self._touched) >= self.commit_every:
+                    self._write_pending()
+            return tokens
+
+    def put(self, text, method, tokens, params=None):
+        """Сохранение токенов в кеш (запись в базу — пачкой, см. commit_every)."""
+        key = self.make_key(text, method, params)
+        with self._lock:
+            self._puts[key] = list(tokens)
+            if len(self._puts) >= self.commit_every:
+                self._write_pending()
+
+    def _write_pending(self):
+        if not self._puts and not self._touched:
+            return
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._check_vocab()
+            now = time.time()
+            self._conn.executemany("INSERT OR REPLACE INTO entries (key, ids, size, last_access) VALUES (?, ?, ?, ?)",
+                                   [(key, blob, len(blob), now)
+                                    for key, blob in ((key, self._encode(tokens)) for key, tokens in self._puts.items())])
+            self._conn.executemany("UPDATE entries SET last_access = ? WHERE key = ?",
+                                   [(last_access, key) for key, last_access in self._touched.items()])
+            # Размер считается в транзакции записи: кеш пополняют и другие процессы
+            total_bytes = self._read_total_bytes()
+            if total_bytes > self.max_bytes:
+                self._evict(total_bytes)
+            self._conn.commit()
+        except BaseException:
+            self._conn.rollback()
+            raise
+        self._puts.clear()
+        self._touched.clear()
+
+    def get_or_compute(self, text, method, compute_fn, params=None):
+        """
+        Токены из кеша, а при промахе — результат compute_fn(text), который сохраняется в кеш.
+        Промахи вызывающий считает сам — по вызовам compute_fn.
+
+        Args:
+            text (str): Исходный текст.
+            method (str): Название метода токенизации/нормализации.
+            compute_fn (callable): Функция text -> список токенов.
+            params (dict): Параметры метода, влияющие на результат.
+
+        Returns:
+            list: Список токенов.
+        """
+        tokens = self.get(text, method, params)
+        if tokens is None:
+            tokens = compute_fn(text)
+            self.put(text, method, tokens, params)
+        return tokens
+
+    def _evict(self, total_bytes):
+        # Вытесняем самые старые записи, пока размер не опустится до 90% лимита
+        target = self.max_bytes * 0.9
+        rows = self._conn.execute("SELECT key, size FROM entries ORDER BY last_access")
+        to_delete = []
+        for key, size in rows:
+            if total_bytes <= target:
+                break
+            to_delete.append((key,))
+            total_bytes -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", to_delete)
+        # Словарь чистится, когда вырос вдвое с прошлой чистки: для неё читаются все записи
+        if len(self._id_to_token) > 2 * self._read_meta('vocab_pruned_size'):
+            self._prune_vocab()
+
+    def _prune_vocab(self):
+        used = set()
+        for (blob,) in self._conn.execute("SELECT ids FROM entries"):
+            ids = array('I')
+            ids.frombytes(blob)
+            used.update(ids)
+        self._load_vocab()
+        unused = [token_id for token_id in self._id_to_token if token_id not in used]
+        self._conn.executemany("DELETE FROM vocab WHERE id = ?", [(token_id,) for token_id in unused])
+        for token_id in unused:
+            del self._token_to_id[self._id_to_token.pop(token_id)]
+        self._vocab_generation += 1
+        self._write_meta('vocab_generation', self._vocab_generation)
+        self._write_meta('vocab_pruned_size', len(self._id_to_token))
+        return len(unused)
+
+    def prune_vocab(self):
+        """
+        Удаление из словаря токенов, на которые не ссылается ни одна запись.
+
+        Returns:
+            int: Количество удалённых токенов.
+        """
+        with self._lock:
+            self._write_pending()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._check_vocab()
+                removed = self._prune_vocab()
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return removed
+
+    def stats(self):
+        """Статистика кеша: количество записей, размер словаря и размер токенов (записанных в базу)."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            vocab_size = self._conn.execute("SELECT COUNT(*) FROM vocab").fetchone()[0]
+            size_bytes = self._read_total_bytes()
+        return {
+            'entries': entries,
+            'vocab_size': vocab_size,
+            'size_bytes': size_bytes
+        }
+
+    def flush(self):
+        """Запись накопленных изменений в базу."""
+        with self._lock:
+            self._write_pending()
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,864 @@
+import os
+import json
+import time
+import re
+import csv
+from array import array
+from collections import Counter
+from nltk.tokenize import word_tokenize
+import nltk
+from razdel import tokenize as razdel_tokenize
+import spacy
+from nltk.stem import PorterStemmer, SnowballStemmer
+import subprocess
+import gzip
+import zlib
+from oov import kfold_oov, time_split_oov, StreamingKFoldOOV, fold_for_offset
+import similarity
+import sampling
+import memprofile
+from corpus_io import open_corpus
+import lemma_table
+
+# Попытка установки модели spaCy
+def ensure_spacy_model():
+    try:
+        spacy_nlp = spacy.load('ru_core_news_sm', disable=['parser', 'ner'])
+        print("Модель ru_core_news_sm загружена")
+        return spacy_nlp
+    except OSError:
+        print("Модель ru_core_news_sm не найдена, пытаемся установить...")
+        try:
+            subprocess.run(["python", "-m", "spacy", "download", "ru_core_news_sm"], check=True)
+            spacy_nlp = spacy.load('ru_core_news_sm', disable=['parser', 'ner'])
+            print("Модель ru_core_news_sm успешно установлена")
+            return spacy_nlp
+        except Exception as e:
+            print(f"Не удалось установить ru_core_news_sm: {str(e)[:100]}")
+            return None
+
+# Попытка инициализации pymorphy2
+def ensure_pymorphy():
+    try:
+        from pymorphy2 import MorphAnalyzer
+        morph = MorphAnalyzer()
+        print("pymorphy2 успешно инициализирован")
+        return morph
+    except Exception as e:
+        print(f"Не удалось инициализировать pymorphy2: {str(e)[:100]}")
+        return None
+
+# Загрузка ресурсов NLTK
+def ensure_nltk_resources():
+    try:
+        nltk.data.find('tokenizers/punkt_tab')
+    except LookupError:
+        print("Загружаем необходимые ресурсы NLTK...")
+        nltk.download('punkt_tab')
+
+ensure_nltk_resources()
+
+# Инициализация инструментов (с замером памяти, занятой моделями)
+with memprofile.measure_rss() as _spacy_memory:
+    spacy_nlp = ensure_spacy_model()
+with memprofile.measure_rss() as _pymorphy_memory:
+    # С таблицей лемм (lemma_table.py build) MorphAnalyzer создаётся только при первом промахе
+    lemmatizer = lemma_table.open_lemmatizer(lemma_table.DEFAULT_TABLE_PATH, ensure_pymorphy)
+    if lemmatizer.table is None:
+        lemmatizer.preload()
+MODEL_MEMORY = {'spacy': _spacy_memory['rss_bytes'], 'pymorphy2': _pymorphy_memory['rss_bytes']}
+# Модель, которую использует метод (для колонки model_rss_mb)
+METHOD_MODELS = {'spacy': 'spacy', 'spacy_lem': 'spacy', 'nltk_pymorphy': 'pymorphy2'}
+snowball = SnowballStemmer('russian')
+porter = PorterStemmer()
+
+def naive_tokenize(text):
+    return [t for t in text.split() if t.strip()]
+
+def regex_tokenize(text):
+    return [t for t in re.findall(r'\b\w+\b', text) if t.strip()]
+
+def nltk_tokenize(text):
+    try:
+        return [t for t in word_tokenize(text, language='russian') if t.strip()]
+    except Exception:
+        return []
+
+def spacy_tokenize(text):
+    if spacy_nlp is None:
+        return []
+    doc = spacy_nlp(text)
+    return [token.text for token in doc if token.text.strip()]
+
+def razdel_tokenize_text(text):
+    return [t.text for t in razdel_tokenize(text) if t.text.strip()]
+
+def porter_stem(tokens):
+    return [porter.stem(token) for token in tokens]
+
+#Стемминг с использованием SnowballStemmer
+def snowball_stem(tokens):
+    return [snowball.stem(token) for token in tokens]
+
+def pymorphy_lemmatize(tokens):
+    if not lemmatizer.available:
+        return tokens
+    return lemmatizer.lemmatize(tokens)
+
+def configure_lemmatizer(path=lemma_table.DEFAULT_TABLE_PATH, learn=False):
+    """Замена таблицы лемм (и режима дозаписи промахов) для pymorphy_lemmatize и nltk_pymorphy."""
+    global lemmatizer
+    lemmatizer = lemma_table.open_lemmatizer(path, ensure_pymorphy, learn=learn)
+    return lemmatizer
+
+def spacy_lemmatize(tokens):
+    if spacy_nlp is None:
+        return tokens
+    doc = spacy_nlp(' '.join(tokens))
+    return [token.lemma_ for token in doc]
+
+# Пакетная токенизация
+
+# \w+ даёт те же токены, что и \b\w+\b: максимальная последовательность \w всегда ограничена границами слова
+_WORD_RE = re.compile(r'\w+')
+
+_punkt_tokenizer = None
+_treebank_tokenizer = None
+
+def _nltk_tokenizers():
+    """Однократно созданные Punkt (русская модель) и Treebank-токенизаторы NLTK."""
+    global _punkt_tokenizer, _treebank_tokenizer
+    if _punkt_tokenizer is None:
+        from nltk.tokenize import NLTKWordTokenizer
+        try:
+            from nltk.tokenize import PunktTokenizer
+            _punkt_tokenizer = PunktTokenizer('russian')
+        except ImportError:
+            _punkt_tokenizer = nltk.data.load('tokenizers/punkt/russian.pickle')
+        _treebank_tokenizer = NLTKWordTokenizer()
+    return _punkt_tokenizer, _treebank_tokenizer
+
+class TokenBatch:
+    """
+    Компактное представление токенов пакета документов.
+
+    Attributes:
+        vocab (list): Словарь пакета (id -> токен).
+        ids (array): Идентификаторы токенов всех документов подряд.
+        offsets (array): Границы документов: токены документа i — ids[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self):
+        self.vocab = []
+        self.ids = array('I')
+        self.offsets = array('Q', [0])
+        self._index = {}
+
+    def add(self, tokens):
+        index = self._index
+        vocab = self.vocab
+        for token in tokens:
+            token_id = index.get(token)
+            if token_id is None:
+                token_id = index[token] = len(vocab)
+                vocab.append(token)
+            self.ids.append(token_id)
+        self.offsets.append(len(self.ids))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def doc(self, i):
+        vocab = self.vocab
+        return [vocab[token_id] for token_id in self.ids[self.offsets[i]:self.offsets[i + 1]]]
+
+    def to_lists(self):
+        return [self.doc(i) for i in range(len(self))]
+
+def _naive_batch(texts):
+    return [text.split() for text in texts]
+
+def _regex_batch(texts):
+    findall = _WORD_RE.findall
+    return [findall(text) for text in texts]
+
+def _nltk_batch(texts):
+    # Punkt и Treebank создаются один раз, а не при каждом вызове word_tokenize
+    punkt, treebank = _nltk_tokenizers()
+    tokenize_sentence = treebank.tokenize
+    result = []
+    for text in texts:
+        # Как и в nltk_tokenize: ошибка на одном документе не прерывает пакет
+        try:
+            result.append([t for sent in punkt.tokenize(text) for t in tokenize_sentence(sent) if t.strip()])
+        except Exception:
+            result.append([])
+    return result
+
+def _razdel_batch(texts):
+    # razdel не возвращает пробельных токенов, дополнительная фильтрация не нужна
+    return [[t.text for t in razdel_tokenize(text)] for text in texts]
+
+def _spacy_batch(texts, batch_size=64):
+    if spacy_nlp is None:
+        return [[] for _ in texts]
+    return [[token.text for token in doc if token.text.strip()] for doc in spacy_nlp.pipe(texts, batch_size=batch_size)]
+
+def _memoized(fn):
+    # Стемминг и лемматизация зависят только от токена: считаем каждый уникальный токен один раз
+    def apply(tokens_list):
+        memo = {}
+        result = []
+        for tokens in tokens_list:
+            normalized = []
+            for token in tokens:
+                value = memo.get(token)
+                if value is None:
+                    value = memo[token] = fn(token)
+                normalized.append(value)
+            result.append(normalized)
+        return result
+    return apply
+
+def _spacy_lemmatize_batch(tokens_list, batch_size=64):
+    if spacy_nlp is None:
+        return tokens_list
+    docs = spacy_nlp.pipe((' '.join(tokens) for tokens in tokens_list), batch_size=batch_size)
+    return [[token.lemma_ for token in doc] for doc in docs]
+
+def _pymorphy_normal_form(token):
+    return lemmatizer.normal_form(token)
+
+BATCH_TOKENIZERS = {
+    'naive': _naive_batch,
+    'regex': _regex_batch,
+    'nltk': _nltk_batch,
+    'razdel': _razdel_batch,
+    'spacy': _spacy_batch
+}
+
+BATCH_METHODS = {
+    'naive': ('naive', None),
+    'regex': ('regex', None),
+    'nltk': ('nltk', None),
+    'razdel': ('razdel', None),
+    'spacy': ('spacy', None),
+    'nltk_porter': ('nltk', _memoized(lambda token: porter.stem(token))),
+    'nltk_snowball': ('nltk', _memoized(lambda token: snowball.stem(token))),
+    'nltk_pymorphy': ('nltk', lambda tokens_list: (_memoized(_pymorphy_normal_form)(tokens_list)
+                                                   if lemmatizer.available else tokens_list)),
+    'spacy_lem': ('spacy', _spacy_lemmatize_batch)
+}
+
+# Бэкенды без моделей в памяти, которые можно распараллелить по процессам
+_PARALLEL_TOKENIZERS = {'naive', 'regex', 'nltk', 'razdel'}
+
+def _tokenize_chunk(tokenizer_name, texts):
+    return BATCH_TOKENIZERS[tokenizer_name](texts)
+
+def tokenize_batch(texts, method, output='lists', workers=1, chunk_size=256, executor=None):
+    """
+    Токенизация (и нормализация) пакета текстов.
+
+    Результат совпадает с поэлементным применением функций run_experiment,
+    но каждый бэкенд обрабатывает пакет целиком: токенизаторы NLTK создаются
+    один раз, spaCy получает тексты через nlp.pipe, стемминг и лемматизация
+    выполняются один раз на уникальный токен. При workers > 1 пакет делится
+    на части, которые токенизируются в пуле процессов.
+
+    Args:
+        texts (list): Список текстов.
+        method (str): Название метода (ключ BATCH_METHODS).
+        output (str): 'lists' — список списков токенов, 'ids' — TokenBatch.
+        workers (int): Количество процессов для naive, regex, nltk и razdel.
+        chunk_size (int): Количество документов в части при workers > 1.
+        executor (ProcessPoolExecutor): Готовый пул процессов для повторных вызовов
+            (иначе при workers > 1 пул создаётся на время вызова).
+
+    Returns:
+        list | TokenBatch: Токены документов.
+    """
+    if method not in BATCH_METHODS:
+        raise ValueError(f"Неизвестный метод: {method}")
+    texts = list(texts)
+    tokenizer_name, normalize_fn = BATCH_METHODS[method]
+    if (workers > 1 or executor is not None) and tokenizer_name in _PARALLEL_TOKENIZERS and len(texts) > chunk_size:
+        chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+        if executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parts = list(pool.map(_tokenize_chunk, [tokenizer_name] * len(chunks), chunks))
+        else:
+            parts = list(executor.map(_tokenize_chunk, [tokenizer_name] * len(chunks), chunks))
+        tokens_list = [tokens for part in parts for tokens in part]
+    else:
+        tokens_list = BATCH_TOKENIZERS[tokenizer_name](texts)
+    if normalize_fn:
+        tokens_list = normalize_fn(tokens_list)
+    if output == 'lists':
+        return tokens_list
+    if output == 'ids':
+        batch = TokenBatch()
+        for tokens in tokens_list:
+            batch.add(tokens)
+        return batch
+    raise ValueError(f"Неизвестный формат результата: {output}")
+
+def benchmark_batch(texts, methods=('naive', 'regex', 'nltk', 'razdel', 'nltk_snowball'), workers=1):
+    """Сравнение скорости (документов в секунду): поэлементная обработка против tokenize_batch."""
+    per_text = {
+        'naive': naive_tokenize,
+        'regex': regex_tokenize,
+        'nltk': nltk_tokenize,
+        'razdel': razdel_tokenize_text,
+        'spacy': spacy_tokenize,
+        'nltk_porter': lambda text: porter_stem(nltk_tokenize(text)),
+        'nltk_snowball': lambda text: snowball_stem(nltk_tokenize(text)),
+        'nltk_pymorphy': lambda text: pymorphy_lemmatize(nltk_tokenize(text)),
+        'spacy_lem': lambda text: spacy_lemmatize(spacy_tokenize(text))
+    }
+    results = []
+    for method in methods:
+        start_time = time.time()
+        for text in texts:
+            per_text[method](text)
+        loop_time = time.time() - start_time
+
+        start_time = time.time()
+        tokenize_batch(texts, method, workers=workers)
+        batch_time = time.time() - start_time
+
+        results.append({
+            'method': method,
+            'loop_docs_per_sec': len(texts) / loop_time if loop_time else float('inf'),
+            'batch_docs_per_sec': len(texts) / batch_time if batch_time else float('inf')
+        })
+        print(f"{method}: {results[-1]['loop_docs_per_sec']:.0f} -> {results[-1]['batch_docs_per_sec']:.0f} док/с")
+    return results
+
+#Вычисление косинусного сходства эмбеддингов
+def compute_cosine_similarity(original_text, processed_tokens, backend='transformer'):
+    processed_text = ' '.join(processed_tokens)
+    if not processed_text or not original_text:
+        return 0.0
+    return similarity.get_backend(backend).score(original_text, processed_text)
+
+#Чтение корпуса и извлечение текстов"""
+def iter_records(input_file='preprocessed_corpus.jsonl'):
+    """
+    Потоковое чтение текстов корпуса (JSONL или каталог колоночного корпуса).
+
+    Yields:
+        tuple: (номер записи в корпусе, текст); номер считается по всем строкам файла,
+            поэтому не зависит от того, какие записи пропущены.
+    """
+    # Колоночный корпус: читается только одна текстовая колонка
+    if os.path.isdir(input_file):
+        import corpus_store
+        yield from corpus_store.iter_texts(input_file, with_offsets=True)
+        return
+    with open_corpus(input_file) as f:
+        for offset, line in enumerate(f):
+            try:
+                article = json.loads(line.strip())
+                text = article.get('preprocessed_text', article.get('cleaned_text', article.get('text', '')))
+            except:
+                continue
+            if text:
+                yield offset, text
+
+def iter_corpus(input_file='preprocessed_corpus.jsonl'):
+    """Потоковое чтение текстов корпуса (JSONL или каталог колоночного корпуса)."""
+    for _, text in iter_records(input_file):
+        yield text
+
+def process_corpus(input_file='preprocessed_corpus.jsonl'):
+    return list(iter_corpus(input_file))
+
+def _apply_method(text, tokenize_fn, normalize_fn):
+    tokens = tokenize_fn(text)
+    if normalize_fn:
+        tokens = normalize_fn(tokens)
+    return tokens
+
+def experiment_methods():
+    """Методы эксперимента: (название, токенизатор, нормализатор или None)."""
+    methods = [
+        ('naive', naive_tokenize, None),
+        ('regex', regex_tokenize, None),
+        ('nltk', nltk_tokenize, None),
+        ('razdel', razdel_tokenize_text, None),
+        ('nltk_porter', nltk_tokenize, porter_stem),
+        ('nltk_snowball', nltk_tokenize, snowball_stem)
+    ]
+    if spacy_nlp:
+        methods.extend([
+            ('spacy', spacy_tokenize, None),
+            ('spacy_lem', spacy_tokenize, spacy_lemmatize)
+        ])
+    if lemmatizer.available:
+        methods.append(('nltk_pymorphy', nltk_tokenize, pymorphy_lemmatize))
+    else:
+        print("Пропущен метод nltk_pymorphy из-за проблем с pymorphy2")
+    return methods
+
+def _cache_params(method_name):
+    # Леммы nltk_pymorphy берутся из таблицы: после пересборки или compact записи кеша устаревают
+    params = {'language': 'russian'}
+    if method_name == 'nltk_pymorphy':
+        params['lemma_table'] = lemmatizer.version
+    return params
+
+def run_experiment(texts, cache=None, dates=None, oov_folds=5, similarity_backend='transformer',
+                   strata=None, similarity_ci=0.02, similarity_budget=30.0, similarity_max_samples=None,
+                   profile_memory=False):
+    methods = experiment_methods()
+    backend = similarity.fit_backend(similarity_backend, texts)
+    # Сходство оценивается по стратифицированной выборке: по датам, если они известны, иначе по длине текста
+    if strata is None:
+        strata = sampling.date_strata(dates) if dates is not None else sampling.length_strata(texts)
+
+    # Профилирование памяти по этапам (tokenize, oov, similarity) включается явно: tracemalloc замедляет работу
+    profiler = memprofile.MemoryProfiler(enabled=profile_memory)
+    profiler.start()
+
+    results = []
+
+    for method_name, tokenize_fn, normalize_fn in methods:
+        print(f"Обработка методом: {method_name}")
+        start_time = time.time()
+        tokens_list = []
+        total_tokens = 0
+        misses = 0
+        cache_params = _cache_params(method_name)
+
+        def compute(text):
+            nonlocal misses
+            misses += 1
+            return _apply_method(text, tokenize_fn, normalize_fn)
+
+        with profiler.stage(method_name, 'tokenize'):
+            for text in texts:
+                if cache:
+                    tokens = cache.get_or_compute(text, method_name, compute, params=cache_params)
+                else:
+                    tokens = _apply_method(text, tokenize_fn, normalize_fn)
+                tokens_list.append(tokens)
+                total_tokens += len(tokens)
+
+        with profiler.stage(method_name, 'oov'):
+            vocab_size = len(set(token for tokens in tokens_list for token in tokens))
+
+            # OOV по документам: k-fold и, если известны даты, разбиение по времени
+            oov_result = kfold_oov(tokens_list, k=oov_folds)
+
+        processing_time = time.time() - start_time
+        time_per_1000 = (processing_time / len(texts)) * 1000 if texts else 0.0
+
+        with profiler.stage(method_name, 'similarity'):
+            similarity_result = sampling.estimate_metric(
+                lambda indices: backend.similarity([texts[i] for i in indices],
+                                                   [' '.join(tokens_list[i]) for i in indices]),
+                len(texts), strata=strata, ci_width=similarity_ci, time_budget=similarity_budget,
+                max_samples=similarity_max_samples
+            )
+        print(f"Сходство: {similarity_result['estimate']:.3f} "
+              f"[{similarity_result['ci_low']:.3f}; {similarity_result['ci_high']:.3f}], "
+              f"выборка {similarity_result['samples']} из {len(texts)} ({similarity_result['stopped_by']})")
+
+        result = {
+            'method': method_name,
+            'vocab_size': vocab_size,
+            'total_tokens': total_tokens,
+            'avg_similarity': similarity_result['estimate'],
+            'similarity_ci_low': similarity_result['ci_low'],
+            'similarity_ci_high': similarity_result['ci_high'],
+            'similarity_samples': similarity_result['samples'],
+            'similarity_time_sec': similarity_result['time_sec'],
+            'time_per_1000_articles': time_per_1000,
+            'oov_percentage': oov_result['mean'],
+            'oov_std': oov_result['std']
+        }
+        if dates is not None:
+            time_result = time_split_oov(tokens_list, dates, k=oov_folds)
+            result['oov_time_percentage'] = time_result['mean']
+            result['oov_time_std'] = time_result['std']
+        if cache:
+            hits = len(texts) - misses
+            result['cache_hit_rate'] = hits / len(texts) if texts else 0.0
+            print(f"Кеш токенов: попаданий {hits}, промахов {misses} ({result['cache_hit_rate']:.1%})")
+        if profile_memory:
+            model = METHOD_MODELS.get(method_name)
+            result.update(profiler.summary(method_name, total_tokens, MODEL_MEMORY[model] if model else 0))
+            print(f"Память: пик {result['mem_peak_mb']:.1f} МБ, RSS {result['mem_rss_peak_mb']:.1f} МБ")
+        results.append(result)
+
+    profiler.stop()
+    if cache:
+        cache.flush()
+
+    return results
+
+def run_experiment_streaming(texts, cache=None, oov_folds=5, report_every=1000, similarity_docs=10,
+                             similarity_backend='transformer'):
+    """
+    Потоковый вариант run_experiment с памятью, не зависящей от размера корпуса.
+
+    Каждый документ читается из texts один раз и сразу обрабатывается всеми
+    методами; токены учитываются в счётчиках метода (словарь, OOV по фолдам)
+    и отбрасываются. Память пропорциональна размерам словарей методов.
+
+    Args:
+        texts (iterable): Тексты корпуса, например iter_corpus(path).
+        cache (TokenCache): Кеш токенов (необязательно).
+        oov_folds (int): Количество фолдов для оценки OOV.
+        report_every (int): Через сколько документов выдавать промежуточные строки (0 — только итог).
+        similarity_docs (int): По скольким первым документам считать косинусное сходство (None — по всем).
+        similarity_backend (str): Бэкенд сходства (см. similarity.BACKENDS).
+
+    Yields:
+        dict: Строка результатов метода; у промежуточных строк partial=True,
+            у итоговых (после исчерпания texts) — partial=False.
+    """
+    methods = experiment_methods()
+    states = {
+        method_name: {
+            'oov': StreamingKFoldOOV(k=oov_folds),
+            'total_tokens': 0,
+            'similarity_sum': 0.0,
+            'similarity_count': 0,
+            'time': 0.0,
+            'cache_hits': 0,
+            'cache_params': _cache_params(method_name)
+        }
+        for method_name, _, _ in methods
+    }
+
+    def rows(documents, partial):
+        for method_name, _, _ in methods:
+            state = states[method_name]
+            oov_result = state['oov'].result()
+            row = {
+                'method': method_name,
+                'documents': documents,
+                'vocab_size': state['oov'].vocab_size,
+                'total_tokens': state['total_tokens'],
+                'avg_similarity': state['similarity_sum'] / state['similarity_count'] if state['similarity_count'] else 0.0,
+                'time_per_1000_articles': state['time'] / documents * 1000 if documents else 0.0,
+                'oov_percentage': oov_result['mean'],
+                'oov_std': oov_result['std'],
+                'partial': partial
+            }
+            if cache:
+                row['cache_hit_rate'] = state['cache_hits'] / documents if documents else 0.0
+            yield row
+
+    documents = 0
+    for text in texts:
+        documents += 1
+        for method_name, tokenize_fn, normalize_fn in methods:
+            state = states[method_name]
+            start_time = time.time()
+            tokens = cache.get(text, method_name, state['cache_params']) if cache else None
+            if tokens is None:
+                tokens = _apply_method(text, tokenize_fn, normalize_fn)
+                if cache:
+                    cache.put(text, method_name, tokens, state['cache_params'])
+            else:
+                state['cache_hits'] += 1
+            state['total_tokens'] += len(tokens)
+            state['oov'].add(tokens)
+            state['time'] += time.time() - start_time
+
+            if similarity_docs is None or documents <= similarity_docs:
+                state['similarity_sum'] += compute_cosine_similarity(text, tokens, similarity_backend)
+                state['similarity_count'] += 1
+
+        if report_every and documents % report_every == 0:
+            print(f"Обработано документов: {documents}")
+            yield from rows(documents, True)
+
+    if cache:
+        cache.flush()
+    yield from rows(documents, False)
+
+def similarity_backend_report(texts, backends=tuple(similarity.BACKENDS), num_docs=50, reference='transformer'):
+    """
+    Сравнение бэкендов сходства на парах (исходный текст, результат метода).
+
+    Пары берутся по всем методам эксперимента для первых num_docs текстов, чтобы
+    в выборке были и мягкие, и сильные нормализации.
+
+    Returns:
+        list: Строки отчёта similarity.compare_backends (скорость и корреляция с эталоном).
+    """
+    originals = []
+    processed = []
+    for method_name, tokenize_fn, normalize_fn in experiment_methods():
+        for text in texts[:num_docs]:
+            originals.append(text)
+            processed.append(' '.join(_apply_method(text, tokenize_fn, normalize_fn)))
+    return similarity.compare_backends(originals, processed, backends, reference=reference, fit_texts=texts)
+
+# Распределённый запуск эксперимента
+#
+# Корпус делится на части (шарды) по номеру записи: шард i из n содержит записи с
+# offset % n == i. Каждый шард сохраняет объединяемое состояние по методам —
+# счётчики, состояние OOV (маска фолдов и частота каждого токена, фолд определяется
+# номером записи) и суммы по выборке для сходства — в файл shard-i-of-n.json.gz.
+# Команда merge складывает состояния шардов и строит итоговую таблицу.
+
+SHARD_FORMAT_VERSION = 1
+
+def parse_shard(value):
+    """Разбор строки вида 'i/n'."""
+    index, count = (int(part) for part in value.split('/'))
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Некорректный шард: {value}")
+    return index, count
+
+def _in_similarity_sample(offset, rate, seed=0):
+    # Выборка для сходства детерминирована номером записи: одни и те же документы для всех методов и машин
+    return zlib.crc32(f"{seed}:{offset}".encode('ascii')) < rate * 2 ** 32
+
+def run_shard(input_file, shard=(0, 1), methods=None, workers=1, oov_folds=5, chunk_size=1000,
+              similarity_backend='hashed-ngram', similarity_rate=0.05, seed=0):
+    """
+    Обработка одного шарда корпуса.
+
+    Документы шарда обрабатываются пачками по chunk_size через tokenize_batch
+    (в одном пуле из workers процессов на весь шард), токены сразу учитываются
+    в состоянии метода и отбрасываются.
+
+    Args:
+        input_file (str): JSONL-файл или каталог колоночного корпуса.
+        shard (tuple): (номер шарда, количество шардов).
+        methods (list): Названия методов (по умолчанию — все доступные методы эксперимента).
+        workers (int): Количество процессов токенизации.
+        oov_folds (int): Количество фолдов для оценки OOV.
+        chunk_size (int): Количество документов в пачке.
+        similarity_backend (str): Бэкенд сходства (см. similarity.BACKENDS).
+        similarity_rate (float): Доля документов, по которым считается сходство.
+        seed (int): Зерно назначения фолдов и выборки.
+
+    Returns:
+        dict: Объединяемое состояние шарда (см. merge_shards).
+    """
+    shard_index, shard_count = shard
+    available = [name for name, _, _ in experiment_methods()]
+    methods = methods or available
+    unknown = [name for name in methods if name not in available]
+    if unknown:
+        raise ValueError(f"Недоступные методы: {', '.join(unknown)}")
+    backend = similarity.get_backend(similarity_backend)
+
+    states = {
+        method: {
+            'oov': StreamingKFoldOOV(k=oov_folds),
+            'total_tokens': 0,
+            'time_sec': 0.0,
+            'similarity': sampling.moments([])
+        }
+        for method in methods
+    }
+
+    def process_chunk(offsets, texts):
+        folds = [fold_for_offset(offset, oov_folds, seed) for offset in offsets]
+        sample = [i for i, offset in enumerate(offsets) if _in_similarity_sample(offset, similarity_rate, seed)]
+        for method in methods:
+            state = states[method]
+            start_time = time.time()
+            tokens_list = tokenize_batch(texts, method, workers=workers, executor=executor)
+            state['time_sec'] += time.time() - start_time
+            for tokens, fold in zip(tokens_list, folds):
+                state['total_tokens'] += len(tokens)
+                state['oov'].add(tokens, fold)
+            if sample:
+                values = backend.similarity([texts[i] for i in sample], [' '.join(tokens_list[i]) for i in sample])
+                for key, value in sampling.moments(values).items():
+                    state['similarity'][key] += value
+
+    offsets = []
+    texts = []
+    documents = 0
+    executor = None
+    if workers > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        for offset, text in iter_records(input_file):
+            if offset % shard_count != shard_index:
+                continue
+            offsets.append(offset)
+            texts.append(text)
+            if len(texts) >= chunk_size:
+                process_chunk(offsets, texts)
+                documents += len(texts)
+                print(f"Шард {shard_index}/{shard_count}: обработано документов {documents}")
+                offsets, texts = [], []
+        if texts:
+            process_chunk(offsets, texts)
+            documents += len(texts)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return {
+        'version': SHARD_FORMAT_VERSION,
+        'input': os.path.abspath(input_file),
+        'shard': [shard_index, shard_count],
+        'oov_folds': oov_folds,
+        'seed': seed,
+        'similarity_backend': backend.name,
+        'similarity_rate': similarity_rate,
+        'documents': documents,
+        'methods': {
+            method: {
+                'total_tokens': state['total_tokens'],
+                'time_sec': state['time_sec'],
+                'similarity': state['similarity'],
+                'oov': state['oov'].to_dict()
+            }
+            for method, state in states.items()
+        }
+    }
+
+def shard_path(output_dir, shard):
+    return os.path.join(output_dir, f"shard-{shard[0]}-of-{shard[1]}.json.gz")
+
+def save_shard(result, output_dir):
+    """Атомарная запись состояния шарда в output_dir (общий каталог для всех машин)."""
+    os.makedirs(output_dir, exist_ok=True)
+    path = shard_path(output_dir, result['shard'])
+    tmp_path = path + '.tmp'
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+def load_shard(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        result = json.load(f)
+    if result.get('version') != SHARD_FORMAT_VERSION:
+        raise ValueError(f"{path}: неподдерживаемая версия формата {result.get('version')}")
+    return result
+
+def merge_shards(paths):
+    """
+    Объединение состояний шардов в итоговую таблицу сравнения методов.
+
+    Состояния OOV и счётчики складываются точно; сходство оценивается как
+    стратифицированное среднее с шардами в роли страт.
+
+    Args:
+        paths (list): Пути к файлам шардов (одного запуска).
+
+    Returns:
+        list: Строки таблицы (по одной на метод).
+    """
+    shards = [load_shard(path) for path in paths]
+    if not shards:
+        raise ValueError("Нет файлов шардов")
+    first = shards[0]
+    for key in ('shard', 'oov_folds', 'seed', 'similarity_backend', 'similarity_rate'):
+        values = {json.dumps(shard[key] if key != 'shard' else shard[key][1]) for shard in shards}
+        if len(values) > 1:
+            raise ValueError(f"Шарды относятся к разным запускам: различается {key}")
+    shard_count = first['shard'][1]
+    seen = [shard['shard'][0] for shard in shards]
+    if len(set(seen)) != len(seen):
+        raise ValueError("Один и тот же шард передан несколько раз")
+    missing = sorted(set(range(shard_count)) - set(seen))
+    if missing:
+        print(f"Внимание: нет шардов {missing} из {shard_count}, таблица построена по части корпуса")
+
+    results = []
+    for method in first['methods']:
+        parts = [shard['methods'][method] for shard in shards if method in shard['methods']]
+        oov_state = StreamingKFoldOOV.from_dict(parts[0]['oov'])
+        for part in parts[1:]:
+            oov_state.merge(StreamingKFoldOOV.from_dict(part['oov']))
+        oov_result = oov_state.result()
+
+        documents = oov_state.documents
+        time_sec = sum(part['time_sec'] for part in parts)
+        sizes = {shard['shard'][0]: shard['documents'] for shard in shards if method in shard['methods']}
+        strata_moments = {shard['shard'][0]: shard['methods'][method]['similarity']
+                          for shard in shards if method in shard['methods']}
+        avg_similarity, ci_low, ci_high = sampling.estimate_from_moments(strata_moments, sizes)
+
+        results.append({
+            'method': method,
+            'documents': documents,
+            'vocab_size': oov_state.vocab_size,
+            'total_tokens': sum(part['total_tokens'] for part in parts),
+            'avg_similarity': avg_similarity,
+            'similarity_ci_low': ci_low,
+            'similarity_ci_high': ci_high,
+            'similarity_samples': sum(m['n'] for m in strata_moments.values()),
+            'time_per_1000_articles': time_sec / documents * 1000 if documents else 0.0,
+            'oov_percentage': oov_result['mean'],
+            'oov_std': oov_result['std'],
+            'shards': len(parts)
+        })
+    return results
+
+def save_results(results, output_file):
+    """Сохранение таблицы результатов в CSV или JSON (по расширению файла)."""
+    if output_file.endswith('.json'):
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        return
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0]) if results else ['method'])
+        writer.writeheader()
+        writer.writerows(results)
+
+def main(argv=None):
+    import argparse
+    import glob
+
+    parser = argparse.ArgumentParser(description="Сравнение методов токенизации и нормализации")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run = subparsers.add_parser('run', help="Обработка шарда корпуса")
+    run.add_argument('input', help="JSONL-файл или каталог колоночного корпуса")
+    run.add_argument('--shard', type=parse_shard, default=(0, 1), help="Шард в виде i/n (по умолчанию 0/1)")
+    run.add_argument('--methods', nargs='*', help="Методы (по умолчанию все доступные)")
+    run.add_argument('--workers', type=int, default=1, help="Количество процессов токенизации")
+    run.add_argument('--output-dir', default='experiment_shards', help="Каталог для файлов шардов")
+    run.add_argument('--oov-folds', type=int, default=5)
+    run.add_argument('--chunk-size', type=int, default=1000)
+    run.add_argument('--similarity', choices=list(similarity.BACKENDS), default='hashed-ngram')
+    run.add_argument('--similarity-rate', type=float, default=0.05)
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--lemma-table', default=lemma_table.DEFAULT_TABLE_PATH, help="Таблица лемм для nltk_pymorphy")
+    run.add_argument('--learn-lemmas', action='store_true', help="Дописывать промахи таблицы лемм в её журнал")
+
+    merge = subparsers.add_parser('merge', help="Объединение шардов в итоговую таблицу")
+    merge.add_argument('shard_dir', help="Каталог с файлами шардов")
+    merge.add_argument('--output', default='tokenization_metrics.csv', help="Файл таблицы (.csv или .json)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        if args.lemma_table != lemma_table.DEFAULT_TABLE_PATH or args.learn_lemmas:
+            configure_lemmatizer(args.lemma_table, learn=args.learn_lemmas)
+        start_time = time.time()
+        result = run_shard(args.input, shard=args.shard, methods=args.methods, workers=args.workers,
+                           oov_folds=args.oov_folds, chunk_size=args.chunk_size,
+                           similarity_backend=args.similarity, similarity_rate=args.similarity_rate, seed=args.seed)
+        path = save_shard(result, args.output_dir)
+        print(f"Шард обработан за {time.time() - start_time:.2f} секунд: {result['documents']} документов -> {path}")
+        if lemmatizer.table is not None:
+            print(f"Таблица лемм: {lemmatizer.hits} попаданий, {lemmatizer.misses} промахов")
+    else:
+        paths = sorted(glob.glob(os.path.join(args.shard_dir, 'shard-*-of-*.json.gz')))
+        results = merge_shards(paths)
+        save_results(results, args.output)
+        import pandas as pd
+        print(pd.DataFrame(results).to_string(index=False))
+        print(f"Результаты сохранены в {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+import re
+import json
+import time
+from corpus_io import open_corpus
+
+# Словарь сокращений для русского языка
+ABBREVIATIONS = {
+    r'\bт\.е\.': 'то есть',
+    r'\bг\.': 'год',
+    r'\bгг\.': 'годы',
+    r'\bул\.': 'улица',
+    r'\bд\.': 'дом',
+    r'\bкв\.': 'квартира',
+    r'\bстр\.': 'страница',
+    r'\bим\.': 'имени',
+    r'\bпр\.': 'проспект',
+    r'\bс\.': 'село',
+    r'\bр\.': 'рублей',
+    r'\bмлн\.': 'миллион',
+    r'\bмлрд\.': 'миллиард',
+    r'\bтыс\.': 'тысяч',
+    r'\bв\.': 'век',
+    r'\bн\.э\.': 'нашей эры',
+    r'\bдо н\.э\.': 'до нашей эры',
+    r'\bт\.д\.': 'так далее',
+    r'\bт\.п\.': 'того подобное',
+    r'\bт\.к\.': 'так как',
+    r'\bг-н\.': 'господин',
+    r'\bг-жа\.': 'госпожа',
+    # Специфичные для новостных текстов
+    r'\bмин\.': 'минута',
+    r'\bроссия\b': 'Российская Федерация',
+    r'\bсша\b': 'Соединенные Штаты Америки',
+    r'\bоон\b': 'Организация Объединенных Наций'
+}
+
+def preprocess_text(text, replace_tokens=True, expand_abbreviations=True):
+    """
+    Предобработка текста с унификацией пунктуации, токенов и сокращений.
+
+    Args:
+        text (str): Исходный текст.
+        replace_tokens (bool): Заменять ли числительные, URL и email на токены.
+        expand_abbreviations (bool): Расшифровывать ли сокращения.
+
+    Returns:
+        str: Предобработанный текст или None при ошибке.
+    """
+    try:
+        # Пропуск пустого текста
+        if not text or not isinstance(text, str):
+            return None
+
+        # Стандартизация пунктуации: удаление множественных знаков, замена на стандартные
+        text = re.sub(r'[.!?]+', '.', text)  # Множественные знаки препинания → одна точка
+        text = re.sub(r'[,;]+', ',', text)   # Множественные запятые/точки с запятой → одна запятая
+        text = re.sub(r'[-–—]+', '-', text)  # Разные виды дефисов → стандартный
+        text = re.sub(r'[\'\"`]+', '"', text)  # Разные кавычки → стандартные
+        text = re.sub(r'\s+', ' ', text).strip()  # Стандартизация пробелов
+
+        if replace_tokens:
+            # Замена URL на <URL>
+            text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '<URL>', text)
+
+            # Замена email на <EMAIL>
+            text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '<EMAIL>', text)
+
+            # Замена числительных на <NUM> (включая дробные и проценты)
+            text = re.sub(r'\b\d+[.,]?\d*[%]?', '<NUM>', text)
+            text = re.sub(r'\b\d{4}\b', '<NUM>', text)  # Годы, например 2025 → <NUM>
+
+        if expand_abbreviations:
+            # Расширение сокращений
+            for abbr, full in ABBREVIATIONS.items():
+                text = re.sub(abbr, full, text, flags=re.IGNORECASE)
+
+        # Повторная стандартизация пробелов после замен
+        text = re.sub(r'\s+', ' ', text).strip()
+
+        return text if text else None
+
+    except Exception as e:
+        print(f"Ошибка в preprocess_text: {str(e)[:100]}")
+        return None
+
+def process_corpus(input_file='cleaned_corpus.jsonl', output_file='preprocessed_corpus.jsonl',
+                  replace_tokens=True, expand_abbreviations=True):
+    """
+    Обработка корпуса из JSONL-файла.
+
+    Args:
+        input_file (str): Путь к входному файлу cleaned_corpus.jsonl.
+        output_file (str): Путь к выходному файлу с предобработанным текстом.
+        replace_tokens (bool): Заменять ли числительные, URL и email на токены.
+        expand_abbreviations (bool): Расшифровывать ли сокращения.
+
+    Returns:
+        tuple: (количество обработанных статей, количество ошибок, общее количество слов)
+    """
+    # Выход инкрементальной очистки читается без устаревших версий статей
+    from text_cleaner import iter_cleaned
+
+    processed_count = 0
+    error_count = 0
+    total_words = 0
+
+    with open_corpus(output_file, 'w') as f_out:
+        for line in iter_cleaned(input_file):
+            try:
+                article = json.loads(line.strip())
+                # Используем поле cleaned_text, если оно есть, иначе text
+                text_to_process = article.get('cleaned_text', article.get('text', ''))
+                if not text_to_process:
+                    print(f"Пропущена статья: {article.get('url', 'N/A')} (title: {article.get('title', 'N/A')[:50]}...) - пустой текст")
+                    error_count += 1
+                    continue
+
+                preprocessed_text = preprocess_text(text_to_process, replace_tokens, expand_abbreviations)
+                if preprocessed_text:
+                    article['preprocessed_text'] = preprocessed_text
+                    words = len(preprocessed_text.split())
+                    total_words += words
+                    json.dump(article, f_out, ensure_ascii=False)
+                    f_out.write('\n')
+                    processed_count += 1
+                else:
+                    print(f"Пропущена статья: {article.get('url', 'N/A')} (title: {article.get('title', 'N/A')[:50]}...) - пустой предобработанный текст")
+                    error_count += 1
+            except Exception as e:
+                print(f"Ошибка обработки статьи: {article.get('url', 'N/A')} (title: {article.get('title', 'N/A')[:50]}...) - {str(e)[:100]}")
+                error_count += 1
+                continue
+
+    return processed_count, error_count, total_words
+
+def main():
+    """Пример использования модуля."""
+    input_file = 'cleaned_corpus.jsonl'
+    output_file = 'preprocessed_corpus.jsonl'
+
+    print("Начало предобработки корпуса...")
+    start_time = time.time()
+    processed_count, error_count, total_words = process_corpus(
+        input_file, output_file, replace_tokens=True, expand_abbreviations=True
+    )
+    print(f"Предобработка завершена за {time.time() - start_time:.2f} секунд")
+    print(f"Обработано статей: {processed_count}")
+    print(f"Ошибок: {error_count}")
+    print(f"Общее слов после предобработки: {total_words}")
+
+    # Вывод примера первой предобработанной статьи
+    with open_corpus(output_file) as f:
+        first_line = f.readline()
+        if first_line:
+            print("Пример первой предобработанной статьи:")
+            first_article = json.loads(first_line)
+            print(f"Title: {first_article['title'][:60]}...")
+            print(f"Preprocessed text: {first_article['preprocessed_text'][:200]}...")
+
+if __name__ == '__main__':
+    main()